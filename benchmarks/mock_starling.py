@@ -0,0 +1,282 @@
+"""Local stand-in for the parts of the Starling v2 API the integration uses.
+
+Serves one account with a configurable number of spaces, its balance,
+savings goals, transfers, feed and photos. Latency, server errors and
+rate limiting can be injected, and every request is counted so callers
+can measure how many API calls a refresh costs.
+"""
+from __future__ import annotations
+
+import asyncio
+from base64 import b64encode
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+import random
+import threading
+import uuid
+
+from aiohttp import web
+
+ACCOUNT_UID = "11111111-2222-3333-4444-555555555555"
+CATEGORY_UID = "66666666-7777-8888-9999-000000000000"
+
+# PNG signature, padded out to photos of a realistic size.
+PNG_HEADER = bytes.fromhex("89504e470d0a1a0a")
+
+
+def _money(minor_units: int) -> dict:
+    return {"currency": "GBP", "minorUnits": minor_units}
+
+
+def _time(value: datetime) -> str:
+    return value.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock server."""
+
+    spaces: int = 10
+    feed_items: int = 200
+    # Seconds added to every response.
+    latency: float = 0.0
+    # Share of requests answered with a 503, and with a 429.
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 0.1
+    photo_bytes: int = 64 * 1024
+
+
+@dataclass
+class MockState:
+    """Data served by the mock server, which transfers change."""
+
+    balance: int = 1_000_000
+    goals: dict[str, dict] = field(default_factory=dict)
+    feed: list[dict] = field(default_factory=list)
+    transfers: set[str] = field(default_factory=set)
+    calls: Counter = field(default_factory=Counter)
+
+    @classmethod
+    def generate(cls, config: MockConfig) -> MockState:
+        """Create an account with config.spaces goals and a feed."""
+        state = cls()
+        for index in range(config.spaces):
+            goal_uid = str(uuid.UUID(int=index + 1))
+            state.goals[goal_uid] = {
+                "savingsGoalUid": goal_uid,
+                "name": f"Space {index}",
+                "target": _money(100_000),
+                "totalSaved": _money(1_000 * index),
+                "savedPercentage": 0,
+                "state": "ACTIVE",
+            }
+
+        now = datetime.now(timezone.utc)
+        categories = ("GROCERIES", "EATING_OUT", "TRANSPORT", "BILLS_AND_SERVICES")
+        for index in range(config.feed_items):
+            when = now - timedelta(hours=index * 3)
+            state.feed.append(
+                {
+                    "feedItemUid": str(uuid.UUID(int=10_000 + index)),
+                    "categoryUid": CATEGORY_UID,
+                    "amount": _money(100 + index % 5_000),
+                    "direction": "OUT" if index % 4 else "IN",
+                    "updatedAt": _time(when),
+                    "transactionTime": _time(when),
+                    "source": "MASTER_CARD",
+                    "status": "SETTLED",
+                    "counterPartyName": f"Merchant {index % 20}",
+                    "spendingCategory": categories[index % len(categories)],
+                    "reference": f"Ref {index}",
+                }
+            )
+        return state
+
+    @property
+    def total_calls(self) -> int:
+        """Return the number of requests served so far."""
+        return sum(self.calls.values())
+
+
+def create_app(config: MockConfig, state: MockState) -> web.Application:
+    """Build the aiohttp application serving the mock API."""
+    routes = web.RouteTableDef()
+
+    @web.middleware
+    async def inject_faults(request: web.Request, handler) -> web.StreamResponse:
+        resource = request.match_info.route.resource
+        state.calls[resource.canonical if resource else request.path] += 1
+        if config.latency:
+            await asyncio.sleep(config.latency)
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            return web.json_response(
+                {"errors": [{"message": "Too many requests"}]},
+                status=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        if roll < config.rate_limit_rate + config.error_rate:
+            return web.json_response(
+                {"errors": [{"message": "Unavailable"}]}, status=503
+            )
+        return await handler(request)
+
+    def goal_or_404(request: web.Request) -> dict:
+        goal = state.goals.get(request.match_info["goal"])
+        if goal is None:
+            raise web.HTTPNotFound()
+        return goal
+
+    @routes.get("/api/v2/accounts")
+    async def accounts(request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "accounts": [
+                    {
+                        "accountUid": ACCOUNT_UID,
+                        "accountType": "PRIMARY",
+                        "defaultCategory": CATEGORY_UID,
+                        "currency": "GBP",
+                        "createdAt": _time(
+                            datetime.now(timezone.utc) - timedelta(days=365)
+                        ),
+                        "name": "Personal",
+                    }
+                ]
+            }
+        )
+
+    @routes.get("/api/v2/accounts/{account}/identifiers")
+    async def identifiers(request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "accountIdentifier": "12345678",
+                "bankIdentifier": "608371",
+                "iban": "GB00SRLG60837112345678",
+                "bic": "SRLGGB2L",
+            }
+        )
+
+    @routes.get("/api/v2/accounts/{account}/balance")
+    async def balance(request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "clearedBalance": _money(state.balance),
+                "effectiveBalance": _money(state.balance),
+                "pendingTransactions": _money(0),
+                "acceptedOverdraft": _money(0),
+            }
+        )
+
+    @routes.get("/api/v2/account/{account}/savings-goals")
+    async def savings_goals(request: web.Request) -> web.Response:
+        return web.json_response({"savingsGoalList": list(state.goals.values())})
+
+    @routes.get("/api/v2/account/{account}/savings-goals/{goal}")
+    async def savings_goal(request: web.Request) -> web.Response:
+        return web.json_response(goal_or_404(request))
+
+    @routes.put("/api/v2/account/{account}/savings-goals/{goal}/{action}/{transfer}")
+    async def transfer(request: web.Request) -> web.Response:
+        goal = goal_or_404(request)
+        action = request.match_info["action"]
+        if action not in ("add-money", "withdraw-money"):
+            raise web.HTTPNotFound()
+        transfer_uid = request.match_info["transfer"]
+        # Transfers are keyed by their UID, so a retried transfer is
+        # applied once.
+        if transfer_uid not in state.transfers:
+            state.transfers.add(transfer_uid)
+            amount = (await request.json())["amount"]["minorUnits"]
+            if action == "withdraw-money":
+                amount = -amount
+            goal["totalSaved"]["minorUnits"] += amount
+            state.balance -= amount
+        return web.json_response({"transferUid": transfer_uid, "success": True})
+
+    @routes.get("/api/v2/account/{account}/savings-goals/{goal}/photo")
+    async def photo(request: web.Request) -> web.Response:
+        goal_or_404(request)
+        body = PNG_HEADER + bytes(config.photo_bytes - len(PNG_HEADER))
+        return web.json_response({"base64EncodedPhoto": b64encode(body).decode()})
+
+    @routes.get("/api/v2/feed/account/{account}/category/{category}")
+    async def feed_changes(request: web.Request) -> web.Response:
+        since = request.query.get("changesSince", "")
+        return web.json_response(
+            {"feedItems": [item for item in state.feed if item["updatedAt"] > since]}
+        )
+
+    @routes.get(
+        "/api/v2/feed/account/{account}/category/{category}/transactions-between"
+    )
+    async def feed_between(request: web.Request) -> web.Response:
+        start = request.query["minTransactionTimestamp"]
+        end = request.query["maxTransactionTimestamp"]
+        return web.json_response(
+            {
+                "feedItems": [
+                    item
+                    for item in state.feed
+                    if start <= item["transactionTime"] < end
+                ]
+            }
+        )
+
+    app = web.Application(middlewares=[inject_faults])
+    app.add_routes(routes)
+    return app
+
+
+class MockStarlingServer:
+    """Runs the mock API on its own thread and event loop.
+
+    Running outside the caller's loop lets blocking clients, such as the
+    StarlingAccount wrapper, be measured against it as well.
+    """
+
+    def __init__(self, config: MockConfig | None = None) -> None:
+        self.config = config or MockConfig()
+        self.state = MockState.generate(self.config)
+        self.url = ""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runner: web.AppRunner | None = None
+
+    def __enter__(self) -> MockStarlingServer:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Start serving on a free local port."""
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    async def _start(self) -> None:
+        self._runner = web.AppRunner(create_app(self.config, self.state))
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/api/v2"
+
+    def stop(self) -> None:
+        """Stop serving and end the server's thread."""
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def call(self, function, *args):
+        """Run a function on the server's loop, to change its state safely."""
+        return asyncio.run_coroutine_threadsafe(
+            self._call(function, *args), self._loop
+        ).result()
+
+    @staticmethod
+    async def _call(function, *args):
+        return function(*args)
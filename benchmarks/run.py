@@ -0,0 +1,265 @@
+"""Measure refresh cost against the local mock Starling API.
+
+Run from the repository root, in an environment with Home Assistant
+installed:
+
+    python -m benchmarks.run --spaces 1 10 100
+
+For each number of spaces, each scenario reports the median latency of a
+refresh, the API calls it made, the peak memory allocated by the process
+during it (the mock server included), refreshes that failed and, for the
+coordinator, how many entities would have written a new state. Between
+refreshes one space receives a transfer, as a real account would.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from aiohttp import ClientError, ClientSession
+
+from custom_components.starlingbank.api import starlingbank as starling_api
+from custom_components.starlingbank.feed_store import FeedStore
+from custom_components.starlingbank.starling_data import StarlingData, master_idx
+
+from .mock_starling import MockConfig, MockStarlingServer
+
+
+@dataclass
+class Result:
+    """Measurements of one scenario, per refresh."""
+
+    scenario: str
+    spaces: int
+    latency_ms: float
+    api_calls: float
+    peak_kib: float
+    failures: int
+    entity_updates: float | None = None
+
+
+class Probe:
+    """Measures the refreshes of one scenario."""
+
+    def __init__(self, server: MockStarlingServer) -> None:
+        self._server = server
+        self.latencies = []
+        self.calls = []
+        self.peaks = []
+        self.updates = []
+        self.failures = 0
+
+    def __enter__(self) -> Probe:
+        self._server.call(_transfer_to_first_space, self._server.state)
+        self._calls = self._server.state.total_calls
+        tracemalloc.reset_peak()
+        self._memory = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.latencies.append(time.perf_counter() - self._started)
+        self.peaks.append(tracemalloc.get_traced_memory()[1] - self._memory)
+        self.calls.append(self._server.state.total_calls - self._calls)
+        # Refreshes that fail despite retries are counted, not raised, so
+        # runs with injected faults complete.
+        if exc_type is not None and issubclass(
+            exc_type, (ClientError, TimeoutError, starling_api.StarlingApiError)
+        ):
+            self.failures += 1
+            return True
+        return False
+
+    def result(self, scenario: str, spaces: int) -> Result:
+        """Summarise the measured refreshes."""
+        return Result(
+            scenario,
+            spaces,
+            statistics.median(self.latencies) * 1000,
+            statistics.mean(self.calls),
+            statistics.median(self.peaks) / 1024,
+            self.failures,
+            statistics.mean(self.updates) if self.updates else None,
+        )
+
+
+def _transfer_to_first_space(state) -> None:
+    goal = next(iter(state.goals.values()), None)
+    if goal is not None:
+        goal["totalSaved"]["minorUnits"] += 1
+        state.balance -= 1
+
+
+def bench_blocking_account(server: MockStarlingServer, cycles: int) -> Result:
+    """Refresh through the blocking StarlingAccount wrapper."""
+    account = starling_api.StarlingAccount("token")
+    probe = Probe(server)
+    try:
+        for _ in range(cycles):
+            with probe:
+                account.update_balance_data()
+                account.update_savings_goal_data()
+    finally:
+        account.close()
+    return probe.result("StarlingAccount", server.config.spaces)
+
+
+async def create_starling_data(
+    session: ClientSession, directory: str, stored: dict | None = None
+) -> StarlingData:
+    """Create a client the way setup does, from a snapshot when given one."""
+    # The rate limit is lifted so latency reflects the work of a refresh
+    # rather than the pacing of requests; retries are kept.
+    api = starling_api.StarlingApi(
+        session,
+        "token",
+        scheduler=starling_api.RequestScheduler(rate=1000, burst=1000, backoff=0.05),
+    )
+    if stored is not None:
+        accounts = [
+            starling_api.AsyncStarlingAccount.from_account_data(api, account)
+            for account in stored["accounts"]
+        ]
+    else:
+        accounts = await starling_api.AsyncStarlingAccount.async_discover(api)
+    feed_stores = {
+        account.account_uid: FeedStore(f"{directory}/{account.account_uid}.db")
+        for account in accounts
+    }
+    for feed_store in feed_stores.values():
+        feed_store.open()
+    return StarlingData(accounts, feed_stores)
+
+
+async def bench_starling_data(
+    server: MockStarlingServer, cycles: int, listening: bool
+) -> Result:
+    """Refresh StarlingData, with every entity or one space listening."""
+    async with ClientSession() as session:
+        with tempfile.TemporaryDirectory() as directory:
+            client = await create_starling_data(session, directory)
+            # The first refresh always fetches everything.
+            await client.update_coordinated(set())
+
+            listening_idx = set()
+            if listening:
+                account = client.primary_account
+                listening_idx = {
+                    master_idx(account.account_uid),
+                    *list(account.savings_goals)[:1],
+                }
+
+            probe = Probe(server)
+            for _ in range(cycles):
+                with probe:
+                    await client.update_coordinated(listening_idx)
+            await client.async_close()
+
+    name = "StarlingData (one space listening)" if listening else "StarlingData"
+    return probe.result(name, server.config.spaces)
+
+
+async def bench_coordinator(server: MockStarlingServer, cycles: int) -> Result:
+    """Refresh through the coordinator with a listener for every entity.
+
+    Listeners skip unchanged data the way StarlingSensor does, so the
+    update count is the number of states that would be written.
+    """
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.starlingbank.starling_update_coordinator import (
+        StarlingUpdateCoordinator,
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        hass = HomeAssistant(directory)
+        async with ClientSession() as session:
+            client = await create_starling_data(session, directory)
+            coordinator = StarlingUpdateCoordinator(hass, client)
+            await coordinator.async_refresh()
+
+            writes = 0
+            unsubscribes = []
+            for idx in coordinator.data:
+                last_written = [coordinator.data.get(idx)]
+
+                def _listener(idx=idx, last_written=last_written) -> None:
+                    nonlocal writes
+                    data = coordinator.data.get(idx)
+                    if data != last_written[0]:
+                        last_written[0] = data
+                        writes += 1
+
+                unsubscribes.append(coordinator.async_add_listener(_listener, idx))
+
+            probe = Probe(server)
+            for _ in range(cycles):
+                writes = 0
+                with probe:
+                    await coordinator.async_refresh()
+                if not coordinator.last_update_success:
+                    probe.failures += 1
+                probe.updates.append(writes)
+
+            for unsubscribe in unsubscribes:
+                unsubscribe()
+            await coordinator.async_shutdown()
+            await client.async_close()
+        await hass.async_stop(force=True)
+
+    return probe.result("StarlingUpdateCoordinator", server.config.spaces)
+
+
+def run(config: MockConfig, cycles: int) -> list[Result]:
+    """Run every scenario against a mock server built from config."""
+    with MockStarlingServer(config) as server:
+        starling_api.BASE_URL = server.url
+
+        async def _async_run() -> list[Result]:
+            return [
+                await bench_starling_data(server, cycles, listening=False),
+                await bench_starling_data(server, cycles, listening=True),
+                await bench_coordinator(server, cycles),
+            ]
+
+        return [bench_blocking_account(server, cycles), *asyncio.run(_async_run())]
+
+
+def main() -> None:
+    """Run the benchmarks and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spaces", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    print(
+        f"{'scenario':<36} {'spaces':>6} {'latency ms':>11} "
+        f"{'api calls':>10} {'peak KiB':>9} {'failures':>9} {'updates':>8}"
+    )
+    for spaces in args.spaces:
+        config = MockConfig(
+            spaces=spaces,
+            latency=args.latency,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+        )
+        for result in run(config, args.cycles):
+            updates = "-" if result.entity_updates is None else f"{result.entity_updates:.1f}"
+            print(
+                f"{result.scenario:<36} {result.spaces:>6} "
+                f"{result.latency_ms:>11.1f} {result.api_calls:>10.1f} "
+                f"{result.peak_kib:>9.1f} {result.failures:>9} {updates:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
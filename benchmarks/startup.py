@@ -0,0 +1,185 @@
+"""Measure how long the integration takes to import and to create entities.
+
+Run from the repository root, in an environment with Home Assistant
+installed:
+
+    python -m benchmarks.startup --spaces 1 10 100
+
+Each integration module is imported in a fresh interpreter that has
+already loaded the parts of Home Assistant it would have loaded by then,
+so only the integration's own cost is timed. The integration modules each
+import pulls in are listed alongside.
+
+Time to first entity runs against the local mock Starling API, from
+creating the client until the coordinator holds data that entities can be
+created from. A cold start discovers the accounts and refreshes them; a
+warm start restores the snapshot stored by a previous run.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession
+
+from custom_components.starlingbank.api import starlingbank as starling_api
+
+from .mock_starling import MockConfig, MockStarlingServer
+from .run import create_starling_data
+
+PACKAGE = "custom_components.starlingbank"
+
+# Modules Home Assistant has imported before it loads an integration.
+BASELINE = (
+    "aiohttp",
+    "voluptuous",
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.update_coordinator",
+    "homeassistant.components.image",
+    "homeassistant.components.sensor",
+)
+
+# The package is imported when Home Assistant starts, the config flow when
+# an entry is added and the platforms when an entry is set up.
+MODULES = (
+    PACKAGE,
+    f"{PACKAGE}.config_flow",
+    f"{PACKAGE}.sensor",
+    f"{PACKAGE}.image",
+)
+
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+for name in {baseline!r}:
+    importlib.import_module(name)
+before = set(sys.modules)
+started = time.perf_counter()
+importlib.import_module({module!r})
+print(json.dumps({{
+    "seconds": time.perf_counter() - started,
+    "loaded": sorted(set(sys.modules) - before),
+}}))
+"""
+
+
+def measure_import(module: str, cycles: int) -> tuple[float, list[str]]:
+    """Return the median import time of a module and the modules it loads.
+
+    Platform modules are imported with the package already loaded, as they
+    are in Home Assistant.
+    """
+    baseline = BASELINE if module == PACKAGE else (*BASELINE, PACKAGE)
+    seconds = []
+    for _ in range(cycles):
+        result = json.loads(
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    IMPORT_SCRIPT.format(baseline=baseline, module=module),
+                ],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+        seconds.append(result["seconds"])
+    loaded = [name for name in result["loaded"] if name.startswith(PACKAGE)]
+    return statistics.median(seconds), loaded
+
+
+async def first_entity(
+    server: MockStarlingServer, stored: dict | None
+) -> tuple[float, int, dict]:
+    """Time setup until entities could be created, from stored if given.
+
+    Returns the seconds taken, the API calls made and a snapshot of the
+    data for a warm start to restore.
+    """
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.starlingbank.starling_update_coordinator import (
+        StarlingUpdateCoordinator,
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        hass = HomeAssistant(directory)
+        async with ClientSession() as session:
+            calls = server.state.total_calls
+            started = time.perf_counter()
+
+            client = await create_starling_data(session, directory, stored)
+            coordinator = StarlingUpdateCoordinator(hass, client)
+            if stored is None:
+                await coordinator.async_refresh()
+            else:
+                coordinator.async_set_updated_data(client.restore(stored))
+
+            elapsed = time.perf_counter() - started
+            calls = server.state.total_calls - calls
+            snapshot = client.as_dict(coordinator.data)
+            await coordinator.async_shutdown()
+            await client.async_close()
+        await hass.async_stop(force=True)
+    return elapsed, calls, snapshot
+
+
+def run_first_entity(config: MockConfig, cycles: int) -> dict[str, tuple[float, float]]:
+    """Return the median time and mean API calls of cold and warm starts."""
+    with MockStarlingServer(config) as server:
+        starling_api.BASE_URL = server.url
+
+        async def _async_run() -> dict[str, tuple[float, float]]:
+            results = {"cold": [], "warm": []}
+            for _ in range(cycles):
+                elapsed, calls, snapshot = await first_entity(server, None)
+                results["cold"].append((elapsed, calls))
+                elapsed, calls, _ = await first_entity(server, snapshot)
+                results["warm"].append((elapsed, calls))
+            return {
+                start: (
+                    statistics.median(elapsed for elapsed, _ in measured),
+                    statistics.mean(calls for _, calls in measured),
+                )
+                for start, measured in results.items()
+            }
+
+        return asyncio.run(_async_run())
+
+
+def main() -> None:
+    """Run the benchmarks and print a table of results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spaces", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    print(f"{'module':<36} {'import ms':>10}  integration modules loaded")
+    for module in MODULES:
+        seconds, loaded = measure_import(module, args.cycles)
+        names = ", ".join(name[len(PACKAGE) + 1:] or "." for name in loaded)
+        print(f"{module:<36} {seconds * 1000:>10.1f}  {names}")
+
+    print()
+    print(f"{'first entity':<36} {'spaces':>6} {'ms':>9} {'api calls':>10}")
+    for spaces in args.spaces:
+        config = MockConfig(spaces=spaces, latency=args.latency)
+        for start, (seconds, calls) in run_first_entity(config, args.cycles).items():
+            print(
+                f"{start + ' start':<36} {spaces:>6} "
+                f"{seconds * 1000:>9.1f} {calls:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,24 @@
-"""The starlingbank component."""
+"""The starlingbank component.
+
+Only constants and Home Assistant helpers are imported when the integration
+loads. The API client, feed store and statistics modules are imported when
+an entry is first set up, so an idle or failing integration adds little to
+Home Assistant's start up.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass, field
 from datetime import timedelta
+from hashlib import sha256
 import logging
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientError
 
-from .starling_data import StarlingData
-from .starling_update_coordinator import StarlingUpdateCoordinator
+from .services import async_setup_services
+from homeassistant.components import webhook
 from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
 from homeassistant.const import (
     Platform,
@@ -13,18 +28,105 @@ from homeassistant.const import (
 
 from .const import (
     DOMAIN,
+    CACHE_TTL_OPTIONS,
+    DEFAULT_CACHE_TTLS,
+    CONF_CONNECT_TIMEOUT,
+    CONF_READ_TIMEOUT,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    CONF_WEBHOOK_ID,
+    CONF_WEBHOOK_PUBLIC_KEY,
+    CONF_SWEEP_RULES,
+    WEBHOOK_FALLBACK_INTERVAL,
+    DATA_SHARED_CLIENTS,
+    MASTER,
+    master_idx,
 )
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.start import async_at_started
+from homeassistant.helpers.storage import STORAGE_DIR, Store
 from homeassistant.helpers.typing import ConfigType
 
+if TYPE_CHECKING:
+    from .starling_data import StarlingData
+    from .starling_update_coordinator import StarlingUpdateCoordinator
+    from .sweeps import SweepEngine
+
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.SENSOR]
-MIN_TIME_BETWEEN_UPDATES = timedelta(minutes=3)
+PLATFORMS = [Platform.IMAGE, Platform.SENSOR]
+
+STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 10
+
+# How often the newest complete hours are added to the balance statistics.
+STATISTICS_INTERVAL = timedelta(hours=1)
+
+DATA_SHARED_LOCK = f"{DOMAIN}_shared_lock"
+
+@dataclass
+class SharedClient:
+    """Client and polling loop shared by every config entry with a token."""
+
+    coordinator: StarlingUpdateCoordinator
+    # The client options in effect, and the title of the entry they are from.
+    options: dict[str, Any] = field(default_factory=dict)
+    options_title: str = ""
+    entry_ids: set[str] = field(default_factory=set)
+    unsubscribe: list[Callable[[], None]] = field(default_factory=list)
+    # Compiled sweep rules by entry ID, evaluated by one engine.
+    sweep_rules: dict[str, list] = field(default_factory=dict)
+    sweep_engine: SweepEngine | None = None
+    _sweep_stop: Callable[[], None] | None = None
+
+    @callback
+    def async_update_sweeps(self) -> None:
+        """Evaluate the sweep rules of every entry with one engine.
+
+        An engine for each entry would act on the same updates of the
+        coordinator and share the feed store keys of its rule names.
+        """
+        from .sweeps import SweepEngine, merge_rules
+
+        rules = merge_rules(self.sweep_rules.values())
+        if not rules:
+            self._async_stop_sweeps()
+        elif self.sweep_engine is None:
+            self.sweep_engine = SweepEngine(
+                self.coordinator.hass, self.coordinator, rules
+            )
+            self._sweep_stop = self.sweep_engine.async_start()
+        else:
+            self.sweep_engine.set_rules(rules)
+
+    @callback
+    def _async_stop_sweeps(self) -> None:
+        if self._sweep_stop is not None:
+            self._sweep_stop()
+        self.sweep_engine = None
+        self._sweep_stop = None
+
+    async def async_close(self) -> None:
+        """Stop polling and release the client."""
+        self._async_stop_sweeps()
+        for unsubscribe in self.unsubscribe:
+            unsubscribe()
+        await self.coordinator.async_shutdown()
+        await self.coordinator.starling_client.async_close()
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the Starling component."""
+    async_setup_services(hass)
+
     if DOMAIN not in config:
         return True
     hass.async_create_task(
@@ -38,12 +140,38 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Set up Starling from a config entry."""
-    client = await hass.async_add_executor_job(create_and_update_instance, entry)
+    """Set up Starling from a config entry.
 
-    coordinator = StarlingUpdateCoordinator(hass, client)
+    Entries with the same token share one client and coordinator; the
+    first entry to load decides the client and polling options, and a
+    warning is logged for entries whose options differ.
+    """
+    token = entry.data[CONF_TOKEN]
+    shared_clients = hass.data.setdefault(DATA_SHARED_CLIENTS, {})
 
-    await coordinator.async_config_entry_first_refresh()
+    async with hass.data.setdefault(DATA_SHARED_LOCK, asyncio.Lock()):
+        shared = shared_clients.get(token)
+        if shared is None:
+            shared = await _async_create_shared_client(hass, entry)
+            shared.options = _client_options(entry)
+            shared.options_title = entry.title
+            shared_clients[token] = shared
+        elif _client_options(entry) != shared.options:
+            _LOGGER.warning(
+                "Starling entry %s shares its token with %s, so the connection "
+                "and polling options of %s are used and its own are ignored; "
+                "give both entries the same options to avoid this",
+                entry.title,
+                shared.options_title,
+                shared.options_title,
+            )
+        shared.entry_ids.add(entry.entry_id)
+
+    coordinator = shared.coordinator
+
+    await _async_migrate_master_idx(
+        hass, entry, coordinator.starling_client.primary_account.account_uid
+    )
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
         "coordinator": coordinator,
@@ -52,24 +180,312 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    public_key = entry.options.get(CONF_WEBHOOK_PUBLIC_KEY)
+    if public_key:
+        from .webhook import async_register_webhook
+
+        webhook_id = entry.options[CONF_WEBHOOK_ID]
+        async_register_webhook(hass, webhook_id, public_key, coordinator)
+        entry.async_on_unload(
+            lambda: webhook.async_unregister(hass, webhook_id)
+        )
+
+    sweep_rules = entry.options.get(CONF_SWEEP_RULES)
+    if sweep_rules:
+        from .sweeps import compile_rules
+
+        shared.sweep_rules[entry.entry_id] = compile_rules(sweep_rules)
+        shared.async_update_sweeps()
+
+        @callback
+        def _async_remove_sweep_rules() -> None:
+            shared.sweep_rules.pop(entry.entry_id, None)
+            shared.async_update_sweeps()
+
+        entry.async_on_unload(_async_remove_sweep_rules)
+
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     return True
 
 
+def _client_options(entry: ConfigEntry) -> dict[str, Any]:
+    """Return the options the shared client and its polling are built from.
+
+    Sweep rules are merged across entries and webhooks are set up for each
+    entry, so of those only whether a webhook pushes events, which slows
+    polling, is included.
+    """
+    return {
+        **{
+            option: entry.options.get(option, DEFAULT_CACHE_TTLS[tier])
+            for option, tier in CACHE_TTL_OPTIONS.items()
+        },
+        CONF_CONNECT_TIMEOUT: entry.options.get(
+            CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT
+        ),
+        CONF_READ_TIMEOUT: entry.options.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT),
+        CONF_MIN_UPDATE_INTERVAL: entry.options.get(
+            CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL.total_seconds()
+        ),
+        CONF_MAX_UPDATE_INTERVAL: entry.options.get(
+            CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL.total_seconds()
+        ),
+        CONF_WEBHOOK_PUBLIC_KEY: bool(entry.options.get(CONF_WEBHOOK_PUBLIC_KEY)),
+    }
+
+
+async def _async_create_shared_client(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> SharedClient:
+    """Create the client and coordinator for the entry's token.
+
+    When a snapshot from a previous run is stored, the coordinator starts
+    from it and the first live refresh runs in the background.
+    """
+    from .starling_update_coordinator import StarlingUpdateCoordinator
+
+    store = Store(hass, STORAGE_VERSION, _store_key(entry.data[CONF_TOKEN]))
+    stored = await store.async_load()
+
+    try:
+        client = await create_and_update_instance(hass, entry, stored)
+    except (ClientError, TimeoutError) as err:
+        raise ConfigEntryNotReady(f"Unable to reach Starling: {err}") from err
+
+    data = None
+    if stored is not None:
+        try:
+            data = client.restore(stored)
+        except (KeyError, TypeError, ValueError):
+            _LOGGER.warning("Ignoring unreadable stored Starling snapshot")
+
+    public_key = entry.options.get(CONF_WEBHOOK_PUBLIC_KEY)
+    if public_key:
+        coordinator = StarlingUpdateCoordinator(
+            hass, client, WEBHOOK_FALLBACK_INTERVAL, WEBHOOK_FALLBACK_INTERVAL
+        )
+    else:
+        coordinator = StarlingUpdateCoordinator(
+            hass,
+            client,
+            timedelta(
+                seconds=entry.options.get(
+                    CONF_MIN_UPDATE_INTERVAL,
+                    DEFAULT_MIN_UPDATE_INTERVAL.total_seconds(),
+                )
+            ),
+            timedelta(
+                seconds=entry.options.get(
+                    CONF_MAX_UPDATE_INTERVAL,
+                    DEFAULT_MAX_UPDATE_INTERVAL.total_seconds(),
+                )
+            ),
+        )
+
+    if data is None:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await client.async_close()
+            raise
+    else:
+        coordinator.async_set_updated_data(data)
+        hass.async_create_background_task(
+            coordinator.async_refresh(), "starlingbank initial refresh"
+        )
+
+    @callback
+    def _async_save_snapshot() -> None:
+        store.async_delay_save(
+            lambda: client.as_dict(coordinator.data), SNAPSHOT_SAVE_DELAY
+        )
+
+    _async_save_snapshot()
+    shared = SharedClient(
+        coordinator, unsubscribe=[coordinator.async_add_listener(_async_save_snapshot)]
+    )
+
+    @callback
+    def _async_at_started(hass: HomeAssistant) -> None:
+        hass.async_create_background_task(
+            _async_start_statistics(hass, entry, shared),
+            "starlingbank statistics start",
+        )
+
+    # Backfilling history competes with start up for the network and the
+    # executor, so it waits until Home Assistant has started.
+    shared.unsubscribe.append(async_at_started(hass, _async_at_started))
+    return shared
+
+
+async def _async_start_statistics(
+    hass: HomeAssistant, entry: ConfigEntry, shared: SharedClient
+) -> None:
+    """Import balance statistics now, then every STATISTICS_INTERVAL.
+
+    Accounts found after start up are imported from when they appear, and
+    imports of accounts that have closed are stopped.
+    """
+    from .statistics import BalanceStatisticsImporter
+
+    coordinator = shared.coordinator
+    client = coordinator.starling_client
+    # Callbacks stopping the import of each account.
+    importers: dict[str, list[Callable[[], None]]] = {}
+
+    @callback
+    def _async_update_importers() -> None:
+        for account_uid in importers.keys() - client.feed_stores.keys():
+            for stop in importers.pop(account_uid):
+                stop()
+        for account_uid, feed_store in client.feed_stores.items():
+            if account_uid in importers or master_idx(account_uid) not in coordinator.data:
+                continue
+            importer = BalanceStatisticsImporter(
+                hass,
+                client.accounts[account_uid],
+                feed_store,
+                f"{entry.data[CONF_NAME]} "
+                f"{coordinator.data[master_idx(account_uid)].name}",
+            )
+            task = hass.async_create_background_task(
+                importer.async_run(), "starlingbank statistics import"
+            )
+            importers[account_uid] = [
+                task.cancel,
+                async_track_time_interval(
+                    hass, importer.async_run, STATISTICS_INTERVAL
+                ),
+            ]
+
+    @callback
+    def _async_stop_importers() -> None:
+        for stops in importers.values():
+            for stop in stops:
+                stop()
+
+    _async_update_importers()
+    shared.unsubscribe.append(coordinator.async_add_listener(_async_update_importers))
+    shared.unsubscribe.append(_async_stop_importers)
+
+
+async def _async_migrate_master_idx(
+    hass: HomeAssistant, entry: ConfigEntry, account_uid: str
+) -> None:
+    """Move entities and devices from the single-account MASTER key."""
+    name = entry.data[CONF_NAME]
+    old_prefix = f"{MASTER}_{name}_"
+    new_prefix = f"{master_idx(account_uid)}_{name}_"
+
+    @callback
+    def _async_migrate_unique_id(entity_entry: er.RegistryEntry) -> dict | None:
+        if not entity_entry.unique_id.startswith(old_prefix):
+            return None
+        return {
+            "new_unique_id": new_prefix + entity_entry.unique_id[len(old_prefix):]
+        }
+
+    await er.async_migrate_entries(hass, entry.entry_id, _async_migrate_unique_id)
+
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get_device(identifiers={(DOMAIN, f"{MASTER}{name}")})
+    if device is not None:
+        device_registry.async_update_device(
+            device.id,
+            new_identifiers={(DOMAIN, f"{master_idx(account_uid)}{name}")},
+        )
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
 
+        token = entry.data[CONF_TOKEN]
+        shared = hass.data[DATA_SHARED_CLIENTS][token]
+        shared.entry_ids.discard(entry.entry_id)
+        if not shared.entry_ids:
+            hass.data[DATA_SHARED_CLIENTS].pop(token)
+            await shared.async_close()
+
     return unload_ok
 
-def create_and_update_instance(entry: ConfigEntry) -> StarlingData:
-    """Create and update a Starling instance."""
-    from .api.starlingbank import StarlingAccount
 
-    _LOGGER.debug(entry.data[CONF_TOKEN])
-    auth = StarlingAccount(
-        entry.data[CONF_TOKEN]
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored snapshot once no entry uses the token."""
+    token = entry.data[CONF_TOKEN]
+    if any(
+        other.data.get(CONF_TOKEN) == token
+        for other in hass.config_entries.async_entries(DOMAIN)
+        if other.entry_id != entry.entry_id
+    ):
+        return
+    await Store(hass, STORAGE_VERSION, _store_key(token)).async_remove()
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+def _store_key(token: str) -> str:
+    """Return the snapshot storage key for a token, without exposing it."""
+    return f"{DOMAIN}.{sha256(token.encode()).hexdigest()[:16]}"
+
+async def create_and_update_instance(
+    hass: HomeAssistant, entry: ConfigEntry, stored: dict | None = None
+) -> StarlingData:
+    """Create and update a Starling instance.
+
+    The accounts are restored from a stored snapshot when one is given,
+    otherwise they are discovered from the API. Either way the first live
+    refresh discovers them again, adding new accounts and dropping closed
+    ones.
+    """
+    from .api.starlingbank import (
+        AsyncStarlingAccount,
+        ResponseCache,
+        StarlingApi,
     )
-    instance = StarlingData(auth)
-    return instance
\ No newline at end of file
+    from .feed_store import FeedStore
+    from .starling_data import StarlingData
+
+    api = StarlingApi(
+        async_get_clientsession(hass),
+        entry.data[CONF_TOKEN],
+        cache=ResponseCache(
+            {
+                tier: entry.options[option]
+                for option, tier in CACHE_TTL_OPTIONS.items()
+                if option in entry.options
+            }
+        ),
+        connect_timeout=entry.options.get(
+            CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT
+        ),
+        read_timeout=entry.options.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT),
+    )
+    if stored is not None and "accounts" in stored:
+        accounts = [
+            AsyncStarlingAccount.from_account_data(api, account)
+            for account in stored["accounts"]
+        ]
+    else:
+        accounts = await AsyncStarlingAccount.async_discover(api)
+
+    def _open_feed_store(account_uid: str) -> FeedStore:
+        feed_store = FeedStore(
+            hass.config.path(STORAGE_DIR, f"{DOMAIN}_feed_{account_uid}.db")
+        )
+        feed_store.open()
+        return feed_store
+
+    feed_stores = {}
+    for account in accounts:
+        feed_stores[account.account_uid] = await hass.async_add_executor_job(
+            _open_feed_store, account.account_uid
+        )
+
+    instance = StarlingData(accounts, feed_stores, _open_feed_store)
+    return instance
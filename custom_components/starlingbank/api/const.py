@@ -0,0 +1,25 @@
+"""Constants of the Starling Bank API client.
+
+Kept free of imports so the integration can read the defaults without
+loading the client itself.
+"""
+
+# Cache tiers, grouping endpoints whose data changes at a similar rate.
+TIER_ACCOUNT = "account"
+TIER_SAVINGS_GOALS = "savings_goals"
+TIER_BALANCE = "balance"
+TIER_PAYMENTS = "payments"
+
+# Seconds each tier's responses stay fresh. A TTL of 0 disables caching.
+# The payment endpoints that cover every account are requested once per
+# refresh however many accounts ask, as concurrent requests share a call.
+DEFAULT_CACHE_TTLS = {
+    TIER_ACCOUNT: 86400,
+    TIER_SAVINGS_GOALS: 0,
+    TIER_BALANCE: 0,
+    TIER_PAYMENTS: 600,
+}
+
+# Seconds to wait for a connection, and for each read once connected.
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 15
@@ -1,13 +1,79 @@
 """Provides limited access to the Starling bank API."""
-from requests import get, put
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from email.utils import parsedate_to_datetime
+import random
+import re
+from time import monotonic, time
 from uuid import uuid4
-from json import dumps as json_dumps
 from base64 import b64decode
-from typing import Dict
+from functools import partial
+from http import HTTPStatus
+import json
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+)
+from urllib.parse import quote
+
+from aiohttp import (
+    ClientError,
+    ClientResponseError,
+    ClientSession,
+    ClientTimeout,
+)
+
+from .const import (
+    DEFAULT_CACHE_TTLS,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    TIER_ACCOUNT,
+    TIER_BALANCE,
+    TIER_PAYMENTS,
+    TIER_SAVINGS_GOALS,
+)
 
 BASE_URL = "https://api.starlingbank.com/api/v2"
 BASE_URL_SANDBOX = "https://api-sandbox.starlingbank.com/api/v2"
 
+# Reasons a request is counted as aborted.
+ABORT_TIMEOUT = "timeout"
+ABORT_CANCELLED = "cancelled"
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+# A goal photo in its response body, when written without JSON escapes.
+_PHOTO_PATTERN = re.compile(rb'"base64EncodedPhoto"\s*:\s*"([^"\\]*)"')
+
+# UIDs in endpoints, replaced so requests are grouped by endpoint template.
+_UID_PATTERN = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I
+)
+
+
+class StarlingApiError(Exception):
+    """Base class for errors raised by this client."""
+
+
+class CircuitOpenError(StarlingApiError):
+    """Requests are being refused while the API keeps failing."""
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Return an endpoint without its query and with UIDs replaced."""
+    return _UID_PATTERN.sub("{uid}", endpoint.partition("?")[0])
+
 
 def _url(endpoint: str, sandbox: bool = False) -> str:
     """Build a URL from the API's base URLs."""
@@ -18,14 +84,534 @@ def _url(endpoint: str, sandbox: bool = False) -> str:
     return "{0}{1}".format(url, endpoint)
 
 
-class SavingsGoal:
-    """Representation of a Savings Goal."""
+class LatencyHistogram:
+    """Durations counted into LATENCY_BUCKETS, with their total."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.last = None  # type: Optional[float]
+
+    @property
+    def count(self) -> int:
+        """Return the number of durations recorded."""
+        return sum(self.counts)
+
+    def record(self, seconds: float) -> None:
+        """Count one duration."""
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.last = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Summarise the histogram for diagnostics."""
+        count = self.count
+        return {
+            "count": count,
+            "mean": self.total / count if count else None,
+            "last": self.last,
+            "buckets": {
+                "le_{0}".format(bound): bucket_count
+                for bound, bucket_count in zip(LATENCY_BUCKETS, self.counts)
+            },
+        }
+
+
+class EndpointStats:
+    """Requests made to one endpoint template."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.attempts = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self.latency = LatencyHistogram()
+
+    @property
+    def retries(self) -> int:
+        """Return the attempts made beyond the first of each call."""
+        return self.attempts - self.calls
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Summarise the endpoint for diagnostics."""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "errors": self.errors,
+            "bytes_received": self.bytes_received,
+            "latency": self.latency.as_dict(),
+        }
+
+
+class RequestStats:
+    """Per-endpoint timings and counts of the requests sent by a client."""
+
+    def __init__(self) -> None:
+        self.endpoints = {}  # type: Dict[str, EndpointStats]
+
+    def _endpoint(self, endpoint: str) -> EndpointStats:
+        template = endpoint_template(endpoint)
+        stats = self.endpoints.get(template)
+        if stats is None:
+            stats = self.endpoints[template] = EndpointStats()
+        return stats
+
+    def record_call(self, endpoint: str) -> None:
+        """Count a call, however many attempts it takes."""
+        self._endpoint(endpoint).calls += 1
+
+    def record_attempt(
+        self, endpoint: str, seconds: float, size: int, error: bool
+    ) -> None:
+        """Record one attempt at sending a request."""
+        stats = self._endpoint(endpoint)
+        stats.attempts += 1
+        stats.errors += error
+        stats.bytes_received += size
+        stats.latency.record(seconds)
+
+    @property
+    def calls(self) -> int:
+        """Return the calls made to every endpoint."""
+        return sum(stats.calls for stats in self.endpoints.values())
+
+    @property
+    def retries(self) -> int:
+        """Return the retries made for every endpoint."""
+        return sum(stats.retries for stats in self.endpoints.values())
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Summarise every endpoint for diagnostics."""
+        return {
+            template: stats.as_dict()
+            for template, stats in sorted(self.endpoints.items())
+        }
+
+
+class ResponseCache:
+    """TTL cache for GET responses with a bounded LRU store per tier."""
+
+    def __init__(
+        self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 64
+    ) -> None:
+        self._ttls = {**DEFAULT_CACHE_TTLS, **(ttls or {})}
+        self._max_entries = max_entries
+        self._tiers = {
+            tier: OrderedDict() for tier in self._ttls
+        }  # type: Dict[str, OrderedDict]
+        self.hits = Counter()  # type: Counter[str]
+        self.misses = Counter()  # type: Counter[str]
+
+    def get(self, tier: str, endpoint: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh cached response, or None on a miss."""
+        entries = self._tiers.get(tier)
+        if not entries or endpoint not in entries:
+            self.misses[tier] += 1
+            return None
+
+        expires, response = entries[endpoint]
+        if expires <= monotonic():
+            del entries[endpoint]
+            self.misses[tier] += 1
+            return None
+
+        entries.move_to_end(endpoint)
+        self.hits[tier] += 1
+        return response
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        """Return the share of lookups served from the cache."""
+        lookups = sum(self.hits.values()) + sum(self.misses.values())
+        if not lookups:
+            return None
+        return sum(self.hits.values()) / lookups
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Summarise the cache for diagnostics."""
+        return {
+            tier: {
+                "ttl": self._ttls[tier],
+                "entries": len(entries),
+                "hits": self.hits[tier],
+                "misses": self.misses[tier],
+            }
+            for tier, entries in self._tiers.items()
+        }
+
+    def set(self, tier: str, endpoint: str, response: Dict[str, Any]) -> None:
+        """Store a response if its tier has caching enabled."""
+        ttl = self._ttls.get(tier, 0)
+        if ttl <= 0:
+            return
+
+        entries = self._tiers[tier]
+        entries[endpoint] = (monotonic() + ttl, response)
+        entries.move_to_end(endpoint)
+        while len(entries) > self._max_entries:
+            entries.popitem(last=False)
+
+    def invalidate(self, *tiers: str) -> None:
+        """Drop cached responses for the given tiers, or all tiers."""
+        for tier in tiers or self._tiers:
+            self._tiers[tier].clear()
+
+
+class TokenBucket:
+    """Request budget that refills at a steady rate up to a burst capacity."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Wait until a request may be sent and spend one token on it.
+
+        Returns the seconds spent waiting.
+        """
+        started = monotonic()
+        async with self._lock:
+            while True:
+                now = monotonic()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._updated) * self._rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return now - started
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class CircuitBreaker:
+    """Stop sending requests after repeated failures, then probe again.
+
+    After failure_threshold consecutive failures the circuit opens and
+    requests fail fast with CircuitOpenError. Once reset_timeout has passed
+    one request is let through; its outcome closes or re-opens the circuit.
+    """
 
     def __init__(
-        self, auth_headers: Dict, sandbox: bool, account_uid: str
+        self, failure_threshold: int = 5, reset_timeout: float = 300
     ) -> None:
-        self._auth_headers = auth_headers
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None  # type: Optional[float]
+
+    @property
+    def is_open(self) -> bool:
+        """Return whether requests are currently being refused."""
+        return (
+            self._opened_at is not None
+            and monotonic() - self._opened_at < self._reset_timeout
+        )
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if requests are being refused."""
+        if self.is_open:
+            raise CircuitOpenError("Starling API circuit breaker is open")
+        if self._opened_at is not None:
+            # Half open: let this request probe the API, and refuse others
+            # until it completes.
+            self._opened_at = monotonic()
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold."""
+        self._failures += 1
+        if self._failures >= self._failure_threshold:
+            self._opened_at = monotonic()
+
+
+class RequestScheduler:
+    """Rate limits, retries and circuit breaking for one API token.
+
+    Every request spends from a shared token bucket. A 429 is retried
+    after its Retry-After delay, and idempotent requests are also retried
+    on connection errors and 5xx responses, with jittered exponential
+    backoff in between.
+    """
+
+    def __init__(
+        self,
+        rate: float = 2,
+        burst: float = 10,
+        max_retries: int = 3,
+        backoff: float = 1,
+        max_backoff: float = 30,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self._bucket = TokenBucket(rate, burst)
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        # Time each attempt waited for the rate limit.
+        self.queued = LatencyHistogram()
+
+    async def run(
+        self, request: Callable[[], Awaitable[Any]], idempotent: bool
+    ) -> Any:
+        """Send a request, retrying it where that is safe."""
+        self.breaker.check()
+
+        attempt = 0
+        while True:
+            self.queued.record(await self._bucket.acquire())
+            try:
+                result = await request()
+            except ClientResponseError as err:
+                error = err
+                if err.status == HTTPStatus.TOO_MANY_REQUESTS:
+                    # Rejected before processing, so always safe to repeat.
+                    delay = _retry_after(err.headers) or self._delay(attempt)
+                elif err.status >= 500 and idempotent:
+                    delay = self._delay(attempt)
+                else:
+                    if err.status >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        # The API is up; the request itself was refused.
+                        self.breaker.record_success()
+                    raise
+            except (ClientError, asyncio.TimeoutError) as err:
+                error = err
+                if not idempotent:
+                    self.breaker.record_failure()
+                    raise
+                delay = self._delay(attempt)
+            else:
+                self.breaker.record_success()
+                return result
+
+            if attempt >= self._max_retries:
+                self.breaker.record_failure()
+                raise error
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(
+            0, min(self._max_backoff, self._backoff * 2 ** attempt)
+        )
+
+
+def _retry_after(headers: Any) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class StarlingApi:
+    """Authenticated transport shared by an account and its savings goals.
+
+    All requests go through the supplied aiohttp session so connections are
+    pooled and kept alive between calls. Each attempt is bounded by the
+    connect and read timeouts; requests that time out or are cancelled are
+    torn down with their connection and counted in aborted.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        api_token: str,
+        sandbox: bool = False,
+        cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ) -> None:
+        self._session = session
         self._sandbox = sandbox
+        self.cache = cache or ResponseCache()
+        self.scheduler = scheduler or RequestScheduler()
+        self._timeout = ClientTimeout(
+            total=connect_timeout + read_timeout,
+            sock_connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+        self.aborted = Counter()  # type: Counter[str]
+        self.stats = RequestStats()
+        self._in_flight = {}  # type: Dict[str, asyncio.Future]
+        self._auth_headers = {
+            "Authorization": "Bearer {0}".format(api_token),
+            "Content-Type": "application/json",
+        }
+
+    async def get(
+        self, endpoint: str, tier: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Perform a GET request and return the decoded JSON body.
+
+        Responses for endpoints in a cache tier are served from the cache
+        until that tier's TTL expires. Concurrent misses for the same
+        endpoint wait for one shared request.
+        """
+        if tier is None:
+            return await self._get(endpoint, tier)
+
+        cached = self.cache.get(tier, endpoint)
+        if cached is not None:
+            return cached
+
+        request = self._in_flight.get(endpoint)
+        if request is None:
+            request = self._in_flight[endpoint] = asyncio.ensure_future(
+                self._get(endpoint, tier)
+            )
+            request.add_done_callback(partial(self._request_done, endpoint))
+        # A cancelled caller must not cancel the request for the others.
+        return await asyncio.shield(request)
+
+    def _request_done(self, endpoint: str, request: asyncio.Future) -> None:
+        if self._in_flight.get(endpoint) is request:
+            del self._in_flight[endpoint]
+        if not request.cancelled():
+            # Mark the error as retrieved when every caller was cancelled.
+            request.exception()
+
+    async def _get(self, endpoint: str, tier: Optional[str]) -> Dict[str, Any]:
+        self.stats.record_call(endpoint)
+        body = await self.scheduler.run(
+            partial(self._request, "GET", endpoint), idempotent=True
+        )
+
+        if tier is not None:
+            self.cache.set(tier, endpoint, body)
+        return body
+
+    async def get_raw(self, endpoint: str) -> bytes:
+        """Perform a GET request and return the body without decoding it.
+
+        For large responses that callers pick apart themselves, so no
+        decoded copy of the body is made.
+        """
+        self.stats.record_call(endpoint)
+        return await self.scheduler.run(
+            partial(self._request, "GET", endpoint, raw=True), idempotent=True
+        )
+
+    async def put(
+        self, endpoint: str, body: Dict[str, Any], idempotent: bool = False
+    ) -> Dict[str, Any]:
+        """Perform a PUT request and return the decoded JSON body.
+
+        Writes move money around, so cached balances and goals are dropped.
+        Pass idempotent for endpoints keyed by a client-chosen UID, which
+        the API applies at most once, so they can be retried safely.
+        """
+        self.stats.record_call(endpoint)
+        result = await self.scheduler.run(
+            partial(self._request, "PUT", endpoint, body), idempotent=idempotent
+        )
+
+        self.cache.invalidate(TIER_BALANCE, TIER_SAVINGS_GOALS)
+        # Requests sent before the write are not shared with later callers.
+        self._in_flight.clear()
+        return result
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        body: Optional[Dict] = None,
+        raw: bool = False,
+    ) -> Any:
+        started = monotonic()
+        size = 0
+        error = True
+        try:
+            async with self._session.request(
+                method,
+                _url(endpoint, self._sandbox),
+                headers=self._auth_headers,
+                json=body,
+                raise_for_status=True,
+                timeout=self._timeout,
+            ) as response:
+                content = await response.read()
+                size = len(content)
+                result = (
+                    content if raw else await response.json(content_type=None)
+                )
+                error = False
+                return result
+        except asyncio.TimeoutError:
+            self.aborted[ABORT_TIMEOUT] += 1
+            raise
+        except asyncio.CancelledError:
+            # Leaving the context manager has already closed the connection.
+            self.aborted[ABORT_CANCELLED] += 1
+            raise
+        finally:
+            self.stats.record_attempt(endpoint, monotonic() - started, size, error)
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Return the client's instrumentation, without credentials."""
+        return {
+            "endpoints": self.stats.as_dict(),
+            "cache": self.cache.as_dict(),
+            "queued": self.scheduler.queued.as_dict(),
+            "circuit_open": self.scheduler.breaker.is_open,
+            "aborted": dict(self.aborted),
+        }
+
+
+class GoalChanges(NamedTuple):
+    """UIDs of the savings goals a response added, removed and changed."""
+
+    added: FrozenSet[str] = frozenset()
+    removed: FrozenSet[str] = frozenset()
+    changed: FrozenSet[str] = frozenset()
+
+    def __or__(self, other: "GoalChanges") -> "GoalChanges":
+        return GoalChanges(
+            self.added | other.added,
+            self.removed | other.removed,
+            self.changed | other.changed,
+        )
+
+
+class AsyncSavingsGoal:
+    """Representation of a Savings Goal.
+
+    revision increases whenever the goal's values change, so callers can
+    tell whether a goal needs rebuilding without comparing its fields.
+    """
+
+    __slots__ = (
+        "_api",
+        "_account_uid",
+        "uid",
+        "name",
+        "target_currency",
+        "target_minor_units",
+        "total_saved_currency",
+        "total_saved_minor_units",
+        "revision",
+    )
+
+    def __init__(self, api: StarlingApi, account_uid: str) -> None:
+        self._api = api
         self._account_uid = account_uid
 
         self.uid = None
@@ -34,127 +620,279 @@ class SavingsGoal:
         self.target_minor_units = None
         self.total_saved_currency = None
         self.total_saved_minor_units = None
+        self.revision = 0
 
-    def update(self, goal: Dict = None) -> None:
+    async def update(self, goal: Dict = None) -> None:
         """Update a single savings goals data."""
         if goal is None:
-            endpoint = "/account/{0}/savings-goals/{1}".format(
-                self._account_uid, self.uid
-            )
+            goal = await self.fetch()
 
-            response = get(
-                _url(endpoint, self._sandbox), headers=self._auth_headers
-            )
-            response.raise_for_status()
-            goal = response.json()
+        self._apply(goal)
 
-        self.uid = goal.get("savingsGoalUid")
-        self.name = goal.get("name")
+    async def fetch(self) -> Dict[str, Any]:
+        """Request this savings goal without applying it."""
+        return await self._api.get(
+            "/account/{0}/savings-goals/{1}".format(
+                self._account_uid, self.uid
+            ),
+            TIER_SAVINGS_GOALS,
+        )
 
+    def _apply(self, goal: Dict) -> bool:
+        """Apply a goal response, returning whether anything changed."""
         target = goal.get("target", {})
-        self.target_currency = target.get("currency")
-        self.target_minor_units = target.get("minorUnits")
-
         total_saved = goal.get("totalSaved", {})
-        self.total_saved_currency = total_saved.get("currency")
-        self.total_saved_minor_units = total_saved.get("minorUnits")
-
-    def deposit(self, deposit_minor_units: int) -> None:
-        """Add funds to a savings goal."""
-        endpoint = "/account/{0}/savings-goals/{1}/add-money/{2}".format(
-            self._account_uid, self.uid, uuid4()
+        values = (
+            goal.get("savingsGoalUid"),
+            goal.get("name"),
+            target.get("currency"),
+            target.get("minorUnits"),
+            total_saved.get("currency"),
+            total_saved.get("minorUnits"),
         )
+        if values == (
+            self.uid,
+            self.name,
+            self.target_currency,
+            self.target_minor_units,
+            self.total_saved_currency,
+            self.total_saved_minor_units,
+        ):
+            return False
 
-        body = {
-            "amount": {
-                "currency": self.total_saved_currency,
-                "minorUnits": deposit_minor_units,
-            }
-        }
+        (
+            self.uid,
+            self.name,
+            self.target_currency,
+            self.target_minor_units,
+            self.total_saved_currency,
+            self.total_saved_minor_units,
+        ) = values
+        self.revision += 1
+        return True
 
-        response = put(
-            _url(endpoint, self._sandbox),
-            headers=self._auth_headers,
-            data=json_dumps(body),
-        )
-        response.raise_for_status()
+    async def deposit(
+        self, deposit_minor_units: int, transfer_uid: Optional[str] = None
+    ) -> None:
+        """Add funds to a savings goal.
 
-        self.update()
+        Starling applies a transfer UID once, so callers that may repeat a
+        transfer can pass the same UID each time.
+        """
+        await self._transfer("add-money", deposit_minor_units, transfer_uid)
+        self._adjust_total(deposit_minor_units)
 
-    def withdraw(self, withdraw_minor_units: int) -> None:
+    async def withdraw(
+        self, withdraw_minor_units: int, transfer_uid: Optional[str] = None
+    ) -> None:
         """Withdraw funds from a savings goal."""
-        endpoint = "/account/{0}/savings-goals/{1}/withdraw-money/{2}".format(
-            self._account_uid, self.uid, uuid4()
+        await self._transfer("withdraw-money", withdraw_minor_units, transfer_uid)
+        self._adjust_total(-withdraw_minor_units)
+
+    def _adjust_total(self, minor_units: int) -> None:
+        # A successful transfer moves exactly this amount, so the new total
+        # is known without requesting the goal again.
+        if self.total_saved_minor_units is not None:
+            self.total_saved_minor_units += minor_units
+            self.revision += 1
+
+    async def _transfer(
+        self, action: str, minor_units: int, transfer_uid: Optional[str] = None
+    ) -> None:
+        # The transfer UID is the idempotency key, and stays the same for
+        # every retry of this transfer.
+        endpoint = "/account/{0}/savings-goals/{1}/{2}/{3}".format(
+            self._account_uid, self.uid, action, transfer_uid or uuid4()
         )
 
         body = {
             "amount": {
                 "currency": self.total_saved_currency,
-                "minorUnits": withdraw_minor_units,
+                "minorUnits": minor_units,
             }
         }
 
-        response = put(
-            _url(endpoint, self._sandbox),
-            headers=self._auth_headers,
-            data=json_dumps(body),
+        await self._api.put(endpoint, body, idempotent=True)
+
+    async def get_image(self) -> bytes:
+        """Download the photo associated with a Savings Goal."""
+        return b64decode(await self.fetch_photo())
+
+    async def fetch_photo(self) -> memoryview:
+        """Download the goal's photo, still base64 encoded.
+
+        The encoded photo is a view into the response body rather than a
+        copy, so only the body itself is held in memory. Raises KeyError
+        when the goal has no photo.
+        """
+        content = await self._api.get_raw(
+            "/account/{0}/savings-goals/{1}/photo".format(
+                self._account_uid, self.uid
+            )
         )
-        response.raise_for_status()
+        match = _PHOTO_PATTERN.search(content)
+        if match is not None:
+            return memoryview(content)[match.start(1):match.end(1)]
+        # Escaped characters, or no photo: decode the body the slow way.
+        return memoryview(json.loads(content)["base64EncodedPhoto"].encode())
 
-        self.update()
 
-    def get_image(self, filename: str = None) -> None:
-        """Download the photo associated with a Savings Goal."""
-        if filename is None:
-            filename = "{0}.png".format(self.name)
+class AsyncStarlingAccount:
+    """Representation of a Starling Account."""
+
+    async def update_account_data(self) -> None:
+        """Get basic information for the account."""
+        self._apply_account_data(await self.fetch_account_data())
+
+    async def update_balance_data(self) -> None:
+        """Get the latest balance information for the account."""
+        self.apply_balance_data(await self.fetch_balance_data())
+
+    async def update_savings_goal_data(self) -> GoalChanges:
+        """Get the latest savings goal information for the account."""
+        return self.apply_savings_goal_data(await self.fetch_savings_goal_data())
+
+    async def refresh(
+        self,
+        account: bool = False,
+        balance: bool = True,
+        savings_goals: bool = True,
+        savings_goal_uids: Iterable[str] = (),
+    ) -> GoalChanges:
+        """Fetch the requested endpoints concurrently and apply them together.
+
+        savings_goals fetches the whole goal list, while savings_goal_uids
+        fetches only the given known goals from the per-goal endpoint.
+        Nothing is applied unless every request succeeds, so a failed
+        refresh never leaves the account half updated. Returns the goals
+        that were added, removed or changed.
+        """
+        pending = []
+        if account:
+            pending.append((self._apply_account_data, self.fetch_account_data()))
+        if balance:
+            pending.append((self.apply_balance_data, self.fetch_balance_data()))
+        if savings_goals:
+            pending.append(
+                (self.apply_savings_goal_data, self.fetch_savings_goal_data())
+            )
+        else:
+            for uid in savings_goal_uids:
+                pending.append(
+                    (
+                        partial(self._apply_single_savings_goal, uid),
+                        self._fetch_single_savings_goal(uid),
+                    )
+                )
 
-        endpoint = "/account/{0}/savings-goals/{1}/photo".format(
-            self._account_uid, self.uid
+        responses = await asyncio.gather(*(fetch for _, fetch in pending))
+
+        changes = GoalChanges()
+        for (apply, _), response in zip(pending, responses):
+            result = apply(response)
+            if result is not None:
+                changes |= result
+        return changes
+
+    async def fetch_account_data(self) -> Dict[str, Any]:
+        """Request the account identifiers without applying them."""
+        return await self._api.get(
+            "/accounts/{0}/identifiers".format(self._account_uid),
+            TIER_ACCOUNT,
         )
 
-        response = get(
-            _url(endpoint, self._sandbox), headers=self._auth_headers
+    async def fetch_balance_data(self) -> Dict[str, Any]:
+        """Request the account balance without applying it."""
+        return await self._api.get(
+            "/accounts/{0}/balance".format(self._account_uid),
+            TIER_BALANCE,
         )
-        response.raise_for_status()
 
-        base64_image = response.json()["base64EncodedPhoto"]
-        with open(filename, "wb") as file:
-            file.write(b64decode(base64_image))
+    async def fetch_savings_goal_data(self) -> Dict[str, Any]:
+        """Request the savings goal list without applying it."""
+        return await self._api.get(
+            "/account/{0}/savings-goals".format(self._account_uid),
+            TIER_SAVINGS_GOALS,
+        )
 
+    async def fetch_feed_changes(self, changes_since: str) -> List[Dict]:
+        """Get feed items in the default category changed since a time."""
+        response = await self._api.get(
+            "/feed/account/{0}/category/{1}?changesSince={2}".format(
+                self._account_uid,
+                self.default_category,
+                quote(changes_since),
+            )
+        )
+        return response.get("feedItems", [])
 
-class StarlingAccount:
-    """Representation of a Starling Account."""
+    async def fetch_feed_between(self, start: str, end: str) -> List[Dict]:
+        """Get feed items in the default category made between two times."""
+        response = await self._api.get(
+            "/feed/account/{0}/category/{1}/transactions-between"
+            "?minTransactionTimestamp={2}&maxTransactionTimestamp={3}".format(
+                self._account_uid,
+                self.default_category,
+                quote(start),
+                quote(end),
+            )
+        )
+        return response.get("feedItems", [])
 
-    def update_account_data(self) -> None:
-        """Get basic information for the account."""
-        response = get(
-            _url(
-                "/accounts/{0}/identifiers".format(self._account_uid),
-                self._sandbox,
+    async def fetch_standing_orders(self) -> List[Dict]:
+        """Get the standing orders paid from the default category."""
+        response = await self._api.get(
+            "/payments/local/account/{0}/category/{1}/standing-orders".format(
+                self._account_uid, self.default_category
             ),
-            headers=self._auth_headers,
+            TIER_PAYMENTS,
         )
-        response.raise_for_status()
+        return response.get("standingOrders", [])
+
+    async def fetch_direct_debit_mandates(self) -> List[Dict]:
+        """Get the direct debit mandates of this account."""
+        response = await self._api.get("/direct-debit/mandates", TIER_PAYMENTS)
+        return [
+            mandate
+            for mandate in response.get("mandates", [])
+            if mandate.get("accountUid") in (None, self._account_uid)
+        ]
+
+    async def fetch_payees(self) -> List[Dict]:
+        """Get the payees saved for the account holder."""
+        response = await self._api.get("/payees", TIER_PAYMENTS)
+        return response.get("payees", [])
+
+    async def _fetch_single_savings_goal(
+        self, uid: str
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.savings_goals[uid].fetch()
+        except ClientResponseError as err:
+            # The goal has been deleted since the last full list.
+            if err.status == HTTPStatus.NOT_FOUND:
+                return None
+            raise
 
-        response = response.json()
+    def _apply_single_savings_goal(
+        self, uid: str, goal: Optional[Dict[str, Any]]
+    ) -> GoalChanges:
+        if goal is None:
+            if self.savings_goals.pop(uid, None) is None:
+                return GoalChanges()
+            return GoalChanges(removed=frozenset((uid,)))
+        if self.savings_goals[uid]._apply(goal):
+            return GoalChanges(changed=frozenset((uid,)))
+        return GoalChanges()
 
+    def _apply_account_data(self, response: Dict[str, Any]) -> None:
         self.account_identifier = response.get("accountIdentifier")
         self.bank_identifier = response.get("bankIdentifier")
         self.iban = response.get("iban")
         self.bic = response.get("bic")
 
-    def update_balance_data(self) -> None:
-        """Get the latest balance information for the account."""
-        response = get(
-            _url(
-                "/accounts/{0}/balance".format(self._account_uid),
-                self._sandbox,
-            ),
-            headers=self._auth_headers,
-        )
-        response.raise_for_status()
-
-        response = response.json()
+    def apply_balance_data(self, response: Dict[str, Any]) -> None:
+        """Apply a balance response, from a refresh or a pushed event."""
         self.cleared_balance = response["clearedBalance"]["minorUnits"]
         self.effective_balance = response["effectiveBalance"]["minorUnits"]
         self.pending_transactions = response["pendingTransactions"][
@@ -162,67 +900,121 @@ class StarlingAccount:
         ]
         self.accepted_overdraft = response["acceptedOverdraft"]["minorUnits"]
 
-    def update_savings_goal_data(self) -> None:
-        """Get the latest savings goal information for the account."""
-        response = get(
-            _url(
-                "/account/{0}/savings-goals".format(self._account_uid),
-                self._sandbox,
-            ),
-            headers=self._auth_headers,
-        )
-        response.raise_for_status()
+    def apply_savings_goal_data(self, response: Dict[str, Any]) -> GoalChanges:
+        """Apply a savings goal list response, adding and removing goals."""
+        returned = {
+            goal.get("savingsGoalUid"): goal
+            for goal in response.get("savingsGoalList", ())
+        }
+        added = returned.keys() - self.savings_goals.keys()
+        removed = self.savings_goals.keys() - returned.keys()
 
-        response = response.json()
-        response_savings_goals = response.get("savingsGoalList", {})
+        # Forget about savings goals if the UID isn't returned by Starling
+        for uid in removed:
+            del self.savings_goals[uid]
 
-        returned_uids = []
+        changed = set()
+        for uid, goal in returned.items():
+            savings_goal = self.savings_goals.get(uid)
+            if savings_goal is None:
+                savings_goal = self.savings_goals[uid] = AsyncSavingsGoal(
+                    self._api, self._account_uid
+                )
+            if savings_goal._apply(goal) and uid not in added:
+                changed.add(uid)
 
-        # New / Update
-        for goal in response_savings_goals:
-            uid = goal.get("savingsGoalUid")
-            returned_uids.append(uid)
+        return GoalChanges(frozenset(added), frozenset(removed), frozenset(changed))
 
-            # Intiialise new _SavingsGoal object if new
-            if uid not in self.savings_goals:
-                self.savings_goals[uid] = SavingsGoal(
-                    self._auth_headers, self._sandbox, self._account_uid
-                )
+    @property
+    def account_uid(self) -> Optional[str]:
+        """Return the UID of the account."""
+        return self._account_uid
 
-            self.savings_goals[uid].update(goal)
+    @property
+    def api(self) -> StarlingApi:
+        """Return the transport this account's requests are sent through."""
+        return self._api
 
-        # Forget about savings goals if the UID isn't returned by Starling
-        for uid in list(self.savings_goals):
-            if uid not in returned_uids:
-                self.savings_goals.pop(uid)
+    @property
+    def basic_account_data(self) -> Dict[str, Any]:
+        """Return the basic account data in the /accounts response format."""
+        return {
+            "accountUid": self._account_uid,
+            "currency": self.currency,
+            "createdAt": self.created_at,
+            "defaultCategory": self.default_category,
+            "accountType": self.account_type,
+            "name": self.name,
+        }
 
-    def _set_basic_account_data(self):
-        response = get(
-            _url("/accounts", self._sandbox), headers=self._auth_headers
-        )
-        response.raise_for_status()
+    async def async_setup(self) -> None:
+        """Fetch the account UID and other basic account data.
+
+        Only the first account is used; async_discover returns all of them.
+        """
+        response = await self._api.get("/accounts", TIER_ACCOUNT)
+
+        self.restore(response["accounts"][0])
+
+    @classmethod
+    async def async_discover(
+        cls, api: StarlingApi
+    ) -> List["AsyncStarlingAccount"]:
+        """Return every account the token can access, sharing one transport.
 
-        response = response.json()
+        This covers joint, additional currency and business accounts as
+        well as the primary account.
+        """
+        response = await api.get("/accounts", TIER_ACCOUNT)
 
-        # Assume there will be only 1 account as this is the case with
-        # personal access.
-        account = response["accounts"][0]
+        return [
+            cls.from_account_data(api, account)
+            for account in response["accounts"]
+        ]
+
+    @classmethod
+    def from_account_data(
+        cls, api: StarlingApi, account: Dict[str, Any]
+    ) -> "AsyncStarlingAccount":
+        """Create an account on a shared transport from known basic data."""
+        instance = cls(api=api)
+        instance.restore(account)
+        return instance
 
+    def restore(self, account: Dict[str, Any]) -> None:
+        """Set basic account data, e.g. saved from basic_account_data.
+
+        This replaces async_setup when the data is already known.
+        """
         self._account_uid = account["accountUid"]
         self.currency = account["currency"]
         self.created_at = account["createdAt"]
+        self.default_category = account.get("defaultCategory")
+        self.account_type = account.get("accountType")
+        self.name = account.get("name")
 
     def __init__(
-        self, api_token: str, update: bool = False, sandbox: bool = False
+        self,
+        session: Optional[ClientSession] = None,
+        api_token: Optional[str] = None,
+        sandbox: bool = False,
+        cache_ttls: Optional[Dict[str, float]] = None,
+        api: Optional[StarlingApi] = None,
     ) -> None:
-        """Call to initialise a StarlingAccount object."""
-        self._api_token = api_token
-        self._sandbox = sandbox
-        self._auth_headers = {
-            "Authorization": "Bearer {0}".format(self._api_token),
-            "Content-Type": "application/json",
-        }
-        self._set_basic_account_data()
+        """Call to initialise an AsyncStarlingAccount object.
+
+        Pass api to share a transport, and its cache, between accounts.
+        No requests are made until async_setup is awaited.
+        """
+        self._api = api or StarlingApi(
+            session, api_token, sandbox, ResponseCache(cache_ttls)
+        )
+        self._account_uid = None
+        self.currency = None
+        self.created_at = None
+        self.default_category = None
+        self.account_type = None
+        self.name = None
 
         # Account Data
         self.account_identifier = None
@@ -236,10 +1028,100 @@ class StarlingAccount:
         self.pending_transactions = None
         self.accepted_overdraft = None
 
+        # Savings Goals Data
+        self.savings_goals = {}  # type: Dict[str, AsyncSavingsGoal]
+
+
+async def _new_session() -> ClientSession:
+    """Create a session inside the running loop, as aiohttp requires."""
+    return ClientSession()
+
+
+class SavingsGoal:
+    """Blocking wrapper around AsyncSavingsGoal."""
+
+    def __init__(self, account: StarlingAccount, goal: AsyncSavingsGoal) -> None:
+        self._account = account
+        self._goal = goal
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._goal, name)
+
+    def update(self, goal: Dict = None) -> None:
+        """Update a single savings goals data."""
+        self._account._run(self._goal.update(goal))
+
+    def deposit(self, deposit_minor_units: int) -> None:
+        """Add funds to a savings goal."""
+        self._account._run(self._goal.deposit(deposit_minor_units))
+
+    def withdraw(self, withdraw_minor_units: int) -> None:
+        """Withdraw funds from a savings goal."""
+        self._account._run(self._goal.withdraw(withdraw_minor_units))
+
+    def get_image(self, filename: str = None) -> None:
+        """Download the photo associated with a Savings Goal."""
+        if filename is None:
+            filename = "{0}.png".format(self.name)
+
+        image = self._account._run(self._goal.get_image())
+        with open(filename, "wb") as file:
+            file.write(image)
+
+
+class StarlingAccount:
+    """Blocking wrapper around AsyncStarlingAccount.
+
+    Runs the async client on a private event loop so callers without a
+    running loop can keep using the original synchronous API.
+    """
+
+    def __init__(
+        self, api_token: str, update: bool = False, sandbox: bool = False
+    ) -> None:
+        """Call to initialise a StarlingAccount object."""
+        self._loop = asyncio.new_event_loop()
+        self._session = self._run(_new_session())
+        self._account = AsyncStarlingAccount(
+            self._session, api_token, sandbox
+        )
+        self._run(self._account.async_setup())
+
         # Savings Goals Data
         self.savings_goals = {}  # type: Dict[str, SavingsGoal]
 
         if update:
             self.update_account_data()
             self.update_balance_data()
-            self.update_savings_goal_data()
\ No newline at end of file
+            self.update_savings_goal_data()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._account, name)
+
+    def _run(self, coro) -> Any:
+        return self._loop.run_until_complete(coro)
+
+    def update_account_data(self) -> None:
+        """Get basic information for the account."""
+        self._run(self._account.update_account_data())
+
+    def update_balance_data(self) -> None:
+        """Get the latest balance information for the account."""
+        self._run(self._account.update_balance_data())
+
+    def update_savings_goal_data(self) -> None:
+        """Get the latest savings goal information for the account."""
+        self._run(self._account.update_savings_goal_data())
+        self.savings_goals = {
+            uid: self.savings_goals.get(uid) or SavingsGoal(self, goal)
+            for uid, goal in self._account.savings_goals.items()
+        }
+
+    def close(self) -> None:
+        """Close the underlying session and event loop."""
+        self._run(self._session.close())
+        self._loop.close()
@@ -1,20 +1,56 @@
 """Config flow for Starling Bank integration."""
 import voluptuous as vol
 
+from homeassistant.components import webhook
 from homeassistant.const import CONF_TOKEN, CONF_NAME
 import homeassistant.helpers.config_validation as cv
-from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
+from homeassistant.config_entries import (
+    ConfigEntry,
+    ConfigFlow,
+    ConfigFlowResult,
+    OptionsFlow,
+)
+from homeassistant.core import callback
+from homeassistant.helpers.selector import ObjectSelector
 from typing import Any
 
 from .const import (
     DOMAIN,
+    CONF_CACHE_TTL_ACCOUNT,
+    CONF_CACHE_TTL_SAVINGS_GOALS,
+    CONF_CACHE_TTL_BALANCE,
+    DEFAULT_CACHE_TTLS,
+    CONF_CONNECT_TIMEOUT,
+    CONF_READ_TIMEOUT,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    CONF_WEBHOOK_ID,
+    CONF_WEBHOOK_PUBLIC_KEY,
+    CONF_SWEEP_RULES,
+    TIER_ACCOUNT,
+    TIER_SAVINGS_GOALS,
+    TIER_BALANCE,
 )
 
+SECONDS = vol.All(vol.Coerce(int), vol.Range(min=0))
+INTERVAL_SECONDS = vol.All(vol.Coerce(int), vol.Range(min=30))
+TIMEOUT_SECONDS = vol.All(vol.Coerce(int), vol.Range(min=1, max=60))
+
 class StarlingConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Starling Bank."""
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Get the options flow for this handler."""
+        return StarlingOptionsFlow()
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
@@ -37,4 +73,107 @@ class StarlingConfigFlow(ConfigFlow, domain=DOMAIN):
                 }
             ),
             errors=errors,
-        )
\ No newline at end of file
+        )
+
+class StarlingOptionsFlow(OptionsFlow):
+    """Handle Starling Bank options."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Manage caching, timeouts, polling and push updates."""
+        errors = {}
+        options = self.config_entry.options
+
+        if user_input is not None:
+            public_key = user_input.get(CONF_WEBHOOK_PUBLIC_KEY, "").strip()
+            user_input[CONF_WEBHOOK_PUBLIC_KEY] = public_key
+            if public_key:
+                from .webhook import load_public_key
+
+                try:
+                    load_public_key(public_key)
+                except ValueError:
+                    errors[CONF_WEBHOOK_PUBLIC_KEY] = "invalid_public_key"
+
+            if (
+                user_input[CONF_MAX_UPDATE_INTERVAL]
+                < user_input[CONF_MIN_UPDATE_INTERVAL]
+            ):
+                errors[CONF_MAX_UPDATE_INTERVAL] = "max_below_min"
+
+            if user_input.get(CONF_SWEEP_RULES):
+                from .sweeps import compile_rules
+
+                try:
+                    compile_rules(user_input[CONF_SWEEP_RULES])
+                except vol.Invalid:
+                    errors[CONF_SWEEP_RULES] = "invalid_sweep_rules"
+
+            if not errors:
+                user_input[CONF_WEBHOOK_ID] = options.get(
+                    CONF_WEBHOOK_ID
+                ) or webhook.async_generate_id()
+                return self.async_create_entry(data=user_input)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_CACHE_TTL_ACCOUNT,
+                        default=options.get(
+                            CONF_CACHE_TTL_ACCOUNT, DEFAULT_CACHE_TTLS[TIER_ACCOUNT]
+                        ),
+                    ): SECONDS,
+                    vol.Optional(
+                        CONF_CACHE_TTL_SAVINGS_GOALS,
+                        default=options.get(
+                            CONF_CACHE_TTL_SAVINGS_GOALS,
+                            DEFAULT_CACHE_TTLS[TIER_SAVINGS_GOALS],
+                        ),
+                    ): SECONDS,
+                    vol.Optional(
+                        CONF_CACHE_TTL_BALANCE,
+                        default=options.get(
+                            CONF_CACHE_TTL_BALANCE, DEFAULT_CACHE_TTLS[TIER_BALANCE]
+                        ),
+                    ): SECONDS,
+                    vol.Optional(
+                        CONF_CONNECT_TIMEOUT,
+                        default=options.get(
+                            CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT
+                        ),
+                    ): TIMEOUT_SECONDS,
+                    vol.Optional(
+                        CONF_READ_TIMEOUT,
+                        default=options.get(
+                            CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT
+                        ),
+                    ): TIMEOUT_SECONDS,
+                    vol.Optional(
+                        CONF_MIN_UPDATE_INTERVAL,
+                        default=options.get(
+                            CONF_MIN_UPDATE_INTERVAL,
+                            int(DEFAULT_MIN_UPDATE_INTERVAL.total_seconds()),
+                        ),
+                    ): INTERVAL_SECONDS,
+                    vol.Optional(
+                        CONF_MAX_UPDATE_INTERVAL,
+                        default=options.get(
+                            CONF_MAX_UPDATE_INTERVAL,
+                            int(DEFAULT_MAX_UPDATE_INTERVAL.total_seconds()),
+                        ),
+                    ): INTERVAL_SECONDS,
+                    vol.Optional(
+                        CONF_WEBHOOK_PUBLIC_KEY,
+                        default=options.get(CONF_WEBHOOK_PUBLIC_KEY, ""),
+                    ): str,
+                    vol.Optional(
+                        CONF_SWEEP_RULES,
+                        default=options.get(CONF_SWEEP_RULES, []),
+                    ): ObjectSelector(),
+                }
+            ),
+            errors=errors,
+        )
@@ -1,6 +1,72 @@
 """Constants used for starlingbank."""
+from datetime import timedelta
+
+from .api.const import (
+    DEFAULT_CACHE_TTLS,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    TIER_ACCOUNT,
+    TIER_BALANCE,
+    TIER_SAVINGS_GOALS,
+)
 
 DOMAIN = "starlingbank"
 
+# Coordinator data keys of accounts start with this; spaces are keyed by UID.
+MASTER = "MASTER"
+
+
+def master_idx(account_uid: str) -> str:
+    """Return the coordinator data key for an account."""
+    return f"{MASTER}_{account_uid}"
+
 SERVICE_SPACE_DEPOSIT = "space_deposit"
-SERVICE_SPACE_WITHDRAW = "space_withdraw"
\ No newline at end of file
+SERVICE_SPACE_WITHDRAW = "space_withdraw"
+SERVICE_SPACE_TRANSFERS = "space_transfers"
+SERVICE_EXPORT_TRANSACTIONS = "export_transactions"
+SERVICE_SEARCH_TRANSACTIONS = "search_transactions"
+
+EXPORT_FORMAT_CSV = "csv"
+EXPORT_FORMAT_JSONL = "jsonl"
+
+CONF_CACHE_TTL_ACCOUNT = "cache_ttl_account"
+CONF_CACHE_TTL_SAVINGS_GOALS = "cache_ttl_savings_goals"
+CONF_CACHE_TTL_BALANCE = "cache_ttl_balance"
+
+# The tier whose TTL each option sets; defaults are in DEFAULT_CACHE_TTLS.
+CACHE_TTL_OPTIONS = {
+    CONF_CACHE_TTL_ACCOUNT: TIER_ACCOUNT,
+    CONF_CACHE_TTL_SAVINGS_GOALS: TIER_SAVINGS_GOALS,
+    CONF_CACHE_TTL_BALANCE: TIER_BALANCE,
+}
+
+CONF_CONNECT_TIMEOUT = "connect_timeout"
+CONF_READ_TIMEOUT = "read_timeout"
+
+CONF_MIN_UPDATE_INTERVAL = "min_update_interval"
+CONF_MAX_UPDATE_INTERVAL = "max_update_interval"
+
+# Polling starts at the minimum and backs off towards the maximum while
+# nothing changes.
+DEFAULT_MIN_UPDATE_INTERVAL = timedelta(minutes=1)
+DEFAULT_MAX_UPDATE_INTERVAL = timedelta(minutes=30)
+
+# Rules moving money into spaces, as configured; see sweeps.py.
+CONF_SWEEP_RULES = "sweep_rules"
+
+# Standing orders and direct debits change rarely, so they are refreshed
+# separately and far less often than balances.
+PAYMENTS_UPDATE_INTERVAL = timedelta(hours=6)
+
+# The client diagnostics change with every request, including failed ones
+# that leave the coordinator data as it was, so they are written on a timer.
+CLIENT_SENSOR_UPDATE_INTERVAL = timedelta(minutes=1)
+
+CONF_WEBHOOK_ID = "webhook_id"
+CONF_WEBHOOK_PUBLIC_KEY = "webhook_public_key"
+
+# Polling is only a consistency fallback while webhooks push updates.
+WEBHOOK_FALLBACK_INTERVAL = timedelta(minutes=30)
+
+# hass.data key for the clients shared by config entries with the same token.
+DATA_SHARED_CLIENTS = f"{DOMAIN}_shared_clients"
@@ -0,0 +1,28 @@
+"""Diagnostics support for Starling Bank."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_TOKEN
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_WEBHOOK_ID
+from .starling_update_coordinator import StarlingUpdateCoordinator
+
+TO_REDACT = {CONF_TOKEN, CONF_WEBHOOK_ID}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: StarlingUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "coordinator": coordinator.diagnostics(),
+        "accounts": len(coordinator.starling_client.accounts),
+        "spaces": len(coordinator.starling_client.spaces),
+    }
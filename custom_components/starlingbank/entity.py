@@ -1,7 +1,14 @@
 """Support for Starling sensors."""
 from __future__ import annotations
 
+from collections.abc import Callable, Iterable
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
     DataUpdateCoordinator,
@@ -9,7 +16,8 @@ from homeassistant.helpers.update_coordinator import (
 from typing import Any
 
 from .const import (
-    DOMAIN
+    DOMAIN,
+    MASTER,
 )
 
 
@@ -45,7 +53,97 @@ class StarlingBaseEntity(CoordinatorEntity):
             name=f'{account_name} {self.data.name}',
         )
 
+    @property
+    def available(self) -> bool:
+        """Return False once the space or account has gone."""
+        return super().available and self.idx in self.coordinator.data
+
     @property
     def data(self) -> dict[str, Any]:
         """Shortcut to access coordinator data for the entity."""
         return self.coordinator.data[self.idx]
+
+@callback
+def async_track_spaces(
+    coordinator: DataUpdateCoordinator,
+    config_entry: ConfigEntry,
+    account_name: str,
+    async_add_entities: AddEntitiesCallback,
+    create_entities: Callable[[str], Iterable[Entity]],
+) -> None:
+    """Add entities for spaces as they appear and remove deleted spaces.
+
+    create_entities returns the entities for the space with a given idx.
+    Spaces are compared as sets of keys, so each update costs the same
+    however many spaces are unchanged.
+    """
+    _async_track(
+        coordinator,
+        config_entry,
+        account_name,
+        async_add_entities,
+        create_entities,
+        lambda idx: not idx.startswith(MASTER),
+    )
+
+@callback
+def async_track_accounts(
+    coordinator: DataUpdateCoordinator,
+    config_entry: ConfigEntry,
+    account_name: str,
+    async_add_entities: AddEntitiesCallback,
+    create_entities: Callable[[str], Iterable[Entity]],
+) -> None:
+    """Add entities for accounts as they are opened and remove closed ones.
+
+    create_entities returns the entities for the account with a given idx.
+    """
+    _async_track(
+        coordinator,
+        config_entry,
+        account_name,
+        async_add_entities,
+        create_entities,
+        lambda idx: idx.startswith(MASTER),
+    )
+
+@callback
+def _async_track(
+    coordinator: DataUpdateCoordinator,
+    config_entry: ConfigEntry,
+    account_name: str,
+    async_add_entities: AddEntitiesCallback,
+    create_entities: Callable[[str], Iterable[Entity]],
+    tracked: Callable[[str], bool],
+) -> None:
+    """Keep one device of entities for each tracked idx in the data."""
+    known: set[str] = set()
+
+    @callback
+    def _async_update() -> None:
+        if coordinator.data is None:
+            return
+        current = {idx for idx in coordinator.data if tracked(idx)}
+        added = current - known
+        removed = known - current
+        known.difference_update(removed)
+        known.update(added)
+
+        if added:
+            async_add_entities(
+                entity for idx in sorted(added) for entity in create_entities(idx)
+            )
+
+        device_registry = dr.async_get(coordinator.hass)
+        for idx in removed:
+            # Removing the device removes its entities with it.
+            device = device_registry.async_get_device(
+                identifiers={(DOMAIN, f'{idx}{account_name}')}
+            )
+            if device is not None:
+                device_registry.async_update_device(
+                    device.id, remove_config_entry_id=config_entry.entry_id
+                )
+
+    _async_update()
+    config_entry.async_on_unload(coordinator.async_add_listener(_async_update))
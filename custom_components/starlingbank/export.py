@@ -0,0 +1,178 @@
+"""Streaming export of an account's transaction feed to disk."""
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterable, Iterator
+import csv
+from datetime import datetime, timedelta
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from .const import EXPORT_FORMAT_CSV
+from .feed_store import parse_time
+
+# The feed is requested a window at a time, so only one window of items is
+# held in memory however long the export range is.
+EXPORT_WINDOW = timedelta(days=7)
+
+CURSOR_SUFFIX = ".cursor"
+
+CSV_COLUMNS = (
+    "feed_item_uid",
+    "transaction_time",
+    "updated_at",
+    "direction",
+    "amount_minor_units",
+    "currency",
+    "status",
+    "source",
+    "counterparty_uid",
+    "counterparty_name",
+    "spending_category",
+    "reference",
+)
+
+
+async def feed_pages(
+    account, start: datetime, end: datetime, window: timedelta = EXPORT_WINDOW
+) -> AsyncIterator[tuple[datetime, list[dict[str, Any]]]]:
+    """Yield the end of each window and the feed items made within it."""
+    while start < end:
+        page_end = min(start + window, end)
+        items = await account.fetch_feed_between(
+            start.isoformat(), page_end.isoformat()
+        )
+        yield page_end, items
+        start = page_end
+
+
+def csv_rows(items: Iterable[dict[str, Any]]) -> Iterator[tuple]:
+    """Flatten feed items into CSV_COLUMNS rows."""
+    for item in items:
+        amount = item.get("amount", {})
+        yield (
+            item.get("feedItemUid"),
+            item.get("transactionTime"),
+            item.get("updatedAt"),
+            item.get("direction"),
+            amount.get("minorUnits"),
+            amount.get("currency"),
+            item.get("status"),
+            item.get("source"),
+            item.get("counterPartyUid"),
+            item.get("counterPartyName"),
+            item.get("spendingCategory"),
+            item.get("reference"),
+        )
+
+
+def jsonl_lines(items: Iterable[dict[str, Any]]) -> Iterator[str]:
+    """Serialise feed items, as the API returns them, one per line."""
+    for item in items:
+        yield json.dumps(item, separators=(",", ":")) + "\n"
+
+
+class FeedExportWriter:
+    """Appends pages of feed items to an export file behind a cursor.
+
+    After every page the cursor file beside the export records how far the
+    export got and the size of the file at that point. An export started
+    again with the same account, range and format truncates any partly
+    written page and carries on from the cursor; the cursor is removed
+    once the export completes. Every method blocks on the file system and
+    must be run in the executor.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        export_format: str,
+        account_uid: str,
+        start: datetime,
+        end: datetime,
+    ) -> None:
+        self.path = Path(path)
+        self.items = 0
+        self._cursor_path = self.path.with_name(self.path.name + CURSOR_SUFFIX)
+        self._format = export_format
+        self._key = {
+            "account": account_uid,
+            "format": export_format,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+        }
+        self._file = None
+        self._csv = None
+
+    def open(self, resume: bool = True) -> datetime | None:
+        """Open the export and return the time to resume from, if any."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        cursor = self._read_cursor() if resume else None
+
+        if cursor is not None:
+            self._file = open(self.path, "r+", encoding="utf-8", newline="")
+            self._file.truncate(cursor["offset"])
+            self._file.seek(cursor["offset"])
+            self.items = cursor["items"]
+        else:
+            self._file = open(self.path, "w", encoding="utf-8", newline="")
+
+        if self._format == EXPORT_FORMAT_CSV:
+            self._csv = csv.writer(self._file)
+            if cursor is None:
+                self._csv.writerow(CSV_COLUMNS)
+        return parse_time(cursor["until"]) if cursor is not None else None
+
+    def write_page(self, items: list[dict[str, Any]], until: datetime) -> None:
+        """Append a page in transaction order and move the cursor past it."""
+        items.sort(key=lambda item: item.get("transactionTime", ""))
+        if self._csv is not None:
+            self._csv.writerows(csv_rows(items))
+        else:
+            self._file.writelines(jsonl_lines(items))
+        self.items += len(items)
+
+        # The page must be on disk before the cursor points past it.
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._write_cursor(until)
+
+    def finish(self) -> None:
+        """Close a complete export and drop its cursor."""
+        self.close()
+        self._cursor_path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Close the export, keeping the cursor so it can be resumed."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._csv = None
+
+    def _read_cursor(self) -> dict[str, Any] | None:
+        try:
+            cursor = json.loads(self._cursor_path.read_text(encoding="utf-8"))
+            size = self.path.stat().st_size
+        except (OSError, ValueError):
+            return None
+        if any(cursor.get(key) != value for key, value in self._key.items()):
+            return None
+        if size < cursor.get("offset", size + 1):
+            return None
+        return cursor
+
+    def _write_cursor(self, until: datetime) -> None:
+        temp_path = self._cursor_path.with_name(self._cursor_path.name + ".tmp")
+        temp_path.write_text(
+            json.dumps(
+                {
+                    **self._key,
+                    "until": until.isoformat(),
+                    "offset": self._file.tell(),
+                    "items": self.items,
+                }
+            ),
+            encoding="utf-8",
+        )
+        os.replace(temp_path, self._cursor_path)
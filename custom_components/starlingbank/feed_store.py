@@ -0,0 +1,623 @@
+"""Local SQLite store for the Starling transaction feed."""
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+# Statuses for items that never moved money. Items without a status did,
+# so queries compare COALESCE(status, '') to keep them.
+EXCLUDED_STATUSES = ("DECLINED", "REVERSED", "REFUNDED")
+
+# Moves between the account and its spaces are not spending.
+EXCLUDED_SOURCES = ("INTERNAL_TRANSFER",)
+
+# Spending totals are kept for these dimensions, in hourly buckets that are
+# updated as items are ingested and dropped once older than any window.
+DIMENSION_CATEGORY = "category"
+DIMENSION_COUNTERPARTY = "counterparty"
+DIMENSION_SPACE = "space"
+BUCKET_SECONDS = 3600
+BUCKET_RETENTION = 40 * 86400
+UNKNOWN_KEY = "UNKNOWN"
+
+WINDOW_DAY = "day"
+WINDOW_WEEK = "week"
+WINDOW_MONTH = "month"
+
+# Bumped when a migration has to rebuild derived tables.
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feed_items (
+    feed_item_uid TEXT PRIMARY KEY,
+    transaction_time REAL NOT NULL,
+    updated_at TEXT,
+    direction TEXT,
+    amount_minor_units INTEGER,
+    currency TEXT,
+    status TEXT,
+    source TEXT,
+    counterparty_uid TEXT,
+    counterparty_name TEXT,
+    spending_category TEXT,
+    reference TEXT
+);
+CREATE INDEX IF NOT EXISTS feed_items_time
+    ON feed_items (transaction_time);
+CREATE INDEX IF NOT EXISTS feed_items_counterparty
+    ON feed_items (counterparty_name, transaction_time);
+CREATE INDEX IF NOT EXISTS feed_items_category
+    ON feed_items (spending_category, transaction_time);
+CREATE TABLE IF NOT EXISTS spend_buckets (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    amount_minor_units INTEGER NOT NULL,
+    PRIMARY KEY (dimension, key, bucket)
+);
+CREATE INDEX IF NOT EXISTS spend_buckets_time
+    ON spend_buckets (bucket);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Items are upserted rather than replaced so they keep their rowid, which
+# the search index refers to, and the update trigger fires.
+UPSERT_ITEM = """
+INSERT INTO feed_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (feed_item_uid) DO UPDATE SET
+    transaction_time = excluded.transaction_time,
+    updated_at = excluded.updated_at,
+    direction = excluded.direction,
+    amount_minor_units = excluded.amount_minor_units,
+    currency = excluded.currency,
+    status = excluded.status,
+    source = excluded.source,
+    counterparty_uid = excluded.counterparty_uid,
+    counterparty_name = excluded.counterparty_name,
+    spending_category = excluded.spending_category,
+    reference = excluded.reference
+"""
+
+# Text columns of feed items that searches match.
+SEARCH_COLUMNS = ("counterparty_name", "reference", "spending_category")
+
+# Full-text index over SEARCH_COLUMNS, kept up to date by triggers as items
+# are ingested. Prefix indexes make partly typed words cheap to match.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE feed_search USING fts5(
+    {columns},
+    content = 'feed_items',
+    content_rowid = 'rowid',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE TRIGGER feed_search_insert AFTER INSERT ON feed_items BEGIN
+    INSERT INTO feed_search (rowid, {columns})
+        VALUES (new.rowid, {new});
+END;
+CREATE TRIGGER feed_search_delete AFTER DELETE ON feed_items BEGIN
+    INSERT INTO feed_search (feed_search, rowid, {columns})
+        VALUES ('delete', old.rowid, {old});
+END;
+CREATE TRIGGER feed_search_update AFTER UPDATE ON feed_items
+WHEN {changed} BEGIN
+    INSERT INTO feed_search (feed_search, rowid, {columns})
+        VALUES ('delete', old.rowid, {old});
+    INSERT INTO feed_search (rowid, {columns})
+        VALUES (new.rowid, {new});
+END;
+INSERT INTO feed_search (feed_search) VALUES ('rebuild');
+""".format(
+    columns=", ".join(SEARCH_COLUMNS),
+    new=", ".join(f"new.{column}" for column in SEARCH_COLUMNS),
+    old=", ".join(f"old.{column}" for column in SEARCH_COLUMNS),
+    changed=" OR ".join(
+        f"old.{column} IS NOT new.{column}" for column in SEARCH_COLUMNS
+    ),
+)
+
+SEARCH_RESULT_COLUMNS = (
+    "feed_item_uid, transaction_time, direction, amount_minor_units, "
+    "currency, status, source, counterparty_name, spending_category, reference"
+)
+
+SPEND_QUERY = """
+SELECT COALESCE(SUM(amount_minor_units), 0) FROM feed_items
+WHERE transaction_time >= ?
+    AND direction = 'OUT'
+    AND COALESCE(status, '') NOT IN ({0})
+    AND COALESCE(source, '') NOT IN ({1})
+""".format(
+    ", ".join("?" for _ in EXCLUDED_STATUSES),
+    ", ".join("?" for _ in EXCLUDED_SOURCES),
+)
+
+
+BALANCE_CHANGE_QUERY = """
+SELECT CAST(transaction_time / 3600 AS INTEGER) * 3600 AS hour,
+    SUM(CASE WHEN direction = 'OUT'
+        THEN -amount_minor_units ELSE amount_minor_units END)
+FROM feed_items
+WHERE transaction_time >= ? AND transaction_time < ?
+    AND COALESCE(status, '') NOT IN ({0})
+GROUP BY hour
+ORDER BY hour
+""".format(", ".join("?" for _ in EXCLUDED_STATUSES))
+
+BALANCE_CHANGE_SINCE_QUERY = """
+SELECT COALESCE(SUM(CASE WHEN direction = 'OUT'
+        THEN -amount_minor_units ELSE amount_minor_units END), 0)
+FROM feed_items
+WHERE transaction_time >= ?
+    AND COALESCE(status, '') NOT IN ({0})
+""".format(", ".join("?" for _ in EXCLUDED_STATUSES))
+
+
+BUCKET_COLUMNS = (
+    "feed_item_uid, transaction_time, direction, amount_minor_units, "
+    "status, source, counterparty_name, spending_category"
+)
+
+
+def parse_time(value: str) -> datetime:
+    """Parse a Starling ISO-8601 timestamp."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _match_expression(text: str) -> str:
+    """Turn free text into an FTS5 query matching every word as a prefix."""
+    return " ".join(
+        '"{0}"*'.format(word.replace('"', '""')) for word in text.split()
+    )
+
+
+def _like_pattern(word: str) -> str:
+    escaped = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+@dataclass(frozen=True)
+class FeedItem:
+    """The most recent transaction on the account."""
+
+    amount_minor_units: int
+    currency: str | None
+    direction: str | None
+    counterparty_name: str | None
+    reference: str | None
+    spending_category: str | None
+    transaction_time: datetime
+
+
+@dataclass(frozen=True)
+class FeedSummary:
+    """Values for the feed sensors, read from the store's indexes."""
+
+    last_transaction: FeedItem | None
+    spend_today_minor_units: int
+    spend_this_month_minor_units: int
+    # Window, then dimension, then key to total in minor units.
+    spending: dict[str, dict[str, dict[str, int]]] | None = None
+
+
+def _contributions(row: tuple, cutoff: float) -> list[tuple[str, str, int, int]]:
+    """Return the (dimension, key, bucket, amount) totals an item adds to.
+
+    row holds the BUCKET_COLUMNS of a feed item. Space transfers count
+    towards the space, as money moved into it, and other outgoing items
+    towards their category and counterparty.
+    """
+    (_, transaction_time, direction, amount, status, source, counterparty,
+     category) = row
+    if transaction_time < cutoff or status in EXCLUDED_STATUSES or not amount:
+        return []
+    bucket = int(transaction_time // BUCKET_SECONDS * BUCKET_SECONDS)
+    if source in EXCLUDED_SOURCES:
+        if direction == "IN":
+            amount = -amount
+        return [(DIMENSION_SPACE, counterparty or UNKNOWN_KEY, bucket, amount)]
+    if direction != "OUT":
+        return []
+    return [
+        (DIMENSION_CATEGORY, category or UNKNOWN_KEY, bucket, amount),
+        (DIMENSION_COUNTERPARTY, counterparty or UNKNOWN_KEY, bucket, amount),
+    ]
+
+
+class FeedStore:
+    """Transaction feed items keyed by UID, with a changesSince watermark.
+
+    Every method blocks on SQLite and must be run in the executor.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self.watermark: str | None = None
+        self.full_text = False
+
+    def open(self) -> None:
+        """Open the database, create the schema and load the watermark."""
+        connection = sqlite3.connect(self._path, check_same_thread=False)
+        connection.executescript(SCHEMA)
+        if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Items ingested before spending buckets existed are added once.
+            with connection:
+                self._rebuild_buckets(connection)
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.full_text = self._create_search_index(connection)
+        row = connection.execute(
+            "SELECT value FROM meta WHERE key = 'watermark'"
+        ).fetchone()
+        self.watermark = row[0] if row else None
+        self._connection = connection
+
+    @staticmethod
+    def _create_search_index(connection: sqlite3.Connection) -> bool:
+        """Create and fill the search index if missing; False without FTS5.
+
+        The index is created, rather than migrated, on the first open with
+        FTS5 available, so it also appears if SQLite gains FTS5 later.
+        """
+        if connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'feed_search'"
+        ).fetchone():
+            return True
+        try:
+            connection.executescript(f"BEGIN; {SEARCH_SCHEMA} COMMIT;")
+        except sqlite3.OperationalError as err:
+            if connection.in_transaction:
+                connection.rollback()
+            _LOGGER.info(
+                "SQLite has no full-text search, searching without an index: %s",
+                err,
+            )
+            return False
+        return True
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def ingest(
+        self, items: list[dict[str, Any]], advance_watermark: bool = True
+    ) -> int:
+        """Upsert feed items, their spending totals and the watermark at once."""
+        if not items:
+            return 0
+
+        watermark = self.watermark
+        rows = {}
+        for item in items:
+            updated_at = item.get("updatedAt")
+            if advance_watermark and updated_at and (
+                watermark is None
+                or parse_time(updated_at) > parse_time(watermark)
+            ):
+                watermark = updated_at
+
+            amount = item.get("amount", {})
+            rows[item["feedItemUid"]] = (
+                item["feedItemUid"],
+                parse_time(item["transactionTime"]).timestamp(),
+                updated_at,
+                item.get("direction"),
+                amount.get("minorUnits"),
+                amount.get("currency"),
+                item.get("status"),
+                item.get("source"),
+                item.get("counterPartyUid"),
+                item.get("counterPartyName"),
+                item.get("spendingCategory"),
+                item.get("reference"),
+            )
+
+        with self._lock, self._connection:
+            self._update_buckets(rows)
+            self._connection.executemany(UPSERT_ITEM, rows.values())
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('watermark', ?)",
+                (watermark,),
+            )
+        self.watermark = watermark
+        return len(rows)
+
+    def _update_buckets(self, rows: dict[str, tuple]) -> None:
+        """Move spending totals from the stored versions of items to rows.
+
+        Only the buckets the changed items touch are written, so the cost
+        depends on the batch and not on the history.
+        """
+        cutoff = time.time() - BUCKET_RETENTION
+        deltas = Counter()
+        uids = list(rows)
+        for offset in range(0, len(uids), 500):
+            chunk = uids[offset:offset + 500]
+            for row in self._connection.execute(
+                f"SELECT {BUCKET_COLUMNS} FROM feed_items "
+                f"WHERE feed_item_uid IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            ):
+                for *bucket, amount in _contributions(row, cutoff):
+                    deltas[tuple(bucket)] -= amount
+        for row in rows.values():
+            # feed_items columns in BUCKET_COLUMNS order.
+            for *bucket, amount in _contributions(
+                (row[0], row[1], row[3], row[4], row[6], row[7], row[9], row[10]),
+                cutoff,
+            ):
+                deltas[tuple(bucket)] += amount
+
+        self._add_to_buckets(self._connection, deltas)
+        self._connection.execute(
+            "DELETE FROM spend_buckets WHERE bucket < ?", (cutoff,)
+        )
+
+    @staticmethod
+    def _add_to_buckets(connection: sqlite3.Connection, deltas: Counter) -> None:
+        connection.executemany(
+            "INSERT INTO spend_buckets VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (dimension, key, bucket) DO UPDATE SET "
+            "amount_minor_units = amount_minor_units + excluded.amount_minor_units",
+            [(*bucket, amount) for bucket, amount in deltas.items() if amount],
+        )
+
+    def _rebuild_buckets(self, connection: sqlite3.Connection) -> None:
+        cutoff = time.time() - BUCKET_RETENTION
+        deltas = Counter()
+        for row in connection.execute(
+            f"SELECT {BUCKET_COLUMNS} FROM feed_items WHERE transaction_time >= ?",
+            (cutoff,),
+        ):
+            for *bucket, amount in _contributions(row, cutoff):
+                deltas[tuple(bucket)] += amount
+        connection.execute("DELETE FROM spend_buckets")
+        self._add_to_buckets(connection, deltas)
+
+    def get_meta(self, key: str) -> str | None:
+        """Read a value saved with set_meta."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, **values: Any) -> None:
+        """Save values alongside the feed, in one transaction."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [(key, str(value)) for key, value in values.items()],
+            )
+
+    def hourly_balance_changes(
+        self, start: datetime, end: datetime
+    ) -> list[tuple[int, int]]:
+        """Sum the balance change of each hour in a window.
+
+        Returns (hour start timestamp, change) pairs for hours with items,
+        so memory is bounded by the window and not by the history.
+        """
+        with self._lock:
+            return self._connection.execute(
+                BALANCE_CHANGE_QUERY,
+                (start.timestamp(), end.timestamp(), *EXCLUDED_STATUSES),
+            ).fetchall()
+
+    def balance_change_since(self, start: datetime) -> int:
+        """Sum the balance change of every item from start onwards."""
+        with self._lock:
+            return self._connection.execute(
+                BALANCE_CHANGE_SINCE_QUERY,
+                (start.timestamp(), *EXCLUDED_STATUSES),
+            ).fetchone()[0]
+
+    def earliest_change(
+        self, after_row: int, updated_after: str | None
+    ) -> datetime | None:
+        """Return the oldest transaction time of items changed since a point.
+
+        Items changed are those ingested after the row, from backfill or
+        polling, and those updated after the updated_after watermark, if
+        given. The feed's timestamps share one format, so they compare as
+        text.
+        """
+        with self._lock:
+            (earliest,) = self._connection.execute(
+                "SELECT MIN(transaction_time) FROM feed_items "
+                "WHERE rowid > ? OR updated_at > ?",
+                (after_row, updated_after),
+            ).fetchone()
+        if earliest is None:
+            return None
+        return datetime.fromtimestamp(earliest, timezone.utc)
+
+    def last_row(self) -> int:
+        """Return the ingestion position of the newest item, 0 if none.
+
+        Items keep the rowid they were first ingested with, so rowids order
+        items by arrival, whatever their transaction times.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COALESCE(MAX(rowid), 0) FROM feed_items"
+            ).fetchone()[0]
+
+    def transactions_after(
+        self, after_row: int, direction: str
+    ) -> list[tuple[int, str, int]]:
+        """Return items in one direction ingested after a row, oldest first.
+
+        Items are (rowid, UID, amount) and leave out transfers to and from
+        spaces and items that never moved money. Reading by rowid rather
+        than by time includes items that arrive late with an older time.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT rowid, feed_item_uid, amount_minor_units "
+                "FROM feed_items WHERE rowid > ? AND direction = ? "
+                "AND COALESCE(status, '') NOT IN ({0}) "
+                "AND COALESCE(source, '') NOT IN ({1}) "
+                "ORDER BY rowid".format(
+                    ", ".join("?" for _ in EXCLUDED_STATUSES),
+                    ", ".join("?" for _ in EXCLUDED_SOURCES),
+                ),
+                (after_row, direction, *EXCLUDED_STATUSES, *EXCLUDED_SOURCES),
+            ).fetchall()
+
+    def search(
+        self,
+        text: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        min_amount: int | None = None,
+        max_amount: int | None = None,
+        direction: str | None = None,
+        space: str | None = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> tuple[list[dict[str, Any]], int | None]:
+        """Find items, newest first, and the offset of the next page if any.
+
+        Every word of text must start a word of the counterparty, reference
+        or category. Amounts are in minor units, whatever the direction,
+        and space limits the results to transfers to and from the space
+        with that name.
+        """
+        clauses = []
+        params: list[Any] = []
+        words = text.split() if text else []
+        if words and self.full_text:
+            clauses.append(
+                "rowid IN (SELECT rowid FROM feed_search WHERE feed_search MATCH ?)"
+            )
+            params.append(_match_expression(text))
+        elif words:
+            # Without an index, each word is looked for anywhere in the text.
+            for word in words:
+                clauses.append(
+                    "({0})".format(
+                        " OR ".join(
+                            f"{column} LIKE ? ESCAPE '\\'"
+                            for column in SEARCH_COLUMNS
+                        )
+                    )
+                )
+                params.extend([_like_pattern(word)] * len(SEARCH_COLUMNS))
+        if start is not None:
+            clauses.append("transaction_time >= ?")
+            params.append(start.timestamp())
+        if end is not None:
+            clauses.append("transaction_time < ?")
+            params.append(end.timestamp())
+        if min_amount is not None:
+            clauses.append("amount_minor_units >= ?")
+            params.append(min_amount)
+        if max_amount is not None:
+            clauses.append("amount_minor_units <= ?")
+            params.append(max_amount)
+        if direction is not None:
+            clauses.append("direction = ?")
+            params.append(direction)
+        if space is not None:
+            clauses.append(
+                "source IN ({0}) AND counterparty_name = ?".format(
+                    ", ".join("?" for _ in EXCLUDED_SOURCES)
+                )
+            )
+            params.extend((*EXCLUDED_SOURCES, space))
+
+        query = f"SELECT {SEARCH_RESULT_COLUMNS} FROM feed_items"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY transaction_time DESC, feed_item_uid LIMIT ? OFFSET ?"
+
+        with self._lock:
+            # One row more than a page shows whether another page follows.
+            rows = self._connection.execute(
+                query, (*params, limit + 1, offset)
+            ).fetchall()
+
+        keys = SEARCH_RESULT_COLUMNS.split(", ")
+        items = []
+        for row in rows[:limit]:
+            item = dict(zip(keys, row))
+            item["transaction_time"] = datetime.fromtimestamp(
+                item["transaction_time"], timezone.utc
+            ).isoformat()
+            items.append(item)
+        return items, offset + limit if len(rows) > limit else None
+
+    def summary(
+        self, day_start: datetime, week_start: datetime, month_start: datetime
+    ) -> FeedSummary:
+        """Read the feed sensor values using the time index."""
+        windows = {
+            WINDOW_DAY: day_start,
+            WINDOW_WEEK: week_start,
+            WINDOW_MONTH: month_start,
+        }
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT amount_minor_units, currency, direction, "
+                "counterparty_name, reference, spending_category, "
+                "transaction_time FROM feed_items "
+                "ORDER BY transaction_time DESC LIMIT 1"
+            ).fetchone()
+            spend_today = self._spend_since(day_start)
+            spend_this_month = self._spend_since(month_start)
+            spending = {
+                window: self._spending_since(start)
+                for window, start in windows.items()
+            }
+
+        last_transaction = None
+        if row is not None:
+            last_transaction = FeedItem(
+                *row[:6],
+                transaction_time=datetime.fromtimestamp(row[6], timezone.utc),
+            )
+
+        return FeedSummary(
+            last_transaction=last_transaction,
+            spend_today_minor_units=spend_today,
+            spend_this_month_minor_units=spend_this_month,
+            spending=spending,
+        )
+
+    def _spend_since(self, start: datetime) -> int:
+        return self._connection.execute(
+            SPEND_QUERY,
+            (start.timestamp(), *EXCLUDED_STATUSES, *EXCLUDED_SOURCES),
+        ).fetchone()[0]
+
+    def _spending_since(self, start: datetime) -> dict[str, dict[str, int]]:
+        """Total the spending buckets of each dimension from start."""
+        spending = {
+            DIMENSION_CATEGORY: {},
+            DIMENSION_COUNTERPARTY: {},
+            DIMENSION_SPACE: {},
+        }
+        for dimension, key, amount in self._connection.execute(
+            "SELECT dimension, key, SUM(amount_minor_units) FROM spend_buckets "
+            "WHERE bucket >= ? GROUP BY dimension, key ORDER BY 3 DESC",
+            (start.timestamp(),),
+        ):
+            if amount:
+                spending[dimension][key] = amount
+        return spending
@@ -0,0 +1,108 @@
+"""Savings goal photos via the Starling Bank API."""
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientError
+
+from homeassistant.components.image import ImageEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import dt as dt_util
+
+from .api.starlingbank import StarlingApiError
+from .const import DOMAIN
+from .entity import StarlingBaseEntity, async_track_spaces
+from .photo_cache import PhotoCache, photo_version
+from .starling_update_coordinator import StarlingUpdateCoordinator
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the savings goal photo platform."""
+    coordinator: StarlingUpdateCoordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+    name: str = hass.data[DOMAIN][config_entry.entry_id]["name"]
+    cache = PhotoCache(hass.config.path(STORAGE_DIR, f"{DOMAIN}_photos"))
+
+    async_track_spaces(
+        coordinator,
+        config_entry,
+        name,
+        async_add_entities,
+        lambda index: (
+            StarlingSpacePhoto(
+                coordinator, cache, index, coordinator.data[index].name, name
+            ),
+        ),
+    )
+
+
+class StarlingSpacePhoto(StarlingBaseEntity, ImageEntity):
+    """The photo of a space, requested only when it is displayed."""
+
+    _attr_translation_key = "photo"
+
+    def __init__(
+        self,
+        coordinator: StarlingUpdateCoordinator,
+        cache: PhotoCache,
+        idx,
+        device_model: str,
+        account_name: str
+    ) -> None:
+        """Initialize the image."""
+        super().__init__(coordinator, idx, device_model, account_name)
+        ImageEntity.__init__(self, coordinator.hass)
+
+        self._cache = cache
+        self._lock = asyncio.Lock()
+        self._version = photo_version(self.data)
+        self._attr_unique_id = f"{self.idx}_{account_name}_photo"
+        self._attr_image_last_updated = dt_util.utcnow()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Point the image at a new version when the goal changes."""
+        if self.idx in self.coordinator.data:
+            version = photo_version(self.data)
+            if version != self._version:
+                self._version = version
+                self._attr_image_last_updated = dt_util.utcnow()
+        super()._handle_coordinator_update()
+
+    async def async_image(self) -> bytes | None:
+        """Return the photo from the cache, fetching it when missing."""
+        async with self._lock:
+            version = self._version
+            path = await self.hass.async_add_executor_job(
+                self._cache.lookup, self.idx, version
+            )
+            if path is None:
+                try:
+                    encoded = await self.coordinator.starling_client.savings_goal(
+                        self.idx
+                    ).fetch_photo()
+                except (
+                    ClientError, TimeoutError, StarlingApiError, KeyError, ValueError
+                ):
+                    # No photo, or the API is unavailable: keep showing
+                    # an expired copy if there is one.
+                    path = await self.hass.async_add_executor_job(
+                        self._cache.lookup, self.idx, version, False
+                    )
+                    if path is None:
+                        return None
+                else:
+                    path = await self.hass.async_add_executor_job(
+                        self._cache.store, self.idx, version, encoded
+                    )
+
+            image, self._attr_content_type = await self.hass.async_add_executor_job(
+                self._cache.read, path
+            )
+        return image
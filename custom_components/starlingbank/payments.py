@@ -0,0 +1,240 @@
+"""Standing orders and direct debits, refreshed on their own slow tier."""
+from __future__ import annotations
+
+import asyncio
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+import logging
+from typing import Any
+
+import async_timeout
+
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+from homeassistant.util import dt as dt_util
+
+from .api.starlingbank import StarlingApiError
+from .const import PAYMENTS_UPDATE_INTERVAL, master_idx
+
+_LOGGER = logging.getLogger(__name__)
+
+PAYMENT_STANDING_ORDER = "standing_order"
+PAYMENT_DIRECT_DEBIT = "direct_debit"
+
+# Seconds a refresh may take, leaving room for rate-limit retries.
+UPDATE_TIMEOUT = 60
+
+# Mandates are only counted while they can still collect payments.
+LIVE_MANDATE_STATUSES = ("LIVE",)
+
+
+@dataclass(frozen=True, slots=True)
+class PaymentDue:
+    """One expected payment of a standing order or direct debit."""
+
+    due: date
+    amount_minor_units: int
+    currency: str | None
+    payee: str | None
+    reference: str | None
+    kind: str
+
+
+@dataclass(frozen=True, slots=True)
+class PaymentsData:
+    """Snapshot of an account's commitments, compared to skip updates."""
+
+    next_payment: PaymentDue | None
+    # Payments from today to the end of the month, in date order.
+    due_this_month: tuple[PaymentDue, ...]
+    committed_this_month_minor_units: int
+    standing_orders: int
+    direct_debits: int
+
+
+def _add_months(day: date, months: int, anchor_day: int) -> date:
+    """Move a date by whole months, keeping to anchor_day where it exists."""
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def _step(day: date, frequency: str, interval: int, anchor_day: int) -> date | None:
+    """Return the payment after day, or None for an unknown frequency."""
+    if frequency == "DAILY":
+        return day + timedelta(days=interval)
+    if frequency == "WEEKLY":
+        return day + timedelta(weeks=interval)
+    if frequency == "MONTHLY":
+        return _add_months(day, interval, anchor_day)
+    if frequency == "YEARLY":
+        return _add_months(day, 12 * interval, anchor_day)
+    return None
+
+
+def _standing_order_payments(
+    order: dict[str, Any], payees: dict[str, str], month_end: date
+) -> list[PaymentDue]:
+    """Return the next payment of a standing order and any more this month."""
+    if order.get("cancelledAt") or not order.get("nextDate"):
+        return []
+    recurrence = order.get("standingOrderRecurrence") or {}
+    frequency = recurrence.get("frequency")
+    interval = recurrence.get("interval") or 1
+    until = recurrence.get("untilDate")
+    until = date.fromisoformat(until) if until else None
+    anchor_day = date.fromisoformat(
+        recurrence.get("startDate") or order["nextDate"]
+    ).day
+
+    amount = order.get("amount") or {}
+    payments = []
+    due = date.fromisoformat(order["nextDate"])
+    while due is not None and (until is None or due <= until):
+        payments.append(
+            PaymentDue(
+                due,
+                amount.get("minorUnits", 0),
+                amount.get("currency"),
+                payees.get(order.get("payeeUid")),
+                order.get("reference"),
+                PAYMENT_STANDING_ORDER,
+            )
+        )
+        if due > month_end or frequency is None:
+            break
+        due = _step(due, frequency, interval, anchor_day)
+    return payments
+
+
+def _direct_debit_payment(mandate: dict[str, Any], today: date) -> PaymentDue | None:
+    """Estimate a mandate's next payment as a month after its last one.
+
+    Mandates do not say when they will next be collected; most collect
+    monthly, so the last payment is projected forward a month at a time.
+    """
+    if mandate.get("status") not in LIVE_MANDATE_STATUSES:
+        return None
+    last = mandate.get("lastPayment") or {}
+    if not last.get("lastDate"):
+        return None
+    last_date = date.fromisoformat(last["lastDate"][:10])
+    due = _add_months(last_date, 1, last_date.day)
+    while due < today:
+        due = _add_months(due, 1, last_date.day)
+    amount = last.get("lastAmount") or {}
+    return PaymentDue(
+        due,
+        amount.get("minorUnits", 0),
+        amount.get("currency"),
+        mandate.get("originatorName"),
+        mandate.get("reference"),
+        PAYMENT_DIRECT_DEBIT,
+    )
+
+
+def summarise_payments(
+    standing_orders: list[dict[str, Any]],
+    mandates: list[dict[str, Any]],
+    payees: list[dict[str, Any]],
+    today: date,
+    currency: str | None,
+) -> PaymentsData:
+    """Work out the next payment and what is still due this month.
+
+    Only payments in the account's currency count towards the total.
+    """
+    month_end = date(
+        today.year, today.month, calendar.monthrange(today.year, today.month)[1]
+    )
+    payee_names = {
+        payee.get("payeeUid"): payee.get("payeeName") for payee in payees
+    }
+
+    payments = [
+        payment
+        for order in standing_orders
+        for payment in _standing_order_payments(order, payee_names, month_end)
+    ]
+    live_mandates = 0
+    for mandate in mandates:
+        payment = _direct_debit_payment(mandate, today)
+        if payment is not None:
+            live_mandates += 1
+            payments.append(payment)
+
+    payments = sorted(
+        (payment for payment in payments if payment.due >= today),
+        key=lambda payment: (payment.due, payment.payee or ""),
+    )
+    due_this_month = tuple(
+        payment for payment in payments if payment.due <= month_end
+    )
+    return PaymentsData(
+        next_payment=payments[0] if payments else None,
+        due_this_month=due_this_month,
+        committed_this_month_minor_units=sum(
+            payment.amount_minor_units
+            for payment in due_this_month
+            if currency is None or payment.currency in (None, currency)
+        ),
+        standing_orders=sum(
+            1 for order in standing_orders if not order.get("cancelledAt")
+        ),
+        direct_debits=live_mandates,
+    )
+
+
+class StarlingPaymentsCoordinator(DataUpdateCoordinator):
+    """Polls the payment endpoints of accounts with an enabled entity.
+
+    Nothing is requested until a payments entity is added, so the extra
+    endpoints cost nothing while their entities stay disabled.
+    """
+
+    def __init__(self, hass, client) -> None:
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="Starling payments",
+            update_interval=PAYMENTS_UPDATE_INTERVAL,
+            always_update=False,
+        )
+        self.starling_client = client
+
+    async def _async_update_data(self) -> dict[str, PaymentsData]:
+        """Fetch the payments of every account an entity listens to."""
+        listening_idx = set(self.async_contexts())
+        accounts = [
+            account
+            for uid, account in self.starling_client.accounts.items()
+            if master_idx(uid) in listening_idx
+        ]
+        try:
+            async with async_timeout.timeout(UPDATE_TIMEOUT):
+                results = await asyncio.gather(
+                    *(self._async_fetch(account) for account in accounts)
+                )
+        except StarlingApiError as err:
+            raise UpdateFailed(str(err)) from err
+
+        today = dt_util.now().date()
+        return {
+            master_idx(account.account_uid): summarise_payments(
+                *result, today, account.currency
+            )
+            for account, result in zip(accounts, results)
+        }
+
+    @staticmethod
+    async def _async_fetch(account) -> tuple[list, list, list]:
+        return await asyncio.gather(
+            account.fetch_standing_orders(),
+            account.fetch_direct_debit_mandates(),
+            account.fetch_payees(),
+        )
@@ -0,0 +1,97 @@
+"""On-disk cache for savings goal photos."""
+from __future__ import annotations
+
+from base64 import b64decode
+from hashlib import sha256
+import os
+from pathlib import Path
+import tempfile
+import time
+
+# Photos rarely change, so they are only requested again after this many
+# seconds or when the goal itself changes.
+PHOTO_TTL = 7 * 86400
+
+# Base64 characters decoded at a time; a multiple of 4 so every slice
+# decodes on its own.
+DECODE_CHUNK = 4 * 16384
+
+CONTENT_TYPES = (
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+)
+
+
+def photo_version(goal) -> str:
+    """Fingerprint the goal details a new photo is usually set alongside."""
+    return sha256(
+        repr((goal.name, goal.target_currency, goal.target_minor_units)).encode()
+    ).hexdigest()[:12]
+
+
+def content_type(head: bytes) -> str:
+    """Guess the content type of a photo from its first bytes."""
+    for magic, value in CONTENT_TYPES:
+        if head.startswith(magic):
+            return value
+    return "image/jpeg"
+
+
+class PhotoCache:
+    """Decoded photos named by goal UID, goal version and content hash.
+
+    A goal's version changes when the goal is edited, so older files stop
+    matching and are replaced on the next fetch. Every method blocks on the
+    file system and must be run in the executor.
+    """
+
+    def __init__(self, directory: str, ttl: float = PHOTO_TTL) -> None:
+        self._directory = Path(directory)
+        self._ttl = ttl
+
+    def lookup(
+        self, goal_uid: str, version: str, fresh: bool = True
+    ) -> Path | None:
+        """Return the cached photo for this version of a goal.
+
+        Unless fresh is False, photos older than the TTL are ignored.
+        """
+        for path in self._directory.glob(f"{goal_uid}_{version}_*"):
+            if not fresh or time.time() - path.stat().st_mtime < self._ttl:
+                return path
+        return None
+
+    def store(self, goal_uid: str, version: str, encoded: memoryview) -> Path:
+        """Decode a base64 photo to disk and drop the goal's older photos.
+
+        The photo is decoded a slice at a time straight into the file, so
+        no full decoded copy is held in memory. Slicing a view, such as
+        the one fetch_photo returns, copies only the slice.
+        """
+        self._directory.mkdir(parents=True, exist_ok=True)
+        digest = sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for offset in range(0, len(encoded), DECODE_CHUNK):
+                    chunk = b64decode(encoded[offset:offset + DECODE_CHUNK])
+                    digest.update(chunk)
+                    file.write(chunk)
+            path = self._directory / (
+                f"{goal_uid}_{version}_{digest.hexdigest()[:16]}"
+            )
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        for old in self._directory.glob(f"{goal_uid}_*"):
+            if old != path:
+                old.unlink(missing_ok=True)
+        return path
+
+    def read(self, path: Path) -> tuple[bytes, str]:
+        """Return a cached photo and its content type."""
+        image = path.read_bytes()
+        return image, content_type(image[:8])
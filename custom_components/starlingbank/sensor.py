@@ -1,18 +1,25 @@
 """Support for balance data via the Starling Bank API."""
 from __future__ import annotations
 
-from .starling_update_coordinator import StarlingUpdateCoordinator
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from collections.abc import Callable
+from types import MappingProxyType
 from dataclasses import dataclass
 import voluptuous as vol
 
 from homeassistant.components.sensor import SensorEntity, SensorStateClass, SensorDeviceClass, SensorEntityDescription
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import ATTR_ATTRIBUTION
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    ATTR_ATTRIBUTION,
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfTime,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers import entity_platform
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.typing import StateType
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
@@ -20,11 +27,24 @@ from homeassistant.helpers.update_coordinator import (
 from homeassistant.exceptions import HomeAssistantError
 
 from .const import (
+    CLIENT_SENSOR_UPDATE_INTERVAL,
     DOMAIN,
     SERVICE_SPACE_DEPOSIT,
-    SERVICE_SPACE_WITHDRAW
+    SERVICE_SPACE_WITHDRAW,
+    master_idx,
+)
+from .entity import StarlingBaseEntity, async_track_accounts, async_track_spaces
+from .feed_store import (
+    DIMENSION_CATEGORY,
+    DIMENSION_COUNTERPARTY,
+    DIMENSION_SPACE,
+    WINDOW_DAY,
+    WINDOW_WEEK,
+    WINDOW_MONTH,
 )
-from .entity import StarlingBaseEntity
+
+if TYPE_CHECKING:
+    from .starling_update_coordinator import StarlingUpdateCoordinator
 
 BALANCE_TYPES = ["cleared_balance", "effective_balance"]
 
@@ -41,40 +61,143 @@ DEFAULT_COIN_ICON = "mdi:cash"
 
 ATTRIBUTION = "Data provided by Starling bank"
 
+STATE_ATTRIBUTES = MappingProxyType({ATTR_ATTRIBUTION: ATTRIBUTION})
+
 POT_SERVICE_SCHEMA = {
     vol.Required('amount_in_minor_units'): vol.All(vol.Coerce(int), vol.Range(0, 65535)),
 }
 
+def _signed_amount(item) -> int:
+    """Return a feed item's amount, negative for money going out."""
+    if item.direction == "OUT":
+        return -item.amount_minor_units
+    return item.amount_minor_units
+
+def _transaction_attributes(item) -> dict[str, Any]:
+    """Return the details of a feed item as state attributes."""
+    if item is None:
+        return {}
+    return {
+        "counterparty": item.counterparty_name,
+        "reference": item.reference,
+        "spending_category": item.spending_category,
+        "transaction_time": item.transaction_time.isoformat(),
+    }
+
+def _payment_attributes(payment) -> dict[str, Any]:
+    """Return the details of an expected payment as state attributes."""
+    if payment is None:
+        return {}
+    return {
+        "amount": payment.amount_minor_units / 100,
+        "currency": payment.currency,
+        "payee": payment.payee,
+        "reference": payment.reference,
+        "type": payment.kind,
+    }
+
+def _spending(data, window: str, dimension: str) -> dict[str, int]:
+    """Return the spending totals of a dimension over a window."""
+    return ((data.feed.spending or {}).get(window) or {}).get(dimension, {})
+
 @dataclass(frozen=True, kw_only=True)
 class StarlingSensorEntityDescription(SensorEntityDescription):
     """Describes Starling sensor entity."""
 
     value_fn: Callable[[dict[str, Any]], StateType]
+    attributes_fn: Callable[[dict[str, Any]], dict[str, Any]] | None = None
+
+@dataclass(frozen=True, kw_only=True)
+class StarlingPaymentsSensorEntityDescription(SensorEntityDescription):
+    """Describes a sensor reading an account's payments tier."""
+
+    value_fn: Callable[[Any], StateType]
+    attributes_fn: Callable[[Any], dict[str, Any]] | None = None
+
+@dataclass(frozen=True, kw_only=True)
+class StarlingClientSensorEntityDescription(SensorEntityDescription):
+    """Describes a sensor reading the coordinator instead of account data."""
+
+    value_fn: Callable[[Any], StateType]
+    attributes_fn: Callable[[Any], dict[str, Any]] | None = None
 
 ACCOUNT_SENSORS = (
     StarlingSensorEntityDescription(
         key="cleared_balance",
         translation_key="cleared_balance",
-        value_fn=lambda data: data.account.cleared_balance / 100,
+        value_fn=lambda data: data.cleared_balance / 100,
         device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
         native_unit_of_measurement="GBP",
         suggested_display_precision=2,
     ),
     StarlingSensorEntityDescription(
         key="effective_balance",
         translation_key="effective_balance",
-        value_fn=lambda data: data.account.effective_balance / 100,
+        value_fn=lambda data: data.effective_balance / 100,
         device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
         native_unit_of_measurement="GBP",
         suggested_display_precision=2,
     ),
 )
+FEED_SENSORS = (
+    StarlingSensorEntityDescription(
+        key="last_transaction",
+        translation_key="last_transaction",
+        value_fn=lambda data: _signed_amount(data.feed.last_transaction) / 100,
+        attributes_fn=lambda data: _transaction_attributes(
+            data.feed.last_transaction
+        ),
+        device_class=SensorDeviceClass.MONETARY,
+        native_unit_of_measurement="GBP",
+        suggested_display_precision=2,
+    ),
+    StarlingSensorEntityDescription(
+        key="spend_today",
+        translation_key="spend_today",
+        value_fn=lambda data: data.feed.spend_today_minor_units / 100,
+        device_class=SensorDeviceClass.MONETARY,
+        native_unit_of_measurement="GBP",
+        suggested_display_precision=2,
+    ),
+    StarlingSensorEntityDescription(
+        key="spend_this_month",
+        translation_key="spend_this_month",
+        value_fn=lambda data: data.feed.spend_this_month_minor_units / 100,
+        device_class=SensorDeviceClass.MONETARY,
+        native_unit_of_measurement="GBP",
+        suggested_display_precision=2,
+    ),
+)
+def _spending_description(dimension: str, window: str, enabled: bool):
+    """Describe the total of a spending dimension, broken down by key."""
+    return StarlingSensorEntityDescription(
+        key=f"{dimension}_spending_{window}",
+        translation_key=f"{dimension}_spending_{window}",
+        value_fn=lambda data: sum(_spending(data, window, dimension).values()) / 100,
+        attributes_fn=lambda data: {
+            key: amount / 100
+            for key, amount in _spending(data, window, dimension).items()
+        },
+        device_class=SensorDeviceClass.MONETARY,
+        native_unit_of_measurement="GBP",
+        suggested_display_precision=2,
+        entity_registry_enabled_default=enabled,
+    )
+
+SPENDING_SENSORS = tuple(
+    _spending_description(dimension, window, dimension == DIMENSION_CATEGORY)
+    for dimension in (DIMENSION_CATEGORY, DIMENSION_COUNTERPARTY, DIMENSION_SPACE)
+    for window in (WINDOW_DAY, WINDOW_WEEK, WINDOW_MONTH)
+)
 SPACE_SENSORS = (
     StarlingSensorEntityDescription(
         key="total_saved",
         translation_key="total_saved",
         value_fn=lambda data: data.total_saved_minor_units / 100,
         device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
         native_unit_of_measurement="GBP",
         suggested_display_precision=2,
     ),
@@ -83,8 +206,102 @@ SPACE_SENSORS = (
         translation_key="target_amount",
         value_fn=lambda data: (data.target_minor_units or 0) / 100,
         device_class=SensorDeviceClass.MONETARY,
+        state_class=SensorStateClass.TOTAL,
+        native_unit_of_measurement="GBP",
+        suggested_display_precision=2,
+    ),
+)
+
+# Disabled by default: their endpoints are only polled once enabled.
+PAYMENTS_SENSORS = (
+    StarlingPaymentsSensorEntityDescription(
+        key="next_payment",
+        translation_key="next_payment",
+        value_fn=lambda data: (
+            data.next_payment.due if data.next_payment is not None else None
+        ),
+        attributes_fn=lambda data: _payment_attributes(data.next_payment),
+        device_class=SensorDeviceClass.DATE,
+        entity_registry_enabled_default=False,
+    ),
+    StarlingPaymentsSensorEntityDescription(
+        key="committed_this_month",
+        translation_key="committed_this_month",
+        value_fn=lambda data: data.committed_this_month_minor_units / 100,
+        attributes_fn=lambda data: {
+            "standing_orders": data.standing_orders,
+            "direct_debits": data.direct_debits,
+            "payments": [
+                {"date": payment.due.isoformat(), **_payment_attributes(payment)}
+                for payment in data.due_this_month
+            ],
+        },
+        device_class=SensorDeviceClass.MONETARY,
         native_unit_of_measurement="GBP",
         suggested_display_precision=2,
+        entity_registry_enabled_default=False,
+    ),
+)
+
+CLIENT_SENSORS = (
+    StarlingClientSensorEntityDescription(
+        key="aborted_requests",
+        translation_key="aborted_requests",
+        value_fn=lambda coordinator: sum(
+            coordinator.starling_client.api.aborted.values()
+        ),
+        attributes_fn=lambda coordinator: dict(
+            coordinator.starling_client.api.aborted
+        ),
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    StarlingClientSensorEntityDescription(
+        key="refresh_duration",
+        translation_key="refresh_duration",
+        value_fn=lambda coordinator: coordinator.refresh_latency.last,
+        attributes_fn=lambda coordinator: {
+            "mean": coordinator.refresh_latency.as_dict()["mean"],
+            "refreshes": coordinator.refresh_latency.count,
+            "failures": coordinator.refresh_failures,
+        },
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        suggested_display_precision=2,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    StarlingClientSensorEntityDescription(
+        key="api_requests",
+        translation_key="api_requests",
+        value_fn=lambda coordinator: coordinator.starling_client.api.stats.calls,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    StarlingClientSensorEntityDescription(
+        key="api_retries",
+        translation_key="api_retries",
+        value_fn=lambda coordinator: coordinator.starling_client.api.stats.retries,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    StarlingClientSensorEntityDescription(
+        key="cache_hit_rate",
+        translation_key="cache_hit_rate",
+        value_fn=lambda coordinator: (
+            None
+            if coordinator.starling_client.api.cache.hit_rate is None
+            else coordinator.starling_client.api.cache.hit_rate * 100
+        ),
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=PERCENTAGE,
+        suggested_display_precision=0,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
     ),
 )
 
@@ -97,31 +314,68 @@ async def async_setup_entry(
     coordinator: StarlingUpdateCoordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
     name: str = hass.data[DOMAIN][config_entry.entry_id]["name"]
 
-    accounts = [
-        StarlingSensor(
+    primary = coordinator.starling_client.primary_account
+    async_add_entities(
+        StarlingClientSensor(
             coordinator,
             entity_description,
-            index,
-            account.name,
+            master_idx(primary.account_uid),
+            coordinator.data[master_idx(primary.account_uid)].name,
             name
         )
-        for entity_description in ACCOUNT_SENSORS
-        for index, account in coordinator.data.items() if index.startswith("MASTER")
-    ]
+        for entity_description in CLIENT_SENSORS
+    )
 
-    spaces = [
-        StarlingSensor(
-            coordinator,
-            entity_description,
-            index,
-            account.name,
-            name
+    @callback
+    def _account_entities(index: str) -> list[SensorEntity]:
+        account = coordinator.data[index]
+        entities: list[SensorEntity] = [
+            StarlingSensor(
+                coordinator,
+                entity_description,
+                index,
+                account.name,
+                name
+            )
+            for entity_description in ACCOUNT_SENSORS
+        ]
+        if account.feed is not None:
+            entities.extend(
+                StarlingSensor(
+                    coordinator,
+                    entity_description,
+                    index,
+                    account.name,
+                    name
+                )
+                for entity_description in FEED_SENSORS + SPENDING_SENSORS
+            )
+        entities.extend(
+            StarlingPaymentsSensor(coordinator, entity_description, index, name)
+            for entity_description in PAYMENTS_SENSORS
         )
-        for entity_description in SPACE_SENSORS
-        for index, account in coordinator.data.items() if not index.startswith("MASTER")
-    ]
+        return entities
+
+    async_track_accounts(
+        coordinator, config_entry, name, async_add_entities, _account_entities
+    )
 
-    async_add_entities(accounts + spaces)
+    async_track_spaces(
+        coordinator,
+        config_entry,
+        name,
+        async_add_entities,
+        lambda index: (
+            StarlingSensor(
+                coordinator,
+                entity_description,
+                index,
+                coordinator.data[index].name,
+                name
+            )
+            for entity_description in SPACE_SENSORS
+        ),
+    )
 
     platform = entity_platform.async_get_current_platform()
 
@@ -152,36 +406,189 @@ class StarlingSensor(StarlingBaseEntity, SensorEntity):
         self.idx = idx
         super().__init__(coordinator, idx, device_model, account_name)
 
-        self._attr_state_class = SensorStateClass.TOTAL
-
         self.entity_description = entity_description
 
+        # Additional currency accounts and their spaces are not in GBP.
+        if self.data.currency:
+            self._attr_native_unit_of_measurement = self.data.currency
+
         self._attr_unique_id = f"{self.idx}_{account_name}_{self.entity_description.key}"
 
+        self._last_written = (self.coordinator.data.get(self.idx), True)
+
     @property
     def native_value(self) -> StateType:
         """Return the state."""
 
         try:
             state = self.entity_description.value_fn(self.data)
-        except (KeyError, ValueError):
+        except (AttributeError, KeyError, ValueError):
             return None
 
         return state
 
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when this entity's data or availability changed."""
+        written = (self.coordinator.data.get(self.idx), self.coordinator.last_update_success)
+        if written == self._last_written:
+            return
+        self._last_written = written
+        super()._handle_coordinator_update()
+
     @property
     def extra_state_attributes(self):
         """Return the state attributes of the sensor."""
+        if self.entity_description.attributes_fn is None:
+            return STATE_ATTRIBUTES
         return {
-            ATTR_ATTRIBUTION: ATTRIBUTION,
+            **STATE_ATTRIBUTES,
+            **self.entity_description.attributes_fn(self.data),
         }
     
     async def space_deposit(self, amount_in_minor_units: int | None = None):
         if self.idx.startswith("MASTER"):
             raise HomeAssistantError("supported only on space sensors")
-        await self.coordinator.space_deposit(self.idx, amount_in_minor_units)
+        try:
+            await self.coordinator.space_deposit(self.idx, amount_in_minor_units)
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
 
     async def space_withdraw(self, amount_in_minor_units: int | None = None):
         if self.idx.startswith("MASTER"):
             raise HomeAssistantError("supported only on space sensors")
-        await self.coordinator.space_withdraw(self.idx, amount_in_minor_units)
\ No newline at end of file
+        try:
+            await self.coordinator.space_withdraw(self.idx, amount_in_minor_units)
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+
+class StarlingClientSensor(StarlingBaseEntity, SensorEntity):
+    """Diagnostics for the client and polling shared by a token's accounts.
+
+    The coordinator only notifies listeners when its data changes, which
+    failed and unchanged refreshes do not, so the state is also written
+    every CLIENT_SENSOR_UPDATE_INTERVAL.
+    """
+
+    _attr_icon = "mdi:api"
+
+    def __init__(
+        self,
+        coordinator: StarlingUpdateCoordinator,
+        entity_description,
+        idx,
+        device_model: str,
+        account_name: str
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, idx, device_model, account_name)
+
+        self.entity_description = entity_description
+
+        self._attr_unique_id = f"{self.idx}_{account_name}_{self.entity_description.key}"
+
+    async def async_added_to_hass(self) -> None:
+        """Write the state on a timer as well as on coordinator updates."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_time_interval(
+                self.hass,
+                self._async_write_on_interval,
+                CLIENT_SENSOR_UPDATE_INTERVAL,
+            )
+        )
+
+    @callback
+    def _async_write_on_interval(self, _now) -> None:
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Stay available while requests fail, which is when this matters."""
+        return True
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the state."""
+        return self.entity_description.value_fn(self.coordinator)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the sensor."""
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self.coordinator)
+
+class StarlingPaymentsSensor(SensorEntity):
+    """Standing orders and direct debits of an account, on its device.
+
+    The payments coordinator is looked up, and so created, only once the
+    entity is added to Home Assistant, which disabled entities never are.
+    """
+
+    _attr_attribution = ATTRIBUTION
+    _attr_has_entity_name = True
+    _attr_icon = "mdi:calendar-clock"
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        coordinator: StarlingUpdateCoordinator,
+        entity_description,
+        idx,
+        account_name: str
+    ) -> None:
+        """Initialize the sensor on the slow payments tier."""
+        self.idx = idx
+        self.entity_description = entity_description
+        self._coordinator = coordinator
+        self._payments = None
+
+        currency = coordinator.data[idx].currency
+        if entity_description.native_unit_of_measurement and currency:
+            self._attr_native_unit_of_measurement = currency
+
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, f'{str(self.idx)}{account_name}')},
+        )
+        self._attr_unique_id = f"{self.idx}_{account_name}_{self.entity_description.key}"
+
+    async def async_added_to_hass(self) -> None:
+        """Listen to the payments, fetching them for the first entity."""
+        await super().async_added_to_hass()
+        self._payments = self._coordinator.payments
+        self.async_on_remove(
+            self._payments.async_add_listener(self.async_write_ha_state, self.idx)
+        )
+        if self._payments.data is None or self.idx not in self._payments.data:
+            await self._payments.async_request_refresh()
+
+    async def async_update(self) -> None:
+        """Refresh the payments when asked to by the update entity service."""
+        if self._payments is not None:
+            await self._payments.async_request_refresh()
+
+    @property
+    def available(self) -> bool:
+        """Return whether the last refresh of the payments succeeded."""
+        return self._payments is not None and self._payments.last_update_success
+
+    @property
+    def _data(self):
+        if self._payments is None or self._payments.data is None:
+            return None
+        return self._payments.data.get(self.idx)
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the state."""
+        if self._data is None:
+            return None
+        return self.entity_description.value_fn(self._data)
+
+    @property
+    def extra_state_attributes(self):
+        """Return the state attributes of the sensor."""
+        if self._data is None or self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self._data)
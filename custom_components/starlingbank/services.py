@@ -0,0 +1,310 @@
+"""Services for the starlingbank integration that span several entities."""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+from functools import partial
+import logging
+import os
+
+from aiohttp import ClientError
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID, Platform
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.entity_platform import async_get_platforms
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    EXPORT_FORMAT_CSV,
+    EXPORT_FORMAT_JSONL,
+    MASTER,
+    SERVICE_EXPORT_TRANSACTIONS,
+    SERVICE_SEARCH_TRANSACTIONS,
+    SERVICE_SPACE_TRANSFERS,
+)
+from .entity import StarlingBaseEntity
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_TRANSFERS = "transfers"
+ATTR_AMOUNT = "amount_in_minor_units"
+ATTR_START_DATE = "start_date"
+ATTR_END_DATE = "end_date"
+ATTR_FORMAT = "format"
+ATTR_FILENAME = "filename"
+ATTR_RESUME = "resume"
+ATTR_QUERY = "query"
+ATTR_MIN_AMOUNT = "min_amount_in_minor_units"
+ATTR_MAX_AMOUNT = "max_amount_in_minor_units"
+ATTR_DIRECTION = "direction"
+ATTR_SPACE = "space"
+ATTR_LIMIT = "limit"
+ATTR_OFFSET = "offset"
+
+MAX_SEARCH_LIMIT = 100
+
+# Exports are written here, under the configuration directory.
+EXPORT_DIRECTORY = f"{DOMAIN}_exports"
+
+SPACE_TRANSFERS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_TRANSFERS): vol.All(
+            cv.ensure_list,
+            [
+                vol.Schema(
+                    {
+                        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+                        vol.Required(ATTR_AMOUNT): vol.All(
+                            vol.Coerce(int), vol.Range(-65535, 65535)
+                        ),
+                    }
+                )
+            ],
+        ),
+    }
+)
+
+
+def _filename(value: str) -> str:
+    """Validate a bare file name, so exports stay in the export directory."""
+    value = cv.string(value)
+    if not value or os.path.basename(value) != value or value.startswith("."):
+        raise vol.Invalid("filename must be a file name without a directory")
+    return value
+
+
+EXPORT_TRANSACTIONS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Required(ATTR_START_DATE): cv.date,
+        vol.Optional(ATTR_END_DATE): cv.date,
+        vol.Optional(ATTR_FORMAT, default=EXPORT_FORMAT_CSV): vol.In(
+            (EXPORT_FORMAT_CSV, EXPORT_FORMAT_JSONL)
+        ),
+        vol.Optional(ATTR_FILENAME): _filename,
+        vol.Optional(ATTR_RESUME, default=True): cv.boolean,
+    }
+)
+
+SEARCH_TRANSACTIONS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Optional(ATTR_QUERY): cv.string,
+        vol.Optional(ATTR_START_DATE): cv.date,
+        vol.Optional(ATTR_END_DATE): cv.date,
+        vol.Optional(ATTR_MIN_AMOUNT): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(ATTR_MAX_AMOUNT): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(ATTR_DIRECTION): vol.In(("IN", "OUT")),
+        vol.Optional(ATTR_SPACE): cv.entity_id,
+        vol.Optional(ATTR_LIMIT, default=20): vol.All(
+            vol.Coerce(int), vol.Range(1, MAX_SEARCH_LIMIT)
+        ),
+        vol.Optional(ATTR_OFFSET, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+    }
+)
+
+
+def _start_of_day(day: date) -> datetime:
+    """Return the UTC time the local day starts at."""
+    return dt_util.as_utc(dt_util.start_of_local_day(day))
+
+
+def _space_entity(hass: HomeAssistant, entity_id: str):
+    """Return the loaded space sensor with the given entity ID.
+
+    Goal photos are keyed by their space too, but are images rather than
+    sensors, so they are not accepted.
+    """
+    for platform in async_get_platforms(hass, DOMAIN):
+        if platform.domain != Platform.SENSOR:
+            continue
+        entity = platform.entities.get(entity_id)
+        if isinstance(entity, StarlingBaseEntity) and not entity.idx.startswith(
+            MASTER
+        ):
+            return entity
+    raise HomeAssistantError(f"{entity_id} is not a Starling space sensor")
+
+
+def _account_entity(hass: HomeAssistant, entity_id: str):
+    """Return the loaded account entity with the given entity ID.
+
+    Payments sensors are on the account's device too, but are not backed by
+    the account data, so they are not accepted.
+    """
+    for platform in async_get_platforms(hass, DOMAIN):
+        entity = platform.entities.get(entity_id)
+        if isinstance(entity, StarlingBaseEntity) and entity.idx.startswith(MASTER):
+            return entity
+    raise HomeAssistantError(f"{entity_id} is not a Starling account sensor")
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration's services."""
+    exporting: set[str] = set()
+
+    async def async_space_transfers(call: ServiceCall) -> None:
+        """Move money between accounts and several spaces at once.
+
+        Transfers are grouped by the client that owns them, so each token's
+        batch is checked up front, run concurrently and reconciled once.
+        """
+        batches = {}
+        for transfer in call.data[ATTR_TRANSFERS]:
+            entity = _space_entity(hass, transfer[ATTR_ENTITY_ID])
+            batches.setdefault(entity.coordinator, []).append(
+                (entity.idx, transfer[ATTR_AMOUNT])
+            )
+
+        for coordinator, transfers in batches.items():
+            try:
+                coordinator.starling_client.check_transfers(transfers)
+            except ValueError as err:
+                raise HomeAssistantError(str(err)) from err
+
+        # Checked above, so no batch runs unless every one can.
+        results = await asyncio.gather(
+            *(
+                coordinator.space_transfers(transfers, False)
+                for coordinator, transfers in batches.items()
+            )
+        )
+        failures = [failure for result in results for failure in result]
+
+        if failures:
+            raise HomeAssistantError(
+                "Transfers failed: "
+                + ", ".join(f"{uid} ({err})" for (uid, _), err in failures)
+            )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SPACE_TRANSFERS,
+        async_space_transfers,
+        schema=SPACE_TRANSFERS_SCHEMA,
+    )
+
+    async def async_export_transactions(call: ServiceCall) -> ServiceResponse:
+        """Stream an account's feed for a range of days to a file.
+
+        Each window of the feed is written and synced to disk before the
+        next is requested, so memory use does not grow with the range and
+        an interrupted export resumes from the last complete window.
+        """
+        # Only loaded once an export is asked for.
+        from .api.starlingbank import StarlingApiError
+        from .export import FeedExportWriter, feed_pages
+
+        entity = _account_entity(hass, call.data[ATTR_ENTITY_ID])
+        account_uid = entity.coordinator.data[entity.idx].uid
+        account = entity.coordinator.starling_client.accounts[account_uid]
+
+        start_date = call.data[ATTR_START_DATE]
+        end_date = call.data.get(ATTR_END_DATE) or dt_util.now().date()
+        if end_date < start_date:
+            raise HomeAssistantError("end_date must not be before start_date")
+        start = _start_of_day(start_date)
+        end = _start_of_day(end_date + timedelta(days=1))
+
+        export_format = call.data[ATTR_FORMAT]
+        filename = call.data.get(ATTR_FILENAME) or (
+            f"{account_uid}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{export_format}"
+        )
+        path = hass.config.path(EXPORT_DIRECTORY, filename)
+        if path in exporting:
+            raise HomeAssistantError(f"{filename} is already being exported")
+
+        exporting.add(path)
+        writer = FeedExportWriter(path, export_format, account_uid, start, end)
+        try:
+            resume_from = await hass.async_add_executor_job(
+                writer.open, call.data[ATTR_RESUME]
+            )
+            if resume_from is not None:
+                _LOGGER.info("Resuming export of %s from %s", filename, resume_from)
+            async for until, items in feed_pages(account, resume_from or start, end):
+                await hass.async_add_executor_job(writer.write_page, items, until)
+            await hass.async_add_executor_job(writer.finish)
+        except (ClientError, TimeoutError, StarlingApiError, OSError) as err:
+            # A full disk or a file that cannot be written can be resumed
+            # from too, once fixed.
+            raise HomeAssistantError(
+                f"Export of {filename} stopped after {writer.items} items, "
+                f"call again to resume: {err}"
+            ) from err
+        finally:
+            await hass.async_add_executor_job(writer.close)
+            exporting.discard(path)
+
+        return {"path": path, "items": writer.items}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_TRANSACTIONS,
+        async_export_transactions,
+        schema=EXPORT_TRANSACTIONS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_search_transactions(call: ServiceCall) -> ServiceResponse:
+        """Find feed items in the local store, newest first.
+
+        No request is made to Starling; the store is kept up to date by
+        polling and webhooks, and searched through its full-text index.
+        """
+        entity = _account_entity(hass, call.data[ATTR_ENTITY_ID])
+        coordinator = entity.coordinator
+        account_uid = coordinator.data[entity.idx].uid
+        feed_store = coordinator.starling_client.feed_stores.get(account_uid)
+        if feed_store is None:
+            raise HomeAssistantError(
+                f"No transactions are stored for {entity.entity_id}"
+            )
+
+        space = None
+        if ATTR_SPACE in call.data:
+            space_entity = _space_entity(hass, call.data[ATTR_SPACE])
+            if space_entity.coordinator is not coordinator:
+                raise HomeAssistantError(
+                    f"{call.data[ATTR_SPACE]} is not a space of {entity.entity_id}"
+                )
+            space = space_entity.data.name
+
+        start_date = call.data.get(ATTR_START_DATE)
+        end_date = call.data.get(ATTR_END_DATE)
+        items, next_offset = await hass.async_add_executor_job(
+            partial(
+                feed_store.search,
+                call.data.get(ATTR_QUERY),
+                start=_start_of_day(start_date) if start_date else None,
+                end=_start_of_day(end_date + timedelta(days=1)) if end_date else None,
+                min_amount=call.data.get(ATTR_MIN_AMOUNT),
+                max_amount=call.data.get(ATTR_MAX_AMOUNT),
+                direction=call.data.get(ATTR_DIRECTION),
+                space=space,
+                limit=call.data[ATTR_LIMIT],
+                offset=call.data[ATTR_OFFSET],
+            )
+        )
+        return {"items": items, "next_offset": next_offset}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SEARCH_TRANSACTIONS,
+        async_search_transactions,
+        schema=SEARCH_TRANSACTIONS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
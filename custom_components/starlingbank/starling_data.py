@@ -1,29 +1,493 @@
+import asyncio
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+import logging
+
+from homeassistant.util import dt as dt_util
+
+from .api.starlingbank import AsyncStarlingAccount, GoalChanges
+from .const import MASTER, master_idx
+from .feed_store import FeedItem, FeedStore, FeedSummary, parse_time
+
+_LOGGER = logging.getLogger(__name__)
+
+# How far back the first feed ingestion reaches; enough to fill this month.
+FEED_INITIAL_LOOKBACK = timedelta(days=31)
+
+# Relative cost of a request and of each goal in a response, used to choose
+# between the goal list and per-goal requests.
+REQUEST_COST = 4
+GOAL_COST = 1
+
+# Per-goal requests cannot discover new spaces, so the goal list is still
+# requested at least once every this many refreshes.
+GOAL_LIST_EVERY = 10
+
+@dataclass(frozen=True, slots=True)
 class StarlingAccountData:
-    def __init__(self, data) -> None:
-        self.name = 'Starling'
-        self.account = data
+    """Snapshot of an account, compared to skip unchanged updates."""
+
+    uid: str
+    currency: str | None
+    cleared_balance: int | None
+    effective_balance: int | None
+    pending_transactions: int | None
+    accepted_overdraft: int | None
+    feed: FeedSummary | None = None
+    name: str = 'Starling'
+
+@dataclass(frozen=True, slots=True)
+class SavingsGoalData:
+    """Snapshot of a savings goal, compared to skip unchanged updates."""
+
+    uid: str
+    account_uid: str
+    name: str | None
+    target_currency: str | None
+    target_minor_units: int | None
+    total_saved_currency: str | None
+    total_saved_minor_units: int | None
+
+    @property
+    def currency(self):
+        """Return the currency the goal is held in."""
+        return self.total_saved_currency or self.target_currency
+
+def _account_name(account):
+    """Name the primary account 'Starling' and others after themselves."""
+    if account.account_type in (None, 'PRIMARY') or not account.name:
+        return 'Starling'
+    return f'Starling {account.name}'
+
+def _restore_feed(feed):
+    """Rebuild a FeedSummary persisted with asdict."""
+    if feed is None:
+        return None
+    last = feed["last_transaction"]
+    if last is not None:
+        last = FeedItem(
+            **{
+                **last,
+                "transaction_time": dt_util.parse_datetime(
+                    str(last["transaction_time"])
+                ),
+            }
+        )
+    return FeedSummary(**{**feed, "last_transaction": last})
+
+def _check_feed_item(content):
+    """Raise ValueError unless a pushed feed item can be ingested."""
+    if not isinstance(content.get("feedItemUid"), str):
+        raise ValueError("Feed item has no UID")
+    try:
+        parse_time(content["transactionTime"])
+    except (KeyError, TypeError, AttributeError, ValueError) as err:
+        raise ValueError("Feed item has no valid transactionTime") from err
+    if not isinstance(content.get("amount", {}), dict):
+        raise ValueError("Feed item amount is not an object")
+
+def _check_balance(content):
+    """Raise ValueError unless a pushed balance can be applied."""
+    for key in (
+        "clearedBalance",
+        "effectiveBalance",
+        "pendingTransactions",
+        "acceptedOverdraft",
+    ):
+        value = content.get(key)
+        if not isinstance(value, dict) or not isinstance(
+            value.get("minorUnits"), int
+        ):
+            raise ValueError(f"Balance has no {key} amount")
 
 class StarlingData:
-    """Get the latest data and update the states."""
+    """Get the latest data and update the states.
+
+    Tracks every account available to one token. Accounts are keyed by
+    master_idx(account UID) in the coordinator data and goals by goal UID.
+    """
 
-    def __init__(self, account):
-        """Init the starling data object."""
+    def __init__(
+        self,
+        accounts,
+        feed_stores: dict[str, FeedStore] | None = None,
+        open_feed_store: Callable[[str], FeedStore] | None = None,
+    ):
+        """Init the starling data object.
+
+        open_feed_store opens the feed store of an account found after
+        setup, given its UID. It blocks, so it is run in the executor.
+        """
         self.available = False
         self.spaces = []
-        self.starling_account = account
+        self.accounts = {account.account_uid: account for account in accounts}
+        self.feed_stores = feed_stores or {}
+        self._open_feed_store = open_feed_store
+        self.feeds = {}
+        # Goal snapshots by UID, with the goal and revision they came from.
+        self._goal_snapshots = {}
+        # Restored state may be missing goals created since it was saved.
+        self._full_refresh = True
+        self._refreshes_since_goal_list = 0
+
+    @property
+    def primary_account(self):
+        """Return the primary account, or the first one if none is marked."""
+        for account in self.accounts.values():
+            if account.account_type == 'PRIMARY':
+                return account
+        return next(iter(self.accounts.values()))
+
+    @property
+    def api(self):
+        """Return the transport shared by every account."""
+        return self.primary_account.api
+
+    async def update_coordinated(self, listening_idx):
+        """Get the latest data from starling.
+
+        Only the endpoints backing entities in listening_idx are requested.
+        With no listeners yet, such as on the first refresh, everything is.
+        No entity shows the account identifiers, so they are only requested
+        on the first refresh. The goal list, which finds new and deleted
+        spaces, is requested whenever no known space is listened to, and
+        at least every GOAL_LIST_EVERY refreshes otherwise. The accounts
+        themselves are discovered again on the first refresh.
+        """
+        full_refresh = self._full_refresh
+        if full_refresh:
+            await self._reconcile_accounts()
+        listening_idx = set() if full_refresh else set(listening_idx)
+        goal_list_due = self._refreshes_since_goal_list + 1 >= GOAL_LIST_EVERY
+
+        updates = []
+        for uid, account in self.accounts.items():
+            master = not listening_idx or master_idx(uid) in listening_idx
+            goal_uids = listening_idx & account.savings_goals.keys()
+            updates.append(
+                account.refresh(
+                    account=full_refresh,
+                    balance=master,
+                    savings_goals=(
+                        not goal_uids
+                        or goal_list_due
+                        or self._prefer_goal_list(account, goal_uids)
+                    ),
+                    savings_goal_uids=goal_uids,
+                )
+            )
+            if master and uid in self.feed_stores:
+                updates.append(self._update_feed(uid))
+
+        results = await asyncio.gather(*updates)
+        changes = GoalChanges()
+        for result in results:
+            if isinstance(result, GoalChanges):
+                changes |= result
+        if changes.added or changes.removed:
+            _LOGGER.debug(
+                "Spaces added: %s, removed: %s",
+                sorted(changes.added),
+                sorted(changes.removed),
+            )
 
-    def update_coordinated(self, _listening_idx):
-        """Get the latest data from starling."""
-        self.starling_account.update_balance_data()
-        self.starling_account.update_savings_goal_data()
         self.available = True
-        self.spaces = self.starling_account.savings_goals.items()
-        result = dict(self.spaces)
-        result['MASTER'] = StarlingAccountData(self.starling_account)
+        self._full_refresh = False
+        self._refreshes_since_goal_list = (
+            0 if goal_list_due else self._refreshes_since_goal_list + 1
+        )
+        return self.snapshot()
+
+    async def _reconcile_accounts(self):
+        """Add accounts opened since setup and drop those that have closed.
+
+        Accounts restored from a snapshot are only as current as the
+        snapshot. The account list is cached, so this costs no request when
+        the accounts were discovered at setup.
+        """
+        discovered = {
+            account.account_uid: account
+            for account in await AsyncStarlingAccount.async_discover(self.api)
+        }
+        if not discovered:
+            return
+
+        loop = asyncio.get_running_loop()
+        removed = self.accounts.keys() - discovered.keys()
+        added = discovered.keys() - self.accounts.keys()
+        for uid in removed:
+            del self.accounts[uid]
+            self.feeds.pop(uid, None)
+            feed_store = self.feed_stores.pop(uid, None)
+            if feed_store is not None:
+                await loop.run_in_executor(None, feed_store.close)
+        for uid, account in discovered.items():
+            if uid not in added:
+                # Names can change; the balance and goals are kept.
+                self.accounts[uid].restore(account.basic_account_data)
+                continue
+            self.accounts[uid] = account
+            if self._open_feed_store is not None:
+                self.feed_stores[uid] = await loop.run_in_executor(
+                    None, self._open_feed_store, uid
+                )
+        if added or removed:
+            _LOGGER.info(
+                "Accounts added: %s, removed: %s", sorted(added), sorted(removed)
+            )
+
+    def as_dict(self, data):
+        """Convert coordinator data into a form that can be persisted."""
+        return {
+            "accounts": [
+                account.basic_account_data for account in self.accounts.values()
+            ],
+            "data": {idx: asdict(value) for idx, value in data.items()},
+        }
+
+    def restore(self, stored):
+        """Restore the accounts from as_dict output and return their data.
+
+        No requests are made, so entities can be created straight away.
+        The basic data of each account must already be restored.
+        """
+        data = {}
+        goals = {uid: [] for uid in self.accounts}
+        for idx, value in stored["data"].items():
+            if idx.startswith(MASTER):
+                data[idx] = master = StarlingAccountData(
+                    **{**value, "feed": _restore_feed(value["feed"])}
+                )
+                account = self.accounts[master.uid]
+                account.cleared_balance = master.cleared_balance
+                account.effective_balance = master.effective_balance
+                account.pending_transactions = master.pending_transactions
+                account.accepted_overdraft = master.accepted_overdraft
+                self.feeds[master.uid] = master.feed
+            else:
+                data[idx] = goal = SavingsGoalData(**value)
+                goals[goal.account_uid].append(
+                    {
+                        "savingsGoalUid": goal.uid,
+                        "name": goal.name,
+                        "target": {
+                            "currency": goal.target_currency,
+                            "minorUnits": goal.target_minor_units,
+                        },
+                        "totalSaved": {
+                            "currency": goal.total_saved_currency,
+                            "minorUnits": goal.total_saved_minor_units,
+                        },
+                    }
+                )
+
+        for uid, account_goals in goals.items():
+            self.accounts[uid].apply_savings_goal_data(
+                {"savingsGoalList": account_goals}
+            )
+
+        self.spaces = [item for item in data.items() if not item[0].startswith(MASTER)]
+        return data
+
+    def _prefer_goal_list(self, account, goal_uids):
+        """Return whether one list request is cheaper than per-goal requests."""
+        list_cost = REQUEST_COST + GOAL_COST * len(account.savings_goals)
+        return list_cost <= len(goal_uids) * (REQUEST_COST + GOAL_COST)
+
+    def snapshot(self):
+        """Build the coordinator data from the current account state.
+
+        Snapshots are immutable and compare by value, so an unchanged
+        account produces data equal to the previous refresh. Goals whose
+        revision has not moved reuse their previous snapshot.
+        """
+        result = {}
+        self.spaces = []
+        previous = self._goal_snapshots
+        self._goal_snapshots = {}
+        for uid, account in self.accounts.items():
+            result[master_idx(uid)] = StarlingAccountData(
+                uid,
+                account.currency,
+                account.cleared_balance,
+                account.effective_balance,
+                account.pending_transactions,
+                account.accepted_overdraft,
+                self.feeds.get(uid),
+                _account_name(account),
+            )
+            for goal_uid, goal in account.savings_goals.items():
+                cached = previous.get(goal_uid)
+                if cached is None or cached[:2] != (goal, goal.revision):
+                    cached = (
+                        goal,
+                        goal.revision,
+                        SavingsGoalData(
+                            goal_uid,
+                            uid,
+                            goal.name,
+                            goal.target_currency,
+                            goal.target_minor_units,
+                            goal.total_saved_currency,
+                            goal.total_saved_minor_units,
+                        ),
+                    )
+                self._goal_snapshots[goal_uid] = cached
+                self.spaces.append((goal_uid, cached[2]))
+        result.update(self.spaces)
         return result
-    
-    def space_deposit(self, uid, amount_in_minor_units):
-        self.starling_account.savings_goals[uid].deposit(amount_in_minor_units)
 
-    def space_withdraw(self, uid, amount_in_minor_units):
-        self.starling_account.savings_goals[uid].withdraw(amount_in_minor_units)
\ No newline at end of file
+    async def apply_event(self, event) -> tuple[bool, bool]:
+        """Apply a pushed webhook event to the account state.
+
+        Returns whether the event changed the data, and whether the balance
+        it affects still has to be reconciled with a refresh. Raises
+        ValueError, before anything is applied, for an event whose content
+        is not shaped like a feed item or balance.
+        """
+        if not isinstance(event, dict):
+            raise ValueError("Event is not an object")
+        content = event.get("content") or {}
+        if not isinstance(content, dict):
+            raise ValueError("Event content is not an object")
+        account_uid = content.get("accountUid")
+        if account_uid is None and len(self.accounts) == 1:
+            account_uid = next(iter(self.accounts))
+        account = self.accounts.get(account_uid)
+        if account is None:
+            return False, False
+
+        if "feedItemUid" in content:
+            _check_feed_item(content)
+            if account_uid in self.feed_stores:
+                # Pushed items may arrive out of order, so only polling
+                # moves the watermark on.
+                await self._ingest_feed_items(account_uid, [content], False)
+            return True, True
+
+        if "effectiveBalance" in content:
+            _check_balance(content)
+            account.apply_balance_data(content)
+            return True, False
+
+        return False, False
+
+    async def _update_feed(self, account_uid):
+        """Ingest feed changes since the watermark and re-read the summary."""
+        changes_since = self.feed_stores[account_uid].watermark or (
+            dt_util.utcnow() - FEED_INITIAL_LOOKBACK
+        ).isoformat()
+        items = await self.accounts[account_uid].fetch_feed_changes(changes_since)
+        await self._ingest_feed_items(account_uid, items)
+
+    async def _ingest_feed_items(self, account_uid, items, advance_watermark=True):
+        day_start = dt_util.start_of_local_day()
+        week_start = day_start - timedelta(days=day_start.weekday())
+        month_start = day_start.replace(day=1)
+        self.feeds[account_uid] = await asyncio.get_running_loop().run_in_executor(
+            None,
+            self._ingest_and_summarise,
+            self.feed_stores[account_uid],
+            items,
+            advance_watermark,
+            day_start,
+            week_start,
+            month_start,
+        )
+
+    @staticmethod
+    def _ingest_and_summarise(
+        feed_store, items, advance_watermark, day_start, week_start, month_start
+    ):
+        feed_store.ingest(items, advance_watermark)
+        return feed_store.summary(day_start, week_start, month_start)
+
+    async def async_close(self):
+        """Release the feed stores."""
+        for feed_store in self.feed_stores.values():
+            await asyncio.get_running_loop().run_in_executor(
+                None, feed_store.close
+            )
+
+    def savings_goal(self, uid):
+        """Return the savings goal with the given UID from any account."""
+        return self._goal_account(uid).savings_goals[uid]
+
+    def _goal_account(self, uid):
+        """Return the account holding a goal, raising ValueError if none does."""
+        for account in self.accounts.values():
+            if uid in account.savings_goals:
+                return account
+        raise ValueError(f"Unknown space {uid}")
+
+    def check_transfers(self, transfers):
+        """Raise ValueError unless every transfer in a batch can be funded.
+
+        transfers holds (goal UID, amount) pairs, depositing positive
+        amounts and withdrawing negative ones, optionally followed by the
+        UID to make the transfer with. Deposits are checked against the
+        effective balance of their account and withdrawals against the
+        goal, without counting on money the batch itself moves.
+        """
+        deposits = {}
+        for uid, amount, *_ in transfers:
+            if amount == 0:
+                raise ValueError(f"Transfer to {uid} has no amount")
+            account = self._goal_account(uid)
+            if amount > 0:
+                deposits[account.account_uid] = (
+                    deposits.get(account.account_uid, 0) + amount
+                )
+            elif -amount > (account.savings_goals[uid].total_saved_minor_units or 0):
+                raise ValueError(f"Space {uid} holds less than {-amount}")
+
+        for account_uid, total in deposits.items():
+            if total > (self.accounts[account_uid].effective_balance or 0):
+                raise ValueError(
+                    f"Deposits of {total} exceed the balance of {account_uid}"
+                )
+
+    async def space_transfers(self, transfers, check=True):
+        """Check a batch of transfers, then run them concurrently.
+
+        Returns (transfer, exception) for each transfer that failed, with
+        the transfer as it was given; the others are applied. Pass check
+        as False for transfers that may already have been applied, such
+        as repeats of one that timed out, which the balance no longer
+        funds.
+        """
+        if check:
+            self.check_transfers(transfers)
+        results = await asyncio.gather(
+            *(
+                self.space_deposit(uid, amount, *transfer_uid)
+                if amount > 0
+                else self.space_withdraw(uid, -amount, *transfer_uid)
+                for uid, amount, *transfer_uid in transfers
+            ),
+            return_exceptions=True,
+        )
+        return [
+            (transfer, result)
+            for transfer, result in zip(transfers, results)
+            if isinstance(result, Exception)
+        ]
+
+    async def space_deposit(self, uid, amount_in_minor_units, transfer_uid=None):
+        account = self._goal_account(uid)
+        await account.savings_goals[uid].deposit(amount_in_minor_units, transfer_uid)
+        self._adjust_balance(account, -amount_in_minor_units)
+
+    async def space_withdraw(self, uid, amount_in_minor_units, transfer_uid=None):
+        account = self._goal_account(uid)
+        await account.savings_goals[uid].withdraw(amount_in_minor_units, transfer_uid)
+        self._adjust_balance(account, amount_in_minor_units)
+
+    @staticmethod
+    def _adjust_balance(account, minor_units):
+        """Apply a space transfer to the account balance until reconciled."""
+        if account.cleared_balance is not None:
+            account.cleared_balance += minor_units
+        if account.effective_balance is not None:
+            account.effective_balance += minor_units
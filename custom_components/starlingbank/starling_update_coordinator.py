@@ -1,28 +1,97 @@
 """Example integration using DataUpdateCoordinator."""
 
+import asyncio
 from datetime import timedelta
+from http import HTTPStatus
 import logging
+from time import monotonic
 
+from aiohttp import ClientError, ClientResponseError
 import async_timeout
 
+from homeassistant.helpers.debounce import Debouncer
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+from .api.starlingbank import LatencyHistogram, StarlingApiError
+
+from .const import (
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# Seconds a refresh may take, leaving room for rate-limit retries.
+UPDATE_TIMEOUT = 30
+
+# Seconds to wait after the last transfer before checking its totals with
+# the API, so a burst of transfers is reconciled by one refresh.
+RECONCILE_DELAY = 30
+
+def _is_transient(err: Exception) -> bool:
+    """Return whether a failed refresh may succeed if simply tried again.
+
+    Responses refusing the request, such as a revoked token, are not.
+    """
+    if isinstance(err, ClientResponseError):
+        return (
+            err.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+            or err.status == HTTPStatus.TOO_MANY_REQUESTS
+        )
+    return True
+
+class AdaptiveInterval:
+    """Polling interval that backs off exponentially while nothing changes."""
+
+    def __init__(self, minimum: timedelta, maximum: timedelta) -> None:
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.current = minimum
+
+    def reset(self) -> timedelta:
+        """Poll at the minimum interval again after activity."""
+        self.current = self.minimum
+        return self.current
+
+    def backoff(self) -> timedelta:
+        """Double the interval, up to the maximum."""
+        self.current = min(self.current * 2, self.maximum)
+        return self.current
+
 class StarlingUpdateCoordinator(DataUpdateCoordinator):
-    def __init__(self, hass, client):
+    def __init__(
+        self,
+        hass,
+        client,
+        min_update_interval=DEFAULT_MIN_UPDATE_INTERVAL,
+        max_update_interval=DEFAULT_MAX_UPDATE_INTERVAL,
+    ):
         """Initialize my coordinator."""
+        self._interval = AdaptiveInterval(min_update_interval, max_update_interval)
         super().__init__(
             hass,
             _LOGGER,
             # Name of the data. For logging purposes.
             name="Starling",
             # Polling interval. Will only be polled if there are subscribers.
-            update_interval=timedelta(minutes=5),
+            update_interval=self._interval.current,
+            # Snapshots compare by value, so unchanged refreshes notify nobody.
+            always_update=False,
+        )
+        self.starling_client = client
+        self.refresh_latency = LatencyHistogram()
+        self.refresh_failures = 0
+        self._payments = None
+        self._reconcile = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=RECONCILE_DELAY,
+            immediate=False,
+            function=self.async_refresh,
         )
-        self._starling_client = client
 
     async def _async_update_data(self):
         """Fetch data from API endpoint.
@@ -33,12 +102,33 @@ class StarlingUpdateCoordinator(DataUpdateCoordinator):
         # try:
         # Note: asyncio.TimeoutError and aiohttp.ClientError are already
         # handled by the data update coordinator.
-        async with async_timeout.timeout(10):
-            # Grab active context variables to limit data required to be fetched from API
-            # Note: using context is not required if there is no need or ability to limit
-            # data retrieved from API.
-            listening_idx = set(self.async_contexts())
-            return await self.hass.async_add_executor_job(self._starling_client.update_coordinated, listening_idx)
+        started = monotonic()
+        try:
+            async with async_timeout.timeout(UPDATE_TIMEOUT):
+                # Grab active context variables to limit data required to be fetched from API
+                # Note: using context is not required if there is no need or ability to limit
+                # data retrieved from API.
+                listening_idx = set(self.async_contexts())
+                data = await self.starling_client.update_coordinated(listening_idx)
+        except (StarlingApiError, ClientError, asyncio.TimeoutError) as err:
+            self.refresh_failures += 1
+            # Keep serving the last good data, such as a restored snapshot,
+            # through an outage; only refused requests are reported.
+            if self.data is None or not _is_transient(err):
+                raise UpdateFailed(str(err) or type(err).__name__) from err
+            _LOGGER.debug("Serving last good Starling data: %s", err)
+            return self.data
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        finally:
+            self.refresh_latency.record(monotonic() - started)
+
+        if data != self.data:
+            self.update_interval = self._interval.reset()
+        else:
+            self.update_interval = self._interval.backoff()
+        return data
         # except ApiAuthError as err:
         #     # Raising ConfigEntryAuthFailed will cancel future updates
         #     # and start a config flow with SOURCE_REAUTH (async_step_reauth)
@@ -46,8 +136,74 @@ class StarlingUpdateCoordinator(DataUpdateCoordinator):
         # except ApiError as err:
         #     raise UpdateFailed(f"Error communicating with API: {err}")
 
+    async def async_handle_event(self, event):
+        """Apply a pushed webhook event without polling the API.
+
+        Raises ValueError for a malformed event, leaving the data as it was.
+        """
+        changed, reconcile = await self.starling_client.apply_event(event)
+        if changed:
+            self.async_note_activity()
+            self.async_set_updated_data(self.starling_client.snapshot())
+        if reconcile:
+            await self.async_request_refresh()
+
+    @property
+    def payments(self):
+        """Return the coordinator of the slow payments tier.
+
+        It and its module are created the first time a payments entity
+        needs them.
+        """
+        if self._payments is None:
+            from .payments import StarlingPaymentsCoordinator
+
+            self._payments = StarlingPaymentsCoordinator(
+                self.hass, self.starling_client
+            )
+        return self._payments
+
+    def diagnostics(self):
+        """Return refresh timings and the client's instrumentation."""
+        return {
+            "update_interval": self.update_interval.total_seconds(),
+            "last_update_success": self.last_update_success,
+            "refresh_latency": self.refresh_latency.as_dict(),
+            "refresh_failures": self.refresh_failures,
+            "client": self.starling_client.api.diagnostics(),
+        }
+
+    def async_note_activity(self):
+        """Return to the minimum polling interval after account activity.
+
+        Callers then publish the change with async_set_updated_data, which
+        replaces the poll already scheduled at the backed-off interval.
+        """
+        self.update_interval = self._interval.reset()
+
     async def space_deposit(self, uid, amount_in_minor_units):
-        await self.hass.async_add_executor_job(self._starling_client.space_deposit, uid, amount_in_minor_units)
+        await self.starling_client.space_deposit(uid, amount_in_minor_units)
+        await self._async_apply_transfer()
 
     async def space_withdraw(self, uid, amount_in_minor_units):
-        await self.hass.async_add_executor_job(self._starling_client.space_withdraw, uid, amount_in_minor_units)
\ No newline at end of file
+        await self.starling_client.space_withdraw(uid, amount_in_minor_units)
+        await self._async_apply_transfer()
+
+    async def space_transfers(self, transfers, check=True):
+        """Run a batch of transfers and reconcile them with one refresh."""
+        failures = await self.starling_client.space_transfers(transfers, check)
+        await self._async_apply_transfer()
+        return failures
+
+    async def _async_apply_transfer(self):
+        """Show a completed transfer now and reconcile it with the API later."""
+        self.async_note_activity()
+        self.async_set_updated_data(self.starling_client.snapshot())
+        await self._reconcile.async_call()
+
+    async def async_shutdown(self):
+        """Cancel any pending reconciliation and stop the payments tier."""
+        self._reconcile.async_cancel()
+        if self._payments is not None:
+            await self._payments.async_shutdown()
+        await super().async_shutdown()
@@ -0,0 +1,183 @@
+"""Long-term balance statistics rebuilt from the transaction feed."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+from functools import partial
+import logging
+
+from aiohttp import ClientError
+
+from homeassistant.components.recorder.models import (
+    StatisticData,
+    StatisticMetaData,
+)
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .api.starlingbank import StarlingApiError
+from .const import DOMAIN
+from .feed_store import FeedStore, parse_time
+
+_LOGGER = logging.getLogger(__name__)
+
+# History is requested, and statistics written, one window at a time so
+# memory use does not grow with the age of the account.
+HISTORY_CHUNK = timedelta(days=30)
+STATISTICS_CHUNK = timedelta(days=30)
+
+# Recent hours are left open until late feed items have had time to arrive.
+STATISTICS_LAG = timedelta(hours=2)
+
+# Keys of the import watermarks kept in the feed store.
+META_HISTORY_TARGET = "history_target"
+META_HISTORY_UNTIL = "history_until"
+META_STATISTICS_HOUR = "statistics_hour"
+META_STATISTICS_ROW = "statistics_row"
+META_STATISTICS_WATERMARK = "statistics_watermark"
+
+HOUR = timedelta(hours=1)
+
+
+def balance_statistic_id(account_uid: str) -> str:
+    """Return the external statistic ID for an account's balance."""
+    return f"{DOMAIN}:balance_{account_uid.replace('-', '_').lower()}"
+
+
+def _start_of_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class BalanceStatisticsImporter:
+    """Writes the hourly running balance of an account to statistics.
+
+    The feed is backfilled from the day the account was opened. The
+    balance at the start of each run is worked back from the live cleared
+    balance, less every item since, and summed forward an hour at a time.
+    Progress is saved after every window, so an interrupted import resumes
+    where it stopped. Later runs add the newest hours, and write the series
+    again when items older than the written hours arrive or change.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, account, feed_store: FeedStore, name: str
+    ) -> None:
+        self._hass = hass
+        self._account = account
+        self._feed_store = feed_store
+        self._lock = asyncio.Lock()
+        self._metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{name} balance",
+            source=DOMAIN,
+            statistic_id=balance_statistic_id(account.account_uid),
+            unit_of_measurement=account.currency,
+        )
+
+    async def async_run(self, *_) -> None:
+        """Import whatever history and hours are still missing."""
+        if self._lock.locked():
+            return
+        async with self._lock:
+            try:
+                await self._async_backfill_feed()
+            except (ClientError, TimeoutError, StarlingApiError) as err:
+                _LOGGER.warning(
+                    "Unable to backfill the Starling feed, will retry: %s", err
+                )
+                return
+            await self._async_write_statistics()
+
+    async def _async_backfill_feed(self) -> None:
+        """Request feed history up to the point polling started from."""
+        target = await self._async_meta(META_HISTORY_TARGET)
+        if target is None:
+            # The feed is polled from here on, so history is only needed
+            # up to now.
+            target = dt_util.utcnow().isoformat()
+            await self._async_set_meta(**{META_HISTORY_TARGET: target})
+        target = parse_time(target)
+
+        until = await self._async_meta(META_HISTORY_UNTIL)
+        start = parse_time(until or self._account.created_at)
+        while start < target:
+            end = min(start + HISTORY_CHUNK, target)
+            items = await self._account.fetch_feed_between(
+                start.isoformat(), end.isoformat()
+            )
+            await self._hass.async_add_executor_job(
+                self._feed_store.ingest, items, False
+            )
+            await self._async_set_meta(**{META_HISTORY_UNTIL: end.isoformat()})
+            start = end
+
+    async def _async_write_statistics(self) -> None:
+        """Sum the balance forward and write each complete hour."""
+        live_balance = self._account.cleared_balance
+        if live_balance is None:
+            # Not refreshed yet; the next run anchors the series.
+            return
+
+        first_hour = _start_of_hour(parse_time(self._account.created_at))
+        hour = await self._async_meta(META_STATISTICS_HOUR)
+        if hour is None:
+            hour = first_hour
+        else:
+            hour = parse_time(hour)
+            changed = await self._hass.async_add_executor_job(
+                self._feed_store.earliest_change,
+                int(await self._async_meta(META_STATISTICS_ROW) or 0),
+                await self._async_meta(META_STATISTICS_WATERMARK),
+            )
+            if changed is not None and changed < hour:
+                # Working back from the live balance, an item moves every
+                # hour before it, so the series is written again in full.
+                hour = first_hour
+        last_hour = _start_of_hour(dt_util.utcnow() - STATISTICS_LAG)
+        if hour >= last_hour:
+            return
+
+        # Items ingested from here on are picked up by the next run.
+        progress = {META_STATISTICS_ROW: await self._hass.async_add_executor_job(
+            self._feed_store.last_row
+        )}
+        if self._feed_store.watermark is not None:
+            progress[META_STATISTICS_WATERMARK] = self._feed_store.watermark
+        balance = live_balance - await self._hass.async_add_executor_job(
+            self._feed_store.balance_change_since, hour
+        )
+
+        while hour < last_hour:
+            end = min(hour + STATISTICS_CHUNK, last_hour)
+            changes = dict(
+                await self._hass.async_add_executor_job(
+                    self._feed_store.hourly_balance_changes, hour, end
+                )
+            )
+
+            statistics = []
+            while hour < end:
+                balance += changes.get(int(hour.timestamp()), 0)
+                statistics.append(
+                    StatisticData(start=hour, state=balance / 100, sum=balance / 100)
+                )
+                hour += HOUR
+            async_add_external_statistics(self._hass, self._metadata, statistics)
+
+            await self._async_set_meta(
+                **{META_STATISTICS_HOUR: hour.isoformat(), **progress}
+            )
+
+    async def _async_meta(self, key: str) -> str | None:
+        return await self._hass.async_add_executor_job(
+            self._feed_store.get_meta, key
+        )
+
+    async def _async_set_meta(self, **values) -> None:
+        await self._hass.async_add_executor_job(
+            partial(self._feed_store.set_meta, **values)
+        )
@@ -0,0 +1,417 @@
+"""Rules that move money into spaces as the accounts change.
+
+Rules are validated and compiled once, when the config entry loads, and
+evaluated after every coordinator update by one engine for each token. The transfers of all rules are
+checked and made as one batch.
+
+Each transfer is recorded with its UID before it is sent, and repeated
+with that UID until Starling confirms or refuses it. A transfer that timed
+out after Starling applied it is then not applied a second time, and its
+rule is not evaluated again until it is settled.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from functools import partial
+from http import HTTPStatus
+import json
+import logging
+from typing import Any
+import uuid
+
+from aiohttp import ClientResponseError
+import voluptuous as vol
+
+from homeassistant.const import CONF_NAME, CONF_TYPE
+from homeassistant.core import HomeAssistant, callback
+import homeassistant.helpers.config_validation as cv
+
+from .const import MASTER, master_idx
+
+_LOGGER = logging.getLogger(__name__)
+
+RULE_SWEEP_ABOVE = "sweep_above"
+RULE_ROUND_UP = "round_up"
+RULE_PERCENT_OF_INCOME = "percent_of_income"
+
+CONF_SPACE = "space"
+CONF_THRESHOLD = "threshold_minor_units"
+CONF_MULTIPLE = "multiple_minor_units"
+CONF_PERCENT = "percent"
+CONF_MIN_TRANSFER = "min_transfer_minor_units"
+
+DEFAULT_MULTIPLE = 100
+DEFAULT_MIN_TRANSFER = 100
+
+# Feed store key of the ingestion position of each feed rule's last
+# processed item.
+META_CURSOR = "sweep_row_{0}"
+
+# Feed store key of each rule's transfer that Starling has not confirmed.
+META_UNCONFIRMED = "sweep_unconfirmed_{0}"
+
+MINOR_UNITS = vol.All(vol.Coerce(int), vol.Range(min=1))
+
+_BASE_SCHEMA = {
+    vol.Required(CONF_NAME): cv.string,
+    vol.Required(CONF_SPACE): cv.string,
+    vol.Optional(CONF_MIN_TRANSFER, default=DEFAULT_MIN_TRANSFER): MINOR_UNITS,
+}
+
+RULE_SCHEMA = cv.key_value_schemas(
+    CONF_TYPE,
+    {
+        RULE_SWEEP_ABOVE: vol.Schema(
+            {
+                **_BASE_SCHEMA,
+                vol.Required(CONF_TYPE): RULE_SWEEP_ABOVE,
+                vol.Required(CONF_THRESHOLD): vol.All(
+                    vol.Coerce(int), vol.Range(min=0)
+                ),
+            }
+        ),
+        RULE_ROUND_UP: vol.Schema(
+            {
+                **_BASE_SCHEMA,
+                vol.Required(CONF_TYPE): RULE_ROUND_UP,
+                vol.Optional(CONF_MULTIPLE, default=DEFAULT_MULTIPLE): MINOR_UNITS,
+            }
+        ),
+        RULE_PERCENT_OF_INCOME: vol.Schema(
+            {
+                **_BASE_SCHEMA,
+                vol.Required(CONF_TYPE): RULE_PERCENT_OF_INCOME,
+                vol.Required(CONF_PERCENT): vol.All(
+                    vol.Coerce(float), vol.Range(min=0, max=100, min_included=False)
+                ),
+            }
+        ),
+    },
+)
+
+
+def _unique_names(rules: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    names = [rule[CONF_NAME] for rule in rules]
+    if len(names) != len(set(names)):
+        raise vol.Invalid("rule names must be unique")
+    return rules
+
+
+SWEEP_RULES_SCHEMA = vol.All(cv.ensure_list, [RULE_SCHEMA], _unique_names)
+
+
+@dataclass(frozen=True, slots=True)
+class SweepRule:
+    """Deposits into a space whatever the balance holds above a threshold."""
+
+    name: str
+    space: str
+    min_transfer: int
+    threshold: int
+
+    # Direction of the feed items the rule acts on, if any.
+    direction = None
+
+    def amount(self, available: int, items: Iterable[tuple]) -> int:
+        """Return the amount to deposit from the available balance."""
+        return max(available - self.threshold, 0)
+
+
+@dataclass(frozen=True, slots=True)
+class RoundUpRule:
+    """Deposits the change from rounding each payment up to a multiple."""
+
+    name: str
+    space: str
+    min_transfer: int
+    multiple: int
+
+    direction = "OUT"
+
+    def amount(self, available: int, items: Iterable[tuple]) -> int:
+        """Return the round-ups of items, (row, UID, amount) tuples."""
+        return sum(-amount % self.multiple for _, _, amount in items)
+
+
+@dataclass(frozen=True, slots=True)
+class IncomeRule:
+    """Deposits a percentage of every payment received."""
+
+    name: str
+    space: str
+    min_transfer: int
+    percent: float
+
+    direction = "IN"
+
+    def amount(self, available: int, items: Iterable[tuple]) -> int:
+        """Return the share of items, (row, UID, amount) tuples."""
+        return int(sum(amount for _, _, amount in items) * self.percent / 100)
+
+
+def compile_rules(config: list[dict[str, Any]]) -> list:
+    """Validate configured rules and build them.
+
+    Feed rules come first, so balance rules sweep what they leave.
+    """
+    rules = []
+    for rule in SWEEP_RULES_SCHEMA(config):
+        common = (rule[CONF_NAME], rule[CONF_SPACE], rule[CONF_MIN_TRANSFER])
+        if rule[CONF_TYPE] == RULE_SWEEP_ABOVE:
+            rules.append(SweepRule(*common, rule[CONF_THRESHOLD]))
+        elif rule[CONF_TYPE] == RULE_ROUND_UP:
+            rules.append(RoundUpRule(*common, rule[CONF_MULTIPLE]))
+        else:
+            rules.append(IncomeRule(*common, rule[CONF_PERCENT]))
+    return sorted(rules, key=lambda rule: rule.direction is None)
+
+
+def merge_rules(rule_sets: Iterable[list]) -> list:
+    """Merge the compiled rules of entries sharing a token into one list.
+
+    Rule names key each rule's progress in the feed store, so of rules with
+    the same name only the first is kept.
+    """
+    rules = {}
+    for rule_set in rule_sets:
+        for rule in rule_set:
+            if rule.name in rules:
+                _LOGGER.warning(
+                    "Sweep rule %s is configured by more than one entry with "
+                    "the same token; only the first is used",
+                    rule.name,
+                )
+                continue
+            rules[rule.name] = rule
+    return sorted(rules.values(), key=lambda rule: rule.direction is None)
+
+
+def _refused(err: Exception) -> bool:
+    """Return whether Starling refused a transfer, so it was not applied.
+
+    Timeouts, connection errors and server errors leave it unknown whether
+    the transfer went through.
+    """
+    return (
+        isinstance(err, ClientResponseError)
+        and err.status < HTTPStatus.INTERNAL_SERVER_ERROR
+        and err.status != HTTPStatus.TOO_MANY_REQUESTS
+    )
+
+
+class SweepEngine:
+    """Evaluates compiled rules against each update of a coordinator."""
+
+    def __init__(self, hass: HomeAssistant, coordinator, rules: list) -> None:
+        self._hass = hass
+        self._coordinator = coordinator
+        self._rules = rules
+        self._pending = False
+        self._transferring = False
+        self._task: asyncio.Task | None = None
+        self._missing: set[str] = set()
+
+    def set_rules(self, rules: list) -> None:
+        """Replace the rules, from the next evaluation on."""
+        self._rules = rules
+
+    @callback
+    def async_start(self) -> Callable[[], None]:
+        """Evaluate the rules after every update until unsubscribed.
+
+        Listening on each account keeps its balance and feed polled even
+        while none of its entities are enabled.
+        """
+        unsubscribes = [
+            self._coordinator.async_add_listener(
+                self._async_handle_update, master_idx(account_uid)
+            )
+            for account_uid in self._coordinator.starling_client.accounts
+        ]
+
+        @callback
+        def _async_stop() -> None:
+            for unsubscribe in unsubscribes:
+                unsubscribe()
+            if self._task is not None:
+                self._task.cancel()
+
+        return _async_stop
+
+    @callback
+    def _async_handle_update(self) -> None:
+        if self._transferring or not self._coordinator.last_update_success:
+            # The engine's own transfers publish updates too; failed ones
+            # are retried on the next refresh rather than straight away.
+            return
+        # Every account's listener is called for one update, and updates
+        # during an evaluation are handled by one more pass.
+        self._pending = True
+        if self._task is None or self._task.done():
+            self._task = self._hass.async_create_background_task(
+                self._async_run(), "starlingbank sweeps"
+            )
+
+    async def _async_run(self) -> None:
+        while self._pending:
+            self._pending = False
+            await self._async_evaluate()
+
+    async def _async_evaluate(self) -> None:
+        """Make the transfers the rules call for in the current data.
+
+        Rules with an unconfirmed transfer repeat it instead. Repeats are
+        not checked against the balance, which already counts them if
+        Starling applied them.
+        """
+        data = self._coordinator.data
+        client = self._coordinator.starling_client
+        spaces = {
+            value.name: value
+            for idx, value in data.items()
+            if not idx.startswith(MASTER)
+        }
+        available = {
+            value.uid: value.effective_balance or 0
+            for idx, value in data.items()
+            if idx.startswith(MASTER)
+        }
+
+        repeats = []
+        planned = []
+        for rule in self._rules:
+            space = spaces.get(rule.space)
+            if space is None:
+                if rule.name not in self._missing:
+                    self._missing.add(rule.name)
+                    _LOGGER.warning(
+                        "Sweep %s skipped, there is no space named %s",
+                        rule.name,
+                        rule.space,
+                    )
+                continue
+            self._missing.discard(rule.name)
+
+            feed_store = client.feed_stores.get(space.account_uid)
+            if feed_store is None:
+                continue
+            cursor, items, unconfirmed = await self._hass.async_add_executor_job(
+                self._load, feed_store, rule
+            )
+            if unconfirmed is not None:
+                available[space.account_uid] -= unconfirmed["amount"]
+                repeats.append((rule, feed_store, unconfirmed))
+                continue
+            if rule.direction is not None and cursor is None:
+                continue
+
+            amount = rule.amount(available[space.account_uid], items)
+            if items:
+                cursor = items[-1][0]
+            if amount < rule.min_transfer:
+                # Nothing to move yet; round-ups and income add up until
+                # they are worth a transfer.
+                if amount == 0 and items:
+                    await self._async_save(feed_store, rule, cursor=cursor)
+                continue
+
+            available[space.account_uid] -= amount
+            planned.append(
+                (
+                    rule,
+                    feed_store,
+                    {
+                        "space": space.uid,
+                        "amount": amount,
+                        "transfer_uid": str(uuid.uuid4()),
+                        "row": cursor if rule.direction is not None else None,
+                    },
+                )
+            )
+
+        if planned:
+            try:
+                client.check_transfers(
+                    [(record["space"], record["amount"]) for _, _, record in planned]
+                )
+            except ValueError as err:
+                _LOGGER.warning("Sweeps skipped: %s", err)
+                planned = []
+        for rule, feed_store, record in planned:
+            await self._async_save(feed_store, rule, unconfirmed=record)
+
+        batch = repeats + planned
+        if not batch:
+            return
+        transfers = [
+            (record["space"], record["amount"], record["transfer_uid"])
+            for _, _, record in batch
+        ]
+        self._transferring = True
+        try:
+            failures = await self._coordinator.space_transfers(transfers, False)
+        finally:
+            self._transferring = False
+        errors = {transfer[2]: err for transfer, err in failures}
+
+        for rule, feed_store, record in batch:
+            err = errors.get(record["transfer_uid"])
+            if err is None:
+                await self._async_save(
+                    feed_store, rule, cursor=record["row"], unconfirmed=None
+                )
+            elif _refused(err):
+                # Not applied, so the rule is evaluated afresh next time.
+                _LOGGER.warning("Sweep %s was refused: %s", rule.name, err)
+                await self._async_save(feed_store, rule, unconfirmed=None)
+            else:
+                _LOGGER.warning(
+                    "Sweep %s not confirmed, will repeat it: %s",
+                    rule.name,
+                    str(err) or type(err).__name__,
+                )
+
+    async def _async_save(self, feed_store, rule, **values: Any) -> None:
+        """Save a rule's cursor and unconfirmed transfer, where given.
+
+        A cursor of None is left as it is, and an unconfirmed transfer of
+        None clears it.
+        """
+        meta = {}
+        if values.get("cursor") is not None:
+            meta[META_CURSOR.format(rule.name)] = values["cursor"]
+        if "unconfirmed" in values:
+            meta[META_UNCONFIRMED.format(rule.name)] = (
+                json.dumps(values["unconfirmed"])
+                if values["unconfirmed"] is not None
+                else ""
+            )
+        if meta:
+            await self._hass.async_add_executor_job(
+                partial(feed_store.set_meta, **meta)
+            )
+
+    @staticmethod
+    def _load(
+        feed_store, rule
+    ) -> tuple[int | None, list[tuple], dict[str, Any] | None]:
+        """Return a rule's cursor, new items and unconfirmed transfer.
+
+        Only feed rules have a cursor. It is None for a new feed rule,
+        which starts from the newest item rather than acting on past ones.
+        """
+        unconfirmed = feed_store.get_meta(META_UNCONFIRMED.format(rule.name))
+        if unconfirmed:
+            return None, [], json.loads(unconfirmed)
+        if rule.direction is None:
+            return None, [], None
+        key = META_CURSOR.format(rule.name)
+        cursor = feed_store.get_meta(key)
+        if cursor is None:
+            feed_store.set_meta(**{key: feed_store.last_row()})
+            return None, [], None
+        return int(cursor), feed_store.transactions_after(
+            int(cursor), rule.direction
+        ), None
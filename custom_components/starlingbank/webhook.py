@@ -0,0 +1,85 @@
+"""Webhook receiver for Starling push events."""
+from __future__ import annotations
+
+from base64 import b64decode
+import binascii
+from http import HTTPStatus
+import json
+import logging
+
+from aiohttp import web
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.serialization import (
+    load_der_public_key,
+    load_pem_public_key,
+)
+
+from homeassistant.components import webhook
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+from .starling_update_coordinator import StarlingUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-Hook-Signature"
+
+
+def load_public_key(public_key: str):
+    """Load the webhook public key from PEM or base64 encoded DER."""
+    if "BEGIN PUBLIC KEY" in public_key:
+        return load_pem_public_key(public_key.encode())
+    return load_der_public_key(b64decode(public_key))
+
+
+def verify_signature(public_key, body: bytes, signature: str | None) -> bool:
+    """Check the SHA512withRSA signature Starling sends with each event."""
+    if not signature:
+        return False
+    try:
+        public_key.verify(
+            b64decode(signature), body, padding.PKCS1v15(), hashes.SHA512()
+        )
+    except (InvalidSignature, binascii.Error, ValueError):
+        return False
+    return True
+
+
+@callback
+def async_register_webhook(
+    hass: HomeAssistant,
+    webhook_id: str,
+    public_key: str,
+    coordinator: StarlingUpdateCoordinator,
+) -> None:
+    """Register the webhook that applies pushed events to the coordinator."""
+    key = load_public_key(public_key)
+
+    async def async_handle_webhook(
+        hass: HomeAssistant, webhook_id: str, request: web.Request
+    ) -> web.Response:
+        body = await request.read()
+        if not verify_signature(key, body, request.headers.get(SIGNATURE_HEADER)):
+            _LOGGER.warning("Rejected Starling webhook with a bad signature")
+            return web.Response(status=HTTPStatus.UNAUTHORIZED)
+
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return web.Response(status=HTTPStatus.BAD_REQUEST)
+
+        try:
+            await coordinator.async_handle_event(event)
+        except ValueError as err:
+            _LOGGER.warning("Ignoring malformed Starling webhook event: %s", err)
+            return web.Response(status=HTTPStatus.BAD_REQUEST)
+        return web.Response(status=HTTPStatus.OK)
+
+    webhook.async_register(
+        hass, DOMAIN, "Starling Bank", webhook_id, async_handle_webhook
+    )
+    _LOGGER.info(
+        "Starling webhook URL: %s", webhook.async_generate_url(hass, webhook_id)
+    )
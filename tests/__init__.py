@@ -0,0 +1 @@
+"""Tests for the Starling Bank integration."""
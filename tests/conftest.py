@@ -0,0 +1,144 @@
+"""Fixtures running the integration against the local mock Starling API.
+
+Run from the repository root, in an environment with Home Assistant and
+pytest installed:
+
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+from datetime import datetime, timedelta, timezone
+from functools import partial
+import tempfile
+
+from aiohttp import ClientSession
+import pytest
+
+from benchmarks.mock_starling import MockConfig, MockStarlingServer
+from benchmarks.run import create_starling_data
+from custom_components.starlingbank.api import starlingbank as starling_api
+from custom_components.starlingbank.feed_store import FeedStore
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers", "mock_config(**fields): MockConfig fields of the mock server"
+    )
+
+
+@pytest.fixture
+def server(
+    request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[MockStarlingServer]:
+    """Start a mock server, configured by the test's mock_config marker."""
+    marker = request.node.get_closest_marker("mock_config")
+    with MockStarlingServer(MockConfig(**(marker.kwargs if marker else {}))) as mock:
+        monkeypatch.setattr(starling_api, "BASE_URL", mock.url)
+        yield mock
+
+
+
+def fast_scheduler(**kwargs) -> starling_api.RequestScheduler:
+    """Return a scheduler that neither paces requests nor backs off for long."""
+    return starling_api.RequestScheduler(
+        **{"rate": 1000, "burst": 1000, "backoff": 0.01, **kwargs}
+    )
+
+
+async def fetch(scheduler, *endpoints, cache=None, tier=None) -> list:
+    """Request endpoints concurrently through a new client."""
+    async with ClientSession() as session:
+        api = starling_api.StarlingApi(
+            session, "token", cache=cache, scheduler=scheduler
+        )
+        return await asyncio.gather(
+            *(api.get(endpoint, tier) for endpoint in endpoints)
+        )
+
+
+def feed_item(uid: int, amount: int, hours_ago: float = 0, **fields) -> dict:
+    """Return an outgoing card payment made hours_ago, as the feed has it."""
+    return {
+        "feedItemUid": f"item-{uid}",
+        "amount": {"currency": "GBP", "minorUnits": amount},
+        "direction": "OUT",
+        "updatedAt": NOW.isoformat(),
+        "transactionTime": (NOW - timedelta(hours=hours_ago)).isoformat(),
+        "source": "MASTER_CARD",
+        "status": "SETTLED",
+        "counterPartyName": "Tesco Express",
+        "spendingCategory": "GROCERIES",
+        "reference": "Weekly shop",
+        **fields,
+    }
+
+
+@pytest.fixture
+def store(tmp_path) -> Iterator[FeedStore]:
+    """Return an open feed store in a temporary directory."""
+    feed_store = FeedStore(str(tmp_path / "feed.db"))
+    feed_store.open()
+    yield feed_store
+    feed_store.close()
+
+
+
+@pytest.fixture
+def run_with_hass(
+    server: MockStarlingServer,
+) -> Callable[[Callable[..., Awaitable[None]]], None]:
+    """Return a runner of async steps against Home Assistant and the mock API.
+
+    The steps are awaited with a Home Assistant instance whose configuration
+    directory is temporary, and which is stopped once they return.
+    """
+
+    async def _async_run(steps: Callable[..., Awaitable[None]]) -> None:
+        from homeassistant.core import HomeAssistant
+
+        with tempfile.TemporaryDirectory() as directory:
+            hass = HomeAssistant(directory)
+            try:
+                await steps(hass)
+            finally:
+                await hass.async_stop(force=True)
+
+    def _run(steps: Callable[..., Awaitable[None]]) -> None:
+        asyncio.run(_async_run(steps))
+
+    return _run
+
+
+@pytest.fixture
+def run_with_coordinator(
+    run_with_hass: Callable[[Callable[..., Awaitable[None]]], None],
+) -> Callable[[Callable[..., Awaitable[None]]], None]:
+    """Return a runner of async steps against a coordinator on the mock API.
+
+    The steps are awaited with a Home Assistant instance and a refreshed
+    coordinator, which are shut down once they return.
+    """
+
+    async def _steps_with_coordinator(steps, hass) -> None:
+        from custom_components.starlingbank.starling_update_coordinator import (
+            StarlingUpdateCoordinator,
+        )
+
+        async with ClientSession() as session:
+            client = await create_starling_data(session, hass.config.config_dir)
+            coordinator = StarlingUpdateCoordinator(hass, client)
+            await coordinator.async_refresh()
+            try:
+                await steps(hass, coordinator)
+            finally:
+                await coordinator.async_shutdown()
+                await client.async_close()
+
+    def _run(steps: Callable[..., Awaitable[None]]) -> None:
+        run_with_hass(partial(_steps_with_coordinator, steps))
+
+    return _run
@@ -0,0 +1,30 @@
+"""Run the refresh benchmarks and check what a refresh costs.
+
+Between refreshes one space receives a transfer, so the account and that
+space change while every other space stays the same.
+"""
+from __future__ import annotations
+
+import pytest
+
+from benchmarks.mock_starling import MockConfig
+from benchmarks.run import run
+
+# The balance, the goal list or the one listened-to goal, and the feed.
+REFRESH_CALLS = 3
+
+
+@pytest.mark.parametrize("spaces", [1, 10, 100])
+def test_refresh_cost_does_not_grow_with_spaces(spaces):
+    """A refresh makes the same calls and writes however many spaces exist."""
+    results = {result.scenario: result for result in run(MockConfig(spaces=spaces), 3)}
+
+    assert all(result.failures == 0 for result in results.values())
+    assert results["StarlingAccount"].api_calls == 2
+    assert results["StarlingData"].api_calls == REFRESH_CALLS
+    assert results["StarlingData (one space listening)"].api_calls == REFRESH_CALLS
+
+    coordinator = results["StarlingUpdateCoordinator"]
+    assert coordinator.api_calls == REFRESH_CALLS
+    # Only the account and the space that received the transfer are written.
+    assert coordinator.entity_updates == 2
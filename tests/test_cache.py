@@ -0,0 +1,112 @@
+"""Tests of the per-tier response cache."""
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import ClientSession
+import pytest
+
+from benchmarks.mock_starling import ACCOUNT_UID
+from custom_components.starlingbank.api import starlingbank as starling_api
+from custom_components.starlingbank.api.const import (
+    TIER_BALANCE,
+    TIER_SAVINGS_GOALS,
+)
+
+from .conftest import fast_scheduler, fetch
+
+BALANCE = f"/accounts/{ACCOUNT_UID}/balance"
+GOALS = f"/account/{ACCOUNT_UID}/savings-goals"
+
+
+def test_cache_serves_tiers_until_their_ttl(monkeypatch):
+    """Responses are served from their tier until it expires."""
+    now = [1000.0]
+    monkeypatch.setattr(starling_api, "monotonic", lambda: now[0])
+    cache = starling_api.ResponseCache({TIER_BALANCE: 10, TIER_SAVINGS_GOALS: 0})
+
+    cache.set(TIER_BALANCE, BALANCE, {"balance": 1})
+    cache.set(TIER_SAVINGS_GOALS, GOALS, {"goals": []})
+
+    assert cache.get(TIER_BALANCE, BALANCE) == {"balance": 1}
+    # A TTL of zero disables caching for the tier.
+    assert cache.get(TIER_SAVINGS_GOALS, GOALS) is None
+
+    now[0] += 10
+    assert cache.get(TIER_BALANCE, BALANCE) is None
+    assert cache.hits[TIER_BALANCE] == 1
+    assert cache.misses == {TIER_BALANCE: 1, TIER_SAVINGS_GOALS: 1}
+    assert cache.hit_rate == 1 / 3
+
+
+def test_cache_evicts_least_recently_used_entries():
+    """Each tier keeps at most max_entries, dropping the least recent."""
+    cache = starling_api.ResponseCache({TIER_BALANCE: 60}, max_entries=2)
+    for endpoint in ("a", "b"):
+        cache.set(TIER_BALANCE, endpoint, {endpoint: True})
+    cache.get(TIER_BALANCE, "a")
+    cache.set(TIER_BALANCE, "c", {"c": True})
+
+    assert cache.get(TIER_BALANCE, "b") is None
+    assert cache.get(TIER_BALANCE, "a") == {"a": True}
+    assert cache.get(TIER_BALANCE, "c") == {"c": True}
+
+
+def test_cache_invalidates_given_tiers():
+    """Invalidating tiers leaves the others cached."""
+    cache = starling_api.ResponseCache({TIER_BALANCE: 60, TIER_SAVINGS_GOALS: 60})
+    cache.set(TIER_BALANCE, BALANCE, {})
+    cache.set(TIER_SAVINGS_GOALS, GOALS, {})
+
+    cache.invalidate(TIER_SAVINGS_GOALS)
+    assert cache.get(TIER_BALANCE, BALANCE) == {}
+    assert cache.get(TIER_SAVINGS_GOALS, GOALS) is None
+
+    cache.invalidate()
+    assert cache.get(TIER_BALANCE, BALANCE) is None
+
+
+@pytest.mark.mock_config(latency=0.05)
+def test_cached_tiers_share_one_request(server):
+    """Concurrent and repeated requests for a cached tier cost one call."""
+    cache = starling_api.ResponseCache({TIER_BALANCE: 60})
+
+    first, second = asyncio.run(
+        fetch(fast_scheduler(), BALANCE, BALANCE, cache=cache, tier=TIER_BALANCE)
+    )
+    assert first == second
+    assert server.state.total_calls == 1
+
+    # Uncached requests are sent every time.
+    asyncio.run(fetch(fast_scheduler(), BALANCE, BALANCE))
+    assert server.state.total_calls == 3
+
+
+@pytest.mark.mock_config(spaces=1)
+def test_transfers_invalidate_cached_balances(server):
+    """A transfer drops cached balances, so the next read sees it."""
+    goal_uid = next(iter(server.state.goals))
+
+    async def _transfer_and_read():
+        async with ClientSession() as session:
+            api = starling_api.StarlingApi(
+                session,
+                "token",
+                cache=starling_api.ResponseCache({TIER_BALANCE: 60}),
+                scheduler=fast_scheduler(),
+            )
+            before = await api.get(BALANCE, TIER_BALANCE)
+            await api.put(
+                f"{GOALS}/{goal_uid}/add-money/transfer",
+                {"amount": {"currency": "GBP", "minorUnits": 100}},
+            )
+            after = await api.get(BALANCE, TIER_BALANCE)
+        return before, after
+
+    before, after = asyncio.run(_transfer_and_read())
+    assert (
+        before["effectiveBalance"]["minorUnits"]
+        - after["effectiveBalance"]["minorUnits"]
+        == 100
+    )
+    assert server.state.total_calls == 3
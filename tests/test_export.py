@@ -0,0 +1,164 @@
+"""Tests of the resumable feed export."""
+from __future__ import annotations
+
+import asyncio
+import csv
+from datetime import datetime, timedelta, timezone
+import json
+
+from aiohttp import ClientSession
+import pytest
+
+from custom_components.starlingbank.api import starlingbank as starling_api
+from custom_components.starlingbank.const import (
+    EXPORT_FORMAT_CSV,
+    EXPORT_FORMAT_JSONL,
+)
+from custom_components.starlingbank.export import (
+    CSV_COLUMNS,
+    CURSOR_SUFFIX,
+    FeedExportWriter,
+    feed_pages,
+)
+
+from .conftest import fast_scheduler
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=14)
+MIDDLE = START + timedelta(days=7)
+
+
+def _item(uid: int, when: datetime) -> dict:
+    return {
+        "feedItemUid": f"item-{uid}",
+        "amount": {"currency": "GBP", "minorUnits": 100 * uid},
+        "direction": "OUT",
+        "transactionTime": when.isoformat(),
+    }
+
+
+def _writer(path, export_format=EXPORT_FORMAT_JSONL, start=START):
+    return FeedExportWriter(str(path), export_format, "account", start, END)
+
+
+def _exported_uids(path) -> list[str]:
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [json.loads(line)["feedItemUid"] for line in lines]
+
+
+def test_export_resumes_after_the_last_complete_page(tmp_path):
+    """An interrupted export drops its partial page and carries on."""
+    path = tmp_path / "feed.jsonl"
+    writer = _writer(path)
+    assert writer.open() is None
+    writer.write_page(
+        [_item(2, START + timedelta(days=2)), _item(1, START + timedelta(days=1))],
+        MIDDLE,
+    )
+    # Interrupted while writing the next page.
+    writer._file.write('{"feedItemUid": "item-3", "amou')
+    writer.close()
+
+    writer = _writer(path)
+    assert writer.open() == MIDDLE
+    assert writer.items == 2
+    writer.write_page([_item(3, MIDDLE + timedelta(days=1))], END)
+    writer.finish()
+
+    # Each page is written in transaction order.
+    assert _exported_uids(path) == ["item-1", "item-2", "item-3"]
+    assert not path.with_name(path.name + CURSOR_SUFFIX).exists()
+
+
+def test_export_starts_again_for_another_range(tmp_path):
+    """A cursor left by an export of another range is ignored."""
+    path = tmp_path / "feed.jsonl"
+    writer = _writer(path)
+    writer.open()
+    writer.write_page([_item(1, START)], MIDDLE)
+    writer.close()
+
+    writer = _writer(path, start=START - timedelta(days=1))
+    assert writer.open() is None
+    writer.write_page([_item(2, START)], END)
+    writer.finish()
+
+    assert _exported_uids(path) == ["item-2"]
+
+
+def test_export_starts_again_when_not_resuming(tmp_path):
+    """Passing resume as False overwrites an interrupted export."""
+    path = tmp_path / "feed.jsonl"
+    writer = _writer(path)
+    writer.open()
+    writer.write_page([_item(1, START)], MIDDLE)
+    writer.close()
+
+    writer = _writer(path)
+    assert writer.open(resume=False) is None
+    writer.finish()
+
+    assert _exported_uids(path) == []
+
+
+def test_csv_export_writes_one_header(tmp_path):
+    """A resumed CSV export does not repeat its header."""
+    path = tmp_path / "feed.csv"
+    writer = _writer(path, EXPORT_FORMAT_CSV)
+    writer.open()
+    writer.write_page([_item(1, START)], MIDDLE)
+    writer.close()
+
+    writer = _writer(path, EXPORT_FORMAT_CSV)
+    writer.open()
+    writer.write_page([_item(2, MIDDLE)], END)
+    writer.finish()
+
+    with open(path, encoding="utf-8", newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == list(CSV_COLUMNS)
+    assert [row[0] for row in rows[1:]] == ["item-1", "item-2"]
+    assert rows[1][CSV_COLUMNS.index("amount_minor_units")] == "100"
+
+
+@pytest.mark.mock_config(feed_items=60)
+def test_export_pages_the_feed_by_window(server, tmp_path):
+    """Exporting from the API requests a window at a time and keeps every item."""
+    end = datetime.now(timezone.utc) + timedelta(minutes=1)
+    start = end - timedelta(days=5)
+    expected = [
+        item["feedItemUid"]
+        for item in sorted(server.state.feed, key=lambda item: item["transactionTime"])
+        if item["transactionTime"] >= start.isoformat()
+    ]
+
+    async def _export() -> None:
+        async with ClientSession() as session:
+            api = starling_api.StarlingApi(
+                session, "token", scheduler=fast_scheduler()
+            )
+            (account,) = await starling_api.AsyncStarlingAccount.async_discover(api)
+            writer = FeedExportWriter(
+                str(tmp_path / "feed.jsonl"),
+                EXPORT_FORMAT_JSONL,
+                account.account_uid,
+                start,
+                end,
+            )
+            writer.open()
+            async for until, items in feed_pages(
+                account, start, end, timedelta(days=1)
+            ):
+                writer.write_page(items, until)
+            writer.finish()
+
+    asyncio.run(_export())
+
+    assert _exported_uids(tmp_path / "feed.jsonl") == expected
+    assert (
+        server.state.calls[
+            "/api/v2/feed/account/{account}/category/{category}"
+            "/transactions-between"
+        ]
+        == 5
+    )
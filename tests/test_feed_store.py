@@ -0,0 +1,41 @@
+"""Tests of feed ingestion into the local store."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from custom_components.starlingbank.feed_store import FeedStore
+
+from .conftest import NOW, feed_item
+
+
+def test_ingest_upserts_items_by_uid(store):
+    """An item ingested again replaces the stored one."""
+    assert store.ingest([feed_item(1, 100), feed_item(2, 200, hours_ago=1)]) == 2
+    store.ingest([feed_item(1, 150)])
+
+    assert store.summary(NOW, NOW, NOW).last_transaction.amount_minor_units == 150
+    assert store.last_row() == 2
+
+
+def test_watermark_survives_reopening(tmp_path):
+    """The changesSince watermark is the newest update and is persisted."""
+    path = str(tmp_path / "feed.db")
+    feed_store = FeedStore(path)
+    feed_store.open()
+    newer = (NOW + timedelta(minutes=1)).isoformat()
+    feed_store.ingest([feed_item(1, 100), feed_item(2, 100, updatedAt=newer)])
+    feed_store.ingest([feed_item(3, 100)])
+    feed_store.close()
+
+    feed_store.open()
+    assert feed_store.watermark == newer
+    feed_store.close()
+
+
+def test_backfill_does_not_move_the_watermark(store):
+    """Items fetched by time leave the changesSince watermark alone."""
+    store.ingest([feed_item(1, 100)])
+    later = (NOW + timedelta(minutes=1)).isoformat()
+    store.ingest([feed_item(2, 100, updatedAt=later)], advance_watermark=False)
+
+    assert store.watermark == NOW.isoformat()
@@ -0,0 +1,130 @@
+"""Tests of setting up the shared client of a token."""
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_NAME, CONF_TOKEN, EVENT_HOMEASSISTANT_STARTED
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from benchmarks.mock_starling import ACCOUNT_UID
+from custom_components.starlingbank import (
+    _async_create_shared_client,
+    create_and_update_instance,
+)
+from custom_components.starlingbank.const import DOMAIN, master_idx
+
+
+def _entry(**options) -> ConfigEntry:
+    return ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title="Starling",
+        data={CONF_TOKEN: "token", CONF_NAME: "Starling"},
+        source="user",
+        options=options,
+    )
+
+
+async def _async_create(hass, entry: ConfigEntry):
+    """Create the shared client of an entry, as setup does."""
+    os.makedirs(hass.config.path(STORAGE_DIR), exist_ok=True)
+    return await _async_create_shared_client(hass, entry)
+
+
+@pytest.mark.mock_config(spaces=1)
+def test_statistics_import_starts_once_home_assistant_has_started(
+    server, run_with_hass, monkeypatch
+):
+    """Each account's balance statistics are imported after start up."""
+    from custom_components.starlingbank.statistics import (
+        BalanceStatisticsImporter,
+    )
+
+    runs = []
+
+    async def _async_run(importer, *_) -> None:
+        runs.append(importer)
+
+    monkeypatch.setattr(BalanceStatisticsImporter, "async_run", _async_run)
+
+    async def steps(hass) -> None:
+        shared = await _async_create(hass, _entry())
+        try:
+            await hass.async_block_till_done()
+            assert not runs
+
+            hass.bus.async_fire(EVENT_HOMEASSISTANT_STARTED)
+            # The import runs as a background task, which block_till_done
+            # does not wait for.
+            async with asyncio.timeout(1):
+                while not runs:
+                    await asyncio.sleep(0.01)
+            assert len(runs) == 1
+        finally:
+            await shared.async_close()
+
+    run_with_hass(steps)
+
+
+@pytest.mark.mock_config(spaces=1)
+def test_first_refresh_reconciles_restored_accounts(server, run_with_hass):
+    """A stored account that has closed is dropped and a new one is added."""
+    closed = {
+        "accountUid": "closed-account",
+        "currency": "GBP",
+        "createdAt": "2020-01-01T00:00:00.000Z",
+        "accountType": "ADDITIONAL",
+        "name": "Closed",
+    }
+
+    async def steps(hass) -> None:
+        os.makedirs(hass.config.path(STORAGE_DIR), exist_ok=True)
+        instance = await create_and_update_instance(
+            hass, _entry(), {"accounts": [closed]}
+        )
+        try:
+            data = await instance.update_coordinated(set())
+
+            assert list(instance.accounts) == [ACCOUNT_UID]
+            assert list(instance.feed_stores) == [ACCOUNT_UID]
+            assert master_idx(ACCOUNT_UID) in data
+            assert master_idx("closed-account") not in data
+            assert data[master_idx(ACCOUNT_UID)].feed is not None
+        finally:
+            await instance.async_close()
+
+    run_with_hass(steps)
+
+
+@pytest.mark.mock_config(spaces=1)
+def test_entries_sharing_a_token_share_one_sweep_engine(server, run_with_hass):
+    """Sweep rules of every entry with the token run in one engine."""
+    from custom_components.starlingbank.sweeps import SweepRule
+
+    first = SweepRule("first", "Space 0", 100, 0)
+    second = SweepRule("second", "Space 0", 100, 0)
+
+    async def steps(hass) -> None:
+        shared = await _async_create(hass, _entry())
+        try:
+            shared.sweep_rules["entry-1"] = [first]
+            shared.async_update_sweeps()
+            engine = shared.sweep_engine
+            shared.sweep_rules["entry-2"] = [second]
+            shared.async_update_sweeps()
+
+            assert shared.sweep_engine is engine
+            assert engine._rules == [first, second]
+
+            shared.sweep_rules.clear()
+            shared.async_update_sweeps()
+            assert shared.sweep_engine is None
+        finally:
+            await shared.async_close()
+
+    run_with_hass(steps)
@@ -0,0 +1,145 @@
+"""Tests of the request scheduler and its circuit breaker."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import time
+
+from aiohttp import ClientResponseError, ClientSession
+import pytest
+
+from benchmarks.mock_starling import ACCOUNT_UID
+from custom_components.starlingbank.api import starlingbank as starling_api
+
+from .conftest import fast_scheduler, fetch
+
+BALANCE = f"/accounts/{ACCOUNT_UID}/balance"
+TRANSFER = f"/account/{ACCOUNT_UID}/savings-goals/goal/add-money/transfer"
+
+
+def _rate_limited(retry_after: str | None) -> ClientResponseError:
+    return ClientResponseError(
+        None,
+        (),
+        status=429,
+        headers={"Retry-After": retry_after} if retry_after else None,
+    )
+
+
+@pytest.mark.mock_config(rate_limit_rate=1, retry_after=0.05)
+def test_rate_limited_requests_are_retried_until_exhausted(server):
+    """Every 429 is repeated, up to max_retries, then raised."""
+    scheduler = fast_scheduler(max_retries=2)
+
+    started = time.perf_counter()
+    with pytest.raises(ClientResponseError) as err:
+        asyncio.run(fetch(scheduler, BALANCE))
+
+    assert err.value.status == 429
+    assert server.state.total_calls == 3
+    # Both retries waited for the Retry-After delay, not the short backoff.
+    assert time.perf_counter() - started >= 0.1
+    # The API answered, so the circuit stays closed.
+    assert not scheduler.breaker.is_open
+
+
+def test_rate_limited_request_waits_for_retry_after():
+    """A 429 is repeated once its Retry-After delay has passed."""
+    attempts = []
+
+    async def request():
+        attempts.append(time.perf_counter())
+        if len(attempts) == 1:
+            raise _rate_limited("0.2")
+        return "ok"
+
+    scheduler = fast_scheduler()
+    assert asyncio.run(scheduler.run(request, idempotent=False)) == "ok"
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.2
+
+
+def test_retry_after_parses_seconds_and_dates():
+    """Retry-After is read as seconds or as an HTTP date."""
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert starling_api._retry_after({"Retry-After": "2.5"}) == 2.5
+    assert starling_api._retry_after({"Retry-After": "-1"}) == 0
+    assert 25 < starling_api._retry_after(
+        {"Retry-After": format_datetime(later, usegmt=True)}
+    ) <= 30
+    assert starling_api._retry_after({"Retry-After": "soon"}) is None
+    assert starling_api._retry_after(None) is None
+
+
+@pytest.mark.mock_config(error_rate=1)
+def test_server_errors_retry_only_idempotent_requests(server):
+    """A 503 is retried for a GET but not for a write."""
+
+    async def _write():
+        async with ClientSession() as session:
+            api = starling_api.StarlingApi(
+                session, "token", scheduler=fast_scheduler(max_retries=2)
+            )
+            await api.put(TRANSFER, {})
+
+    with pytest.raises(ClientResponseError):
+        asyncio.run(fetch(fast_scheduler(max_retries=2), BALANCE))
+    assert server.state.total_calls == 3
+
+    with pytest.raises(ClientResponseError):
+        asyncio.run(_write())
+    assert server.state.total_calls == 4
+
+
+@pytest.mark.mock_config(error_rate=1)
+def test_circuit_opens_after_failures_and_probes_once(server):
+    """Failing refreshes open the circuit until a probe succeeds."""
+    breaker = starling_api.CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    scheduler = fast_scheduler(max_retries=0, breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(ClientResponseError):
+            asyncio.run(fetch(scheduler, BALANCE))
+    assert breaker.is_open
+
+    # Refused without a request while open.
+    with pytest.raises(starling_api.CircuitOpenError):
+        asyncio.run(fetch(scheduler, BALANCE))
+    assert server.state.total_calls == 2
+
+    server.call(setattr, server.config, "error_rate", 0)
+    time.sleep(0.2)
+    asyncio.run(fetch(scheduler, BALANCE))
+    assert not breaker.is_open
+    assert server.state.total_calls == 3
+
+
+def test_half_open_circuit_refuses_requests_during_the_probe():
+    """Only one request probes a circuit whose timeout has passed."""
+    breaker = starling_api.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.05)
+
+    breaker.check()
+    with pytest.raises(starling_api.CircuitOpenError):
+        breaker.check()
+
+    breaker.record_failure()
+    assert breaker.is_open
+
+
+def test_refused_requests_do_not_open_the_circuit():
+    """Client errors show the API is up, so they reset the failure count."""
+    breaker = starling_api.CircuitBreaker(failure_threshold=2)
+    scheduler = fast_scheduler(breaker=breaker)
+
+    async def request():
+        raise ClientResponseError(None, (), status=404)
+
+    breaker.record_failure()
+    with pytest.raises(ClientResponseError):
+        asyncio.run(scheduler.run(request, idempotent=True))
+    breaker.record_failure()
+    assert not breaker.is_open
@@ -0,0 +1,74 @@
+"""Tests of transaction search, with and without the full-text index."""
+from __future__ import annotations
+
+import pytest
+
+from .conftest import feed_item
+
+SEARCH_ITEMS = [
+    feed_item(1, 250, hours_ago=1),
+    feed_item(2, 1_200, hours_ago=2, counterPartyName="Trainline", reference="50% off"),
+    feed_item(3, 900, hours_ago=3, counterPartyName="Tesco", reference="Fuel"),
+    feed_item(
+        4,
+        3_000,
+        hours_ago=4,
+        counterPartyName="Employer",
+        direction="IN",
+        spendingCategory="INCOME",
+        reference="Salary",
+    ),
+]
+
+
+def _uids(result: tuple[list[dict], int | None]) -> list[str]:
+    return [item["feed_item_uid"] for item in result[0]]
+
+
+@pytest.mark.parametrize("full_text", [True, False], ids=["fts", "like"])
+def test_search_matches_every_word(store, full_text):
+    """Words match the counterparty, reference or category, newest first."""
+    if full_text and not store.full_text:
+        pytest.skip("SQLite was built without FTS5")
+    store.full_text = full_text
+    store.ingest(SEARCH_ITEMS)
+
+    assert _uids(store.search("tes")) == ["item-1", "item-3"]
+    assert _uids(store.search("tesco fuel")) == ["item-3"]
+    assert _uids(store.search("salary")) == ["item-4"]
+    assert _uids(store.search("groceries", min_amount=1_000)) == ["item-2"]
+    assert _uids(store.search(direction="IN")) == ["item-4"]
+    assert _uids(store.search("nothing")) == []
+
+
+def test_search_without_index_matches_literal_wildcards(store):
+    """The LIKE fallback treats % and _ in the text as plain characters."""
+    store.full_text = False
+    store.ingest(SEARCH_ITEMS)
+
+    assert _uids(store.search("50%")) == ["item-2"]
+    assert _uids(store.search("_")) == []
+
+
+def test_search_pages_results(store):
+    """Results are paged, with the offset of the next page."""
+    store.ingest(SEARCH_ITEMS)
+
+    items, next_offset = store.search(limit=3)
+    assert len(items) == 3
+    assert next_offset == 3
+
+    items, next_offset = store.search(limit=3, offset=next_offset)
+    assert [item["feed_item_uid"] for item in items] == ["item-4"]
+    assert next_offset is None
+
+
+def test_search_index_follows_changed_items(store):
+    """An updated item is found by its new text only."""
+    if not store.full_text:
+        pytest.skip("SQLite was built without FTS5")
+    store.ingest([feed_item(1, 250)])
+    store.ingest([feed_item(1, 250, counterPartyName="Waitrose")])
+
+    assert _uids(store.search("tesco")) == []
+    assert _uids(store.search("waitrose")) == ["item-1"]
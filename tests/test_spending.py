@@ -0,0 +1,95 @@
+"""Tests of the incremental spending totals."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from custom_components.starlingbank.feed_store import (
+    DIMENSION_CATEGORY,
+    DIMENSION_COUNTERPARTY,
+    DIMENSION_SPACE,
+    WINDOW_DAY,
+    WINDOW_MONTH,
+    FeedStore,
+)
+
+from .conftest import NOW, feed_item
+
+
+def _spending(store: FeedStore) -> dict:
+    start = NOW - timedelta(days=1)
+    return store.summary(start, start, NOW - timedelta(days=30)).spending
+
+
+def test_buckets_total_spending_by_dimension(store):
+    """Outgoing items count towards their category and counterparty."""
+    store.ingest(
+        [
+            feed_item(1, 250),
+            feed_item(2, 100, hours_ago=2, counterPartyName="Pret"),
+            feed_item(3, 1_000, direction="IN"),
+            feed_item(4, 500, hours_ago=24 * 10, spendingCategory="TRANSPORT"),
+        ]
+    )
+    spending = _spending(store)
+
+    assert spending[WINDOW_DAY][DIMENSION_CATEGORY] == {"GROCERIES": 350}
+    assert spending[WINDOW_DAY][DIMENSION_COUNTERPARTY] == {
+        "Tesco Express": 250,
+        "Pret": 100,
+    }
+    assert spending[WINDOW_MONTH][DIMENSION_CATEGORY] == {
+        "TRANSPORT": 500,
+        "GROCERIES": 350,
+    }
+
+
+def test_buckets_follow_changed_items(store):
+    """An updated item moves its total rather than adding it again."""
+    store.ingest([feed_item(1, 250)])
+    store.ingest([feed_item(1, 300, spendingCategory="EATING_OUT")])
+    assert _spending(store)[WINDOW_DAY][DIMENSION_CATEGORY] == {"EATING_OUT": 300}
+
+    store.ingest([feed_item(1, 300, status="DECLINED")])
+    assert _spending(store)[WINDOW_DAY][DIMENSION_CATEGORY] == {}
+
+
+def test_buckets_net_space_transfers(store):
+    """Transfers to a space count towards it, less what left it."""
+    transfer = {"source": "INTERNAL_TRANSFER", "counterPartyName": "Holiday"}
+    store.ingest(
+        [
+            feed_item(1, 500, **transfer),
+            feed_item(2, 200, direction="IN", **transfer),
+        ]
+    )
+    spending = _spending(store)[WINDOW_DAY]
+
+    assert spending[DIMENSION_SPACE] == {"Holiday": 300}
+    assert spending[DIMENSION_CATEGORY] == {}
+
+
+def test_buckets_are_rebuilt_for_older_stores(tmp_path):
+    """Items stored before the buckets existed are counted on open."""
+    feed_store = FeedStore(str(tmp_path / "feed.db"))
+    feed_store.open()
+    feed_store.ingest([feed_item(1, 250)])
+    feed_store._connection.execute("DELETE FROM spend_buckets")
+    feed_store._connection.execute("PRAGMA user_version = 0")
+    feed_store._connection.commit()
+    feed_store.close()
+
+    feed_store.open()
+    assert _spending(feed_store)[WINDOW_DAY][DIMENSION_CATEGORY] == {
+        "GROCERIES": 250
+    }
+    feed_store.close()
+
+
+def test_items_without_a_status_count_everywhere(store):
+    """The spend totals and the buckets agree on items with no status."""
+    store.ingest([feed_item(1, 250, status=None), feed_item(2, 100, status="DECLINED")])
+    summary = store.summary(NOW - timedelta(days=1), NOW, NOW - timedelta(days=30))
+
+    assert summary.spend_today_minor_units == 250
+    assert summary.spending[WINDOW_DAY][DIMENSION_CATEGORY] == {"GROCERIES": 250}
+    assert store.transactions_after(0, "OUT") == [(1, "item-1", 250)]
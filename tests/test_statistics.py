@@ -0,0 +1,84 @@
+"""Tests of the balance statistics rebuilt from the feed."""
+from __future__ import annotations
+
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.starlingbank import statistics
+from custom_components.starlingbank.statistics import (
+    BalanceStatisticsImporter,
+    _start_of_hour,
+)
+
+from .conftest import NOW, feed_item
+
+BALANCE = 100_000
+CREATED = _start_of_hour(NOW - timedelta(days=2))
+
+
+@pytest.fixture
+def written(monkeypatch) -> dict:
+    """Record the written statistics by hour, as the recorder would keep them."""
+    hours = {}
+
+    def _add(hass, metadata, statistics_data) -> None:
+        for data in statistics_data:
+            hours[data["start"]] = data["state"]
+
+    monkeypatch.setattr(statistics, "async_add_external_statistics", _add)
+    return hours
+
+
+def _importer(hass, store) -> BalanceStatisticsImporter:
+    account = SimpleNamespace(
+        account_uid="account",
+        currency="GBP",
+        created_at=CREATED.isoformat(),
+        cleared_balance=BALANCE,
+    )
+    return BalanceStatisticsImporter(hass, account, store, "Starling")
+
+
+def test_balance_is_worked_back_from_the_live_balance(
+    server, run_with_hass, store, written
+):
+    """The newest hour matches the live balance, whatever the opening one."""
+    store.ingest([feed_item(1, 2_000, hours_ago=30), feed_item(2, 500, hours_ago=10)])
+
+    async def steps(hass) -> None:
+        await _importer(hass, store)._async_write_statistics()
+
+    run_with_hass(steps)
+
+    assert written[max(written)] == BALANCE / 100
+    assert written[CREATED] == (BALANCE + 2_500) / 100
+
+
+def test_items_for_written_hours_rewrite_the_series(
+    server, run_with_hass, store, written
+):
+    """An item arriving for an hour already written moves the hours before it."""
+    store.ingest([feed_item(1, 2_000, hours_ago=10)])
+    late = _start_of_hour(NOW - timedelta(hours=30))
+
+    async def steps(hass) -> None:
+        importer = _importer(hass, store)
+        await importer._async_write_statistics()
+        assert written[CREATED] == (BALANCE + 2_000) / 100
+
+        # Nothing has changed, so no hour is written again.
+        written.clear()
+        await importer._async_write_statistics()
+        assert not written
+
+        # Backfilled, so the watermark stays put but the row is new.
+        store.ingest([feed_item(2, 500, hours_ago=30)], advance_watermark=False)
+        await importer._async_write_statistics()
+
+    run_with_hass(steps)
+
+    assert written[CREATED] == (BALANCE + 2_500) / 100
+    assert written[late] == (BALANCE + 2_000) / 100
+    assert written[max(written)] == BALANCE / 100
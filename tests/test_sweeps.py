@@ -0,0 +1,204 @@
+"""Tests of the sweep rules against a coordinator and the mock API."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import json
+
+import pytest
+
+from benchmarks.mock_starling import CATEGORY_UID, MockStarlingServer
+from custom_components.starlingbank.sweeps import (
+    META_UNCONFIRMED,
+    RoundUpRule,
+    SweepEngine,
+    SweepRule,
+    merge_rules,
+)
+
+from .conftest import feed_item
+
+BALANCE = 1_000_000
+SWEPT = 25_000
+SWEEP = SweepRule("savings", "Space 1", 100, BALANCE - SWEPT)
+
+
+@pytest.fixture
+def run_sweeps(run_with_coordinator):
+    """Return a runner of async steps against a sweep engine of rules."""
+
+    def _run(rules: list, steps) -> None:
+        async def _steps(hass, coordinator) -> None:
+            await steps(SweepEngine(hass, coordinator, rules), coordinator)
+
+        run_with_coordinator(_steps)
+
+    return _run
+
+
+def _goal(server: MockStarlingServer, index: int) -> dict:
+    return list(server.state.goals.values())[index]
+
+
+def _saved(server: MockStarlingServer, index: int) -> int:
+    return _goal(server, index)["totalSaved"]["minorUnits"]
+
+
+def _unconfirmed(coordinator, rule) -> str | None:
+    (feed_store,) = coordinator.starling_client.feed_stores.values()
+    return feed_store.get_meta(META_UNCONFIRMED.format(rule.name))
+
+
+@pytest.mark.mock_config(spaces=2)
+def test_sweep_moves_the_balance_above_its_threshold(server, run_sweeps):
+    """The balance above the threshold is deposited, once."""
+    before = _saved(server, 1)
+
+    async def steps(engine, coordinator) -> None:
+        await engine._async_evaluate()
+        assert _unconfirmed(coordinator, SWEEP) == ""
+        await coordinator.async_refresh()
+        await engine._async_evaluate()
+
+    run_sweeps([SWEEP], steps)
+
+    assert _saved(server, 1) - before == SWEPT
+    assert server.state.balance == BALANCE - SWEPT
+    assert len(server.state.transfers) == 1
+
+
+@pytest.mark.mock_config(spaces=2)
+def test_unconfirmed_sweep_is_repeated_with_its_uid(server, run_sweeps):
+    """A transfer whose outcome is unknown is repeated, not made again."""
+    before = _saved(server, 1)
+
+    def _apply_lost_transfer(transfer_uid: str) -> None:
+        # Starling applied the transfer, but its response never arrived.
+        server.state.transfers.add(transfer_uid)
+        _goal(server, 1)["totalSaved"]["minorUnits"] += SWEPT
+        server.state.balance -= SWEPT
+
+    async def steps(engine, coordinator) -> None:
+        server.call(setattr, server.config, "error_rate", 1)
+        await engine._async_evaluate()
+        record = json.loads(_unconfirmed(coordinator, SWEEP))
+        assert record["amount"] == SWEPT
+
+        server.call(_apply_lost_transfer, record["transfer_uid"])
+        server.call(setattr, server.config, "error_rate", 0)
+        await engine._async_evaluate()
+        assert _unconfirmed(coordinator, SWEEP) == ""
+        assert server.state.transfers == {record["transfer_uid"]}
+
+        # The balance now stands at the threshold, so nothing more moves.
+        await coordinator.async_refresh()
+        await engine._async_evaluate()
+
+    run_sweeps([SWEEP], steps)
+
+    assert _saved(server, 1) - before == SWEPT
+    assert len(server.state.transfers) == 1
+
+
+@pytest.mark.mock_config(spaces=2)
+def test_refused_sweep_is_dropped(server, run_sweeps):
+    """A transfer Starling refused is not repeated."""
+    goal_uid = _goal(server, 1)["savingsGoalUid"]
+
+    async def steps(engine, coordinator) -> None:
+        # The space is deleted after the last refresh.
+        server.call(server.state.goals.pop, goal_uid)
+        await engine._async_evaluate()
+        assert _unconfirmed(coordinator, SWEEP) == ""
+
+    run_sweeps([SWEEP], steps)
+
+    assert server.state.balance == BALANCE
+    assert not server.state.transfers
+
+
+@pytest.mark.mock_config(spaces=1, feed_items=20)
+def test_round_up_acts_on_new_payments_only(server, run_sweeps):
+    """Round-ups start from the newest item and add up each new payment."""
+    rule = RoundUpRule("round up", "Space 0", 1, 100)
+    before = _saved(server, 0)
+    later = datetime.now(timezone.utc) + timedelta(seconds=1)
+
+    def _pay(uid: str, minor_units: int) -> None:
+        server.state.feed.append(
+            {
+                "feedItemUid": uid,
+                "categoryUid": CATEGORY_UID,
+                "amount": {"currency": "GBP", "minorUnits": minor_units},
+                "direction": "OUT",
+                "updatedAt": later.isoformat(),
+                # Arriving late, with a time before other items.
+                "transactionTime": (later - timedelta(days=3)).isoformat(),
+                "source": "MASTER_CARD",
+                "status": "SETTLED",
+            }
+        )
+
+    async def steps(engine, coordinator) -> None:
+        # The first evaluation only places the rule's cursor.
+        await engine._async_evaluate()
+        assert not server.state.transfers
+
+        server.call(_pay, "payment-1", 250)
+        server.call(_pay, "payment-2", 1_030)
+        await coordinator.async_refresh()
+        await engine._async_evaluate()
+        await engine._async_evaluate()
+
+    run_sweeps([rule], steps)
+
+    assert _saved(server, 0) - before == 50 + 70
+    assert len(server.state.transfers) == 1
+
+
+def test_transactions_after_follow_arrival_order(store):
+    """Items are read in the order they arrived, whatever their time."""
+    store.ingest([feed_item(1, 100, hours_ago=1), feed_item(2, 200, direction="IN")])
+    cursor = store.last_row()
+    # Arrives late, with a time before the items already read.
+    store.ingest([feed_item(3, 300, hours_ago=5)])
+    # Updating an item read before does not make it new again.
+    store.ingest([feed_item(1, 150, hours_ago=1)])
+
+    assert [
+        (uid, amount) for _, uid, amount in store.transactions_after(cursor, "OUT")
+    ] == [("item-3", 300)]
+    assert [uid for _, uid, _ in store.transactions_after(0, "OUT")] == [
+        "item-1",
+        "item-3",
+    ]
+
+
+def test_transactions_after_leave_out_space_transfers(store):
+    """Declined items and transfers to spaces are not transactions."""
+    store.ingest(
+        [
+            feed_item(1, 100, status="DECLINED"),
+            feed_item(2, 200, source="INTERNAL_TRANSFER"),
+            feed_item(3, 300),
+        ]
+    )
+    assert [uid for _, uid, _ in store.transactions_after(0, "OUT")] == ["item-3"]
+
+
+def test_merged_rules_keep_the_first_of_each_name():
+    """Rules of entries sharing a token are merged, balance rules last."""
+    round_up = RoundUpRule("round-up", "Space 1", 1, 100)
+    other = SweepRule("savings", "Space 2", 100, 0)
+
+    assert merge_rules([[SWEEP], [other, round_up]]) == [round_up, SWEEP]
+
+
+@pytest.mark.mock_config(spaces=1)
+def test_transfers_to_an_unknown_space_are_refused(run_with_coordinator):
+    """A space that has gone is reported as a ValueError, like other refusals."""
+
+    async def steps(hass, coordinator) -> None:
+        with pytest.raises(ValueError, match="Unknown space"):
+            coordinator.starling_client.check_transfers([("missing", 100)])
+
+    run_with_coordinator(steps)